@@ -0,0 +1,51 @@
+import argparse
+
+from testchain.benchmark import run_benchmarks, write_results
+from testchain.pipeline import MOTIFS, parse_motif_sizes
+from testchain.motifs.general import SetupChain, FinalizeChain
+
+MOTIFS_BY_NAME = {m.__name__: m for m in MOTIFS}
+
+
+def parse_motifs(value):
+    """
+    Parses a comma-separated list of motif names. SetupChain and FinalizeChain are always included.
+    """
+    motifs = [SetupChain]
+    for name in value.split(","):
+        if name not in MOTIFS_BY_NAME:
+            raise ValueError("Unknown motif {}, expected one of {}".format(name, ", ".join(MOTIFS_BY_NAME)))
+        if MOTIFS_BY_NAME[name] not in (SetupChain, FinalizeChain):
+            motifs.append(MOTIFS_BY_NAME[name])
+    return motifs + [FinalizeChain]
+
+
+if __name__ == "__main__":
+    default_motifs = ",".join(m.__name__ for m in MOTIFS)
+    parser = argparse.ArgumentParser(description='Benchmark the generation of a synthetic blockchain.')
+    parser.add_argument('--chain', dest='chain', default="btc", help='Chain [btc, bch, ltc]')
+    parser.add_argument('--exec', dest='exec', default="bitcoind", help="Path to bitcoind executable")
+    parser.add_argument('--motifs', dest='motifs', default=default_motifs,
+                        help="Comma-separated motifs to run (default: all)")
+    parser.add_argument('--scales', dest='scales', default="1",
+                        help="Comma-separated scale factors, one benchmark run each (default: 1)")
+    parser.add_argument('--motif-size', dest='motif_size', action='append', default=[], metavar='NAME=N',
+                        help="Set the size of a single motif, e.g. fan=1000, may be repeated")
+    parser.add_argument('--offline', dest='offline', action='store_true',
+                        help="Build blocks in-process instead of running a node")
+    parser.add_argument('--batch-rpc', dest='batch_rpc', action='store_true',
+                        help="Send transactions to the node in JSON-RPC batches at block boundaries")
+    parser.add_argument('--sign-processes', dest='sign_processes', type=int, default=0,
+                        help="Sign the inputs of large transactions using this many worker processes")
+    parser.add_argument('--output', dest='output', default=None, help="JSON result file (default: stdout)")
+    args = parser.parse_args()
+    try:
+        motifs = parse_motifs(args.motifs)
+        scales = [float(s) for s in args.scales.split(",")]
+        motif_sizes = parse_motif_sizes(args.motif_size)
+    except ValueError as e:
+        parser.error(str(e))
+
+    results = run_benchmarks(args.chain, args.exec, motifs, scales, offline=args.offline, batch_rpc=args.batch_rpc,
+                             sign_processes=args.sign_processes, motif_sizes=motif_sizes)
+    write_results(results, args.output)
@@ -1,31 +1,55 @@
 import argparse
 
-from testchain.motifs.general import SetupChain, FinalizeChain
-from testchain.motifs.change import Change
-from testchain.motifs.motifs import Motifs
-from testchain.motifs.addresses import Addresses
-from testchain.motifs.special import SpecialCases
-from testchain.motifs.taint import Taint
-from testchain.motifs.heuristics import Heuristics
-from testchain.motifs.cash import BitcoinCash
-from testchain.runner import Runner
+from testchain.motifs.workload import WorkloadConfig
+from testchain.pipeline import generate, parse_motif_sizes
+from testchain.store import STORES
 
-parser = argparse.ArgumentParser(description='Generate a synthetic blockchain.')
-parser.add_argument('--output-dir', dest='output_dir', default="../files/", help='Output directory')
-parser.add_argument('--chain', dest='chain', default="btc", help='Chain [btc, bch]')
-parser.add_argument('--exec', dest='exec', default="bitcoind", help="Path to bitcoind executable")
-args = parser.parse_args()
-generator = Runner(args.output_dir, args.chain, args.exec)
 
-generator.add_generator(SetupChain)
-generator.add_generator(Addresses)
-generator.add_generator(Motifs)
-generator.add_generator(Change)
-generator.add_generator(SpecialCases)
-generator.add_generator(Taint)
-generator.add_generator(Heuristics)
-generator.add_generator(BitcoinCash)
-generator.add_generator(FinalizeChain)
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic blockchain.')
+    parser.add_argument('--output-dir', dest='output_dir', default="../files/", help='Output directory')
+    parser.add_argument('--chain', dest='chain', default="btc", help='Chain [btc, bch]')
+    parser.add_argument('--exec', dest='exec', default="bitcoind", help="Path to bitcoind executable")
+    parser.add_argument('--cache-dir', dest='cache_dir', default=None,
+                        help="Directory for node checkpoints (default: no checkpointing)")
+    parser.add_argument('--offline', dest='offline', action='store_true',
+                        help="Build blocks in-process and write the blk files directly, without a node")
+    parser.add_argument('--batch-rpc', dest='batch_rpc', action='store_true',
+                        help="Send transactions to the node in JSON-RPC batches at block boundaries")
+    parser.add_argument('--async-rpc', dest='async_rpc', action='store_true',
+                        help="Send independent transactions concurrently over a pool of RPC connections")
+    parser.add_argument('--sign-processes', dest='sign_processes', type=int, default=0,
+                        help="Sign the inputs of large transactions using this many worker processes")
+    parser.add_argument('--undo-files', dest='undo_files', action='store_true',
+                        help="Also copy the rev files with the undo data of the blocks")
+    parser.add_argument('--scale', dest='scale', type=float, default=1,
+                        help="Multiply the size of all motifs (chain lengths, fan-outs, ...) by this factor")
+    parser.add_argument('--motif-size', dest='motif_size', action='append', default=[], metavar='NAME=N',
+                        help="Set the size of a single motif, e.g. fan=1000, may be repeated")
+    parser.add_argument('--workload-bytes', dest='workload_bytes', type=int, default=0,
+                        help="Append a random workload of about this many bytes of transactions (default: none)")
+    parser.add_argument('--workload-seed', dest='workload_seed', type=int, default=20181101,
+                        help="Seed of the random workload")
+    parser.add_argument('--drop-spent-addresses', dest='drop_spent_addresses', action='store_true',
+                        help="Let generators forget addresses once they are spent, to keep memory flat on large chains")
+    parser.add_argument('--trace-file', dest='trace_file', default=None,
+                        help="Write every RPC call with its motif and latency to this JSON file")
+    parser.add_argument('--store', dest='store', default="memory", choices=STORES,
+                        help="Where the ground truth is kept while generating, output.json is written either way")
+    parser.add_argument('--tx-table', dest='tx_table', action='store_true',
+                        help="Record every generated transaction in columnar .npy files in the txtable directory")
+    args = parser.parse_args()
+    try:
+        motif_sizes = parse_motif_sizes(args.motif_size)
+    except ValueError as e:
+        parser.error(str(e))
 
+    generate(args.output_dir, args.chain, args.exec, cache_dir=args.cache_dir, offline=args.offline,
+             batch_rpc=args.batch_rpc, async_rpc=args.async_rpc, sign_processes=args.sign_processes,
+             undo_files=args.undo_files, scale=args.scale, motif_sizes=motif_sizes, trace_file=args.trace_file,
+             drop_spent_addresses=args.drop_spent_addresses, store=args.store, tx_table=args.tx_table,
+             workload=WorkloadConfig(args.workload_seed, args.workload_bytes) if args.workload_bytes else None)
 
-generator.run()
+
+if __name__ == "__main__":
+    main()
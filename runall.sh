@@ -1,4 +1,2 @@
 #!/bin/sh
-python3 generate_chain.py --output-dir=output
-python3 generate_chain.py --output-dir=output --chain=bch --exec=./bin/bitcoin-cash
-python3 generate_chain.py --output-dir=output --chain=ltc --exec=./bin/litecoind
+python3 generate_chains.py --output-dir=output --chains=btc,bch,ltc --exec=bch=./bin/bitcoin-cash --exec=ltc=./bin/litecoind
@@ -1,9 +1,14 @@
+import base64
 import hashlib
+import zlib
+from typing import Dict, Optional
 
 from bitcointx.core import Hash160
-from bitcointx.core.script import CScript, OP_CHECKSIG, OP_0
+from bitcointx.core.script import CScript, OP_CHECKSIG, OP_0, OP_DUP, OP_HASH160, OP_EQUALVERIFY, OP_EQUAL
 from bitcointx.wallet import CBitcoinSecret, P2PKHBitcoinAddress, P2SHBitcoinAddress, P2WSHBitcoinAddress, \
     P2WPKHBitcoinAddress
+from testchain.addresspool import AddressPool, AddressRecord
+from testchain.util import Amount
 
 COINBASE_ADDRESS = "mjTkW3DjgyZck4KbiRusZsqTgaYTxdSz6z"
 COINBASE_KEY = "cVpF924EspNh8KjYsfhgY96mmxvT6DgdWiTYMtMjuM74hJaU5psW"
@@ -14,32 +19,100 @@ class UnsupportedAddressTypeError(Exception):
     """We do not support the address type"""
 
 
+# address types that can be created and spent
+ADDRESS_TYPES = ("p2pkh", "p2sh", "p2wpkh", "p2wsh")
+
+
 class Address(object):
     """
     Stores information related to addresses such as keys or the most recent output pointer.
+    The address encoding and the scripts are derived from the public key when they are first used and then cached.
     """
-    def __init__(self, key: CBitcoinSecret, address_type: str = "p2pkh"):
+    __slots__ = ("key_index", "type", "value", "txid", "vout", "pub", "_key", "_secret", "_pub_hash", "_script_hash",
+                 "_address", "_script_pubkey", "_redeem_script")
+
+    # precomputed keys used by `from_key_index`, see `testchain.addresspool`
+    pool = None  # type: Optional[AddressPool]
+
+    def __init__(self, key: Optional[CBitcoinSecret], address_type: str = "p2pkh", pub: Optional[bytes] = None):
+        """
+        :param key: the private key, may be None if `pub` is given and the key is set later
+        :param pub: the serialized public key, defaults to the public key of `key`
+        """
+        if address_type not in ADDRESS_TYPES:
+            raise UnsupportedAddressTypeError()
         self.key_index = None
         self.type = address_type
-        self.key = key
-        if address_type == "p2pkh":
-            self.address = P2PKHBitcoinAddress.from_pubkey(self.key.pub)
-        elif address_type == "p2sh":
-            self.address = P2SHBitcoinAddress.from_redeemScript(CScript([self.key.pub, OP_CHECKSIG]))
-        elif address_type == "p2wpkh":
-            key_hash = Hash160(self.key.pub)
-            script_pub_key = CScript([OP_0, key_hash])
-            self.address = P2WPKHBitcoinAddress.from_scriptPubKey(script_pub_key)
-        elif address_type == "p2wsh":
-            self.witness_program = CScript([self.key.pub, OP_CHECKSIG])
-            script_hash = hashlib.sha256(self.witness_program).digest()
-            script_pub_key = CScript([OP_0, script_hash])
-            self.address = P2WSHBitcoinAddress.from_scriptPubKey(script_pub_key)
-        else:
-            raise UnsupportedAddressTypeError()
-        self.value = 0
+        self.value = Amount(0)
         self.txid = None
         self.vout = None
+        self.pub = key.pub if pub is None else pub
+        self._key = key
+        self._secret = None
+        self._pub_hash = None
+        self._script_hash = None
+        self._address = None
+        self._script_pubkey = None
+        self._redeem_script = None
+
+    @property
+    def key(self) -> CBitcoinSecret:
+        # addresses created from a pool record only derive the key once they sign something
+        if self._key is None:
+            self._key = CBitcoinSecret.from_secret_bytes(self._secret)
+        return self._key
+
+    @property
+    def pub_hash(self) -> bytes:
+        if self._pub_hash is None:
+            self._pub_hash = Hash160(self.pub)
+        return self._pub_hash
+
+    @property
+    def redeem_script(self) -> Optional[CScript]:
+        """
+        The script that is hashed into p2sh and p2wsh outputs, None for the other types
+        """
+        if self._redeem_script is None and self.type in ("p2sh", "p2wsh"):
+            self._redeem_script = CScript([self.pub, OP_CHECKSIG])
+        return self._redeem_script
+
+    @property
+    def witness_program(self) -> Optional[CScript]:
+        return self.redeem_script if self.type == "p2wsh" else None
+
+    @property
+    def script_pubkey(self) -> CScript:
+        if self._script_pubkey is None:
+            if self.type == "p2pkh":
+                self._script_pubkey = CScript([OP_DUP, OP_HASH160, self.pub_hash, OP_EQUALVERIFY, OP_CHECKSIG])
+            elif self.type == "p2sh":
+                if self._script_hash is None:
+                    self._script_hash = Hash160(self.redeem_script)
+                self._script_pubkey = CScript([OP_HASH160, self._script_hash, OP_EQUAL])
+            elif self.type == "p2wpkh":
+                self._script_pubkey = CScript([OP_0, self.pub_hash])
+            else:
+                if self._script_hash is None:
+                    self._script_hash = hashlib.sha256(self.redeem_script).digest()
+                self._script_pubkey = CScript([OP_0, self._script_hash])
+        return self._script_pubkey
+
+    @property
+    def script_code(self) -> CScript:
+        """
+        The script that signatures of inputs spending this address commit to
+        """
+        if self.type in ("p2pkh", "p2wpkh"):
+            # for p2wpkh, this is the p2pkh script of the key hash (BIP 143)
+            return CScript([OP_DUP, OP_HASH160, self.pub_hash, OP_EQUALVERIFY, OP_CHECKSIG])
+        return self.redeem_script
+
+    @property
+    def address(self):
+        if self._address is None:
+            self._address = ADDRESS_CLASSES[self.type].from_scriptPubKey(self.script_pubkey)
+        return self._address
 
     @staticmethod
     def compute_key(key_index: int) -> CBitcoinSecret:
@@ -49,11 +122,85 @@ class Address(object):
         h = hashlib.sha256(bytes(key_index)).digest()
         return CBitcoinSecret.from_secret_bytes(h)
 
+    @classmethod
+    def from_record(cls, record: AddressRecord, address_type: str = "p2pkh"):
+        """
+        Creates an address object from a precomputed record, without any elliptic curve operations.
+        """
+        c = cls(None, address_type, record.pub)
+        c._secret = record.secret
+        c._pub_hash = record.pub_hash
+        if address_type == "p2sh":
+            c._script_hash = record.script_hash
+        elif address_type == "p2wsh":
+            c._script_hash = record.witness_script_hash
+        return c
+
     @classmethod
     def from_key_index(cls, key_index, address_type: str = "p2pkh"):
         """
-        Creates an address object based on a key index.
+        Creates an address object based on a key index. The key is taken from the active pool if it contains the index.
         """
-        c = cls(cls.compute_key(key_index), address_type)
+        record = cls.pool.get(key_index) if cls.pool is not None else None
+        if record is None:
+            c = cls(cls.compute_key(key_index), address_type)
+        else:
+            c = cls.from_record(record, address_type)
         c.key_index = key_index
         return c
+
+
+ADDRESS_CLASSES = {"p2pkh": P2PKHBitcoinAddress, "p2sh": P2SHBitcoinAddress, "p2wpkh": P2WPKHBitcoinAddress,
+                   "p2wsh": P2WSHBitcoinAddress}
+
+
+class AddressLedger(object):
+    """
+    Keeps count of the addresses handed out by the generators, per type, and detects key indices that are handed out
+    twice. Key indices are recorded in a sparse bitmap: one page of PAGE_SIZE bits per range of indices that is in use,
+    so memory does not grow with the number of addresses of a generator. The `Workload` derives its keys differently
+    and is not recorded.
+    """
+    PAGE_SIZE = 1 << 16
+
+    def __init__(self, drop_spent: bool = False):
+        """
+        :param drop_spent: generators forget addresses once they are spent, instead of keeping them for the whole run
+        """
+        self.drop_spent = drop_spent
+        self.counts = {address_type: 0 for address_type in ADDRESS_TYPES}
+        self.duplicates = 0
+        self.pages = {}  # type: Dict[int, bytearray]
+
+    def add(self, key_index: int, address_type: str):
+        self.counts[address_type] += 1
+        page_no, bit = divmod(key_index, self.PAGE_SIZE)
+        page = self.pages.get(page_no)
+        if page is None:
+            page = self.pages[page_no] = bytearray(self.PAGE_SIZE // 8)
+        mask = 1 << (bit & 7)
+        if page[bit >> 3] & mask:
+            self.duplicates += 1
+        else:
+            page[bit >> 3] |= mask
+
+    def __contains__(self, key_index: int) -> bool:
+        page_no, bit = divmod(key_index, self.PAGE_SIZE)
+        page = self.pages.get(page_no)
+        return page is not None and bool(page[bit >> 3] & (1 << (bit & 7)))
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def to_dict(self) -> Dict:
+        return {
+            "counts": self.counts,
+            "duplicates": self.duplicates,
+            "pages": [[page_no, base64.b64encode(zlib.compress(bytes(page))).decode()]
+                      for page_no, page in sorted(self.pages.items())],
+        }
+
+    def load_dict(self, state: Dict):
+        self.counts = dict(state["counts"])
+        self.duplicates = state["duplicates"]
+        self.pages = {page_no: bytearray(zlib.decompress(base64.b64decode(page))) for page_no, page in state["pages"]}
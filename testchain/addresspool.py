@@ -0,0 +1,122 @@
+import hashlib
+import mmap
+import os
+import struct
+from bisect import bisect_right
+from collections import namedtuple
+from typing import List, Optional, Tuple
+
+from bitcointx.core import Hash160
+from bitcointx.core.script import CScript, OP_CHECKSIG
+from bitcointx.wallet import CBitcoinSecret
+
+from testchain.util import spawn_pool
+
+MAGIC = b"TCAP"
+VERSION = 1
+HEADER = struct.Struct("<4sII")  # magic, version, number of segments
+SEGMENT = struct.Struct("<QQQ")  # first key index, number of keys, file offset of the first record
+# secret, compressed public key, hash160(pub), hash160(p2sh redeem script), sha256(p2wsh witness script)
+RECORD = struct.Struct("<32s33s20s20s32s")
+# number of keys a worker derives per task
+CHUNK_SIZE = 256
+
+AddressRecord = namedtuple("AddressRecord", ["secret", "pub", "pub_hash", "script_hash", "witness_script_hash"])
+
+
+class AddressPoolFormatError(Exception):
+    """The file is not an address pool"""
+
+
+def derive_records(start: int, count: int) -> bytes:
+    """
+    Derives the keys `start` to `start + count - 1` the same way as `Address.compute_key`.
+    The secret of key index i is sha256 over i zero bytes, so the hash state is carried over from one index to the next
+    instead of hashing the whole buffer for every key.
+    :return: the packed records
+    """
+    h = hashlib.sha256(bytes(start))
+    records = bytearray()
+    for _ in range(count):
+        secret = h.digest()
+        pub = CBitcoinSecret.from_secret_bytes(secret).pub
+        script = CScript([pub, OP_CHECKSIG])
+        records += RECORD.pack(secret, pub, Hash160(pub), Hash160(script), hashlib.sha256(script).digest())
+        h.update(b"\x00")
+    return bytes(records)
+
+
+def build_pool(path: str, ranges: List[Tuple[int, int]], processes: Optional[int] = None):
+    """
+    Precomputes the keys of the given index ranges using a pool of worker processes and writes them to `path`.
+    :param ranges: pairs of first key index and number of keys, must not overlap
+    :param processes: number of worker processes (default: number of CPUs)
+    """
+    ranges = sorted(ranges)
+    for (start, count), (next_start, _) in zip(ranges, ranges[1:]):
+        if start + count > next_start:
+            raise ValueError("Key index ranges overlap: {} and {}".format(start, next_start))
+
+    tasks = [(i, min(CHUNK_SIZE, start + count - i)) for start, count in ranges
+             for i in range(start, start + count, CHUNK_SIZE)]
+    if processes == 1 or len(tasks) <= 1:
+        chunks = [derive_records(*task) for task in tasks]
+    else:
+        with spawn_pool(processes) as pool:
+            chunks = pool.starmap(derive_records, tasks)
+
+    offset = HEADER.size + SEGMENT.size * len(ranges)
+    tmp_path = "{}.tmp-{}".format(path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(ranges)))
+        for start, count in ranges:
+            f.write(SEGMENT.pack(start, count, offset))
+            offset += count * RECORD.size
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp_path, path)
+
+
+class AddressPool(object):
+    """
+    Read-only view of a precomputed key table. The file is memory-mapped, so opening it is cheap and records are only
+    read when they are looked up.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_segments = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise AddressPoolFormatError("{} is not an address pool (version {})".format(path, VERSION))
+        self._segments = [SEGMENT.unpack_from(self._map, HEADER.size + i * SEGMENT.size) for i in range(n_segments)]
+        self._starts = [s[0] for s in self._segments]
+
+    def _position(self, key_index: int) -> Optional[int]:
+        idx = bisect_right(self._starts, key_index) - 1
+        if idx < 0:
+            return None
+        start, count, offset = self._segments[idx]
+        if key_index >= start + count:
+            return None
+        return offset + (key_index - start) * RECORD.size
+
+    def __contains__(self, key_index: int) -> bool:
+        return self._position(key_index) is not None
+
+    def __len__(self) -> int:
+        return sum(s[1] for s in self._segments)
+
+    def get(self, key_index: int) -> Optional[AddressRecord]:
+        """
+        :return: the precomputed record of `key_index`, or None if it is not part of the table
+        """
+        position = self._position(key_index)
+        if position is None:
+            return None
+        return AddressRecord(*RECORD.unpack_from(self._map, position))
+
+    def close(self):
+        self._map.close()
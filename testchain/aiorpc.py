@@ -0,0 +1,132 @@
+import asyncio
+import base64
+import json
+import time
+from typing import List, Optional
+
+import bitcointx.rpc
+
+
+class AsyncRPCClient(object):
+    """
+    Asyncio JSON-RPC client for bitcoind. Requests are sent over a pool of persistent HTTP/1.1 connections, so
+    independent calls can be in flight at the same time without paying for a new connection each time.
+
+    The client owns its event loop; synchronous code drives coroutines with `run()`.
+    """
+
+    def __init__(self, host: str, port: int, user: str, password: str, pool_size: int = 8):
+        self.host = host
+        self.port = port
+        self.auth = "Basic " + base64.b64encode("{}:{}".format(user, password).encode()).decode()
+        self.pool_size = pool_size
+        self.loop = asyncio.new_event_loop()
+        self._idle = []  # type: List[asyncio.StreamWriter]
+        self._readers = {}
+        self._slots = None  # type: Optional[asyncio.Semaphore]
+        self._id = 0
+        # optional `RpcTracer` that records the calls
+        self.tracer = None
+
+    @classmethod
+    def from_conf(cls, conf_file: str, pool_size: int = 8):
+        conf = {}
+        with open(conf_file) as f:
+            for line in f:
+                line = line.split("#", 1)[0]
+                if "=" in line:
+                    k, v = line.split("=", 1)
+                    conf[k.strip()] = v.strip()
+        return cls(conf.get("rpcconnect", "127.0.0.1"), int(conf["rpcport"]), conf.get("rpcuser", ""),
+                   conf.get("rpcpassword", ""), pool_size)
+
+    def run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def disconnect(self):
+        """
+        Closes the idle connections, e.g. before the node is restarted.
+        """
+        for writer in self._idle:
+            writer.close()
+        self._idle = []
+        self._readers = {}
+
+    def close(self):
+        self.disconnect()
+        self.loop.close()
+
+    async def _acquire(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        await self._slots.acquire()
+        if self._idle:
+            writer = self._idle.pop()
+            return self._readers[writer], writer
+        try:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        except Exception:
+            self._slots.release()
+            raise
+        self._readers[writer] = reader
+        return reader, writer
+
+    def _release(self, writer: asyncio.StreamWriter, reusable: bool):
+        if reusable:
+            self._idle.append(writer)
+        else:
+            self._readers.pop(writer, None)
+            writer.close()
+        self._slots.release()
+
+    async def _read_response(self, reader: asyncio.StreamReader):
+        status = await reader.readline()
+        if not status:
+            raise ConnectionResetError("Connection closed by node")
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            k, v = line.split(":", 1)
+            headers[k.strip().lower()] = v.strip()
+        if headers.get("transfer-encoding") == "chunked":
+            body = b""
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                chunk = await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                body += chunk[:-2]
+        else:
+            body = await reader.readexactly(int(headers["content-length"]))
+        keep_alive = headers.get("connection", "").lower() != "close"
+        return status.decode("latin-1").strip(), body, keep_alive
+
+    async def call(self, method: str, *params):
+        self._id += 1
+        body = json.dumps({"version": "1.1", "method": method, "params": params, "id": self._id}).encode()
+        request = ("POST / HTTP/1.1\r\nHost: {}\r\nAuthorization: {}\r\nContent-Type: application/json\r\n"
+                   "Content-Length: {}\r\nConnection: keep-alive\r\n\r\n"
+                   .format(self.host, self.auth, len(body))).encode() + body
+
+        reader, writer = await self._acquire()
+        reusable = False
+        started = time.perf_counter()
+        try:
+            writer.write(request)
+            await writer.drain()
+            status, data, reusable = await self._read_response(reader)
+        finally:
+            self._release(writer, reusable)
+            if self.tracer is not None:
+                self.tracer.record(method, started, time.perf_counter() - started)
+
+        try:
+            response = json.loads(data.decode())
+        except ValueError:
+            raise bitcointx.rpc.JSONRPCError(
+                {"code": -342, "message": "non-JSON HTTP response with '{}' from server".format(status)})
+        if response.get("error") is not None:
+            raise bitcointx.rpc.JSONRPCError(response["error"])
+        return response["result"]
@@ -0,0 +1,133 @@
+from typing import Callable, List, Optional
+
+import bitcointx.rpc
+from bitcointx.core import CTransaction, b2lx, b2x, lx
+
+
+class BatchCallError(Exception):
+    """Raised when a call that was sent as part of a JSON-RPC batch failed."""
+
+    def __init__(self, method: str, params: List, error: bitcointx.rpc.JSONRPCError):
+        super().__init__("{}{} failed: {}".format(method, tuple(params), error))
+        self.method = method
+        self.params = params
+        self.error = error
+
+
+class TransactionRejectedError(BatchCallError):
+    """Raised when the node rejected a transaction that was queued by `BatchingProxy.sendrawtransaction`."""
+
+    def __init__(self, txid: bytes, position: int, method: str, params: List, error: bitcointx.rpc.JSONRPCError):
+        super().__init__(method, params, error)
+        self.txid = txid
+        self.position = position
+        self.args = ("Transaction {} (call {} of the batch) was rejected: {}".format(b2lx(txid), position, error),)
+
+
+class PendingCall(object):
+    """
+    A queued RPC call. Its result (or error) is available once the batch it belongs to has been sent.
+    """
+
+    def __init__(self, method: str, params: List, convert: Optional[Callable] = None, txid: Optional[bytes] = None):
+        """
+        :param txid: txid of a queued transaction, its error names the txid
+        """
+        self.method = method
+        self.params = params
+        self.convert = convert
+        self.txid = txid
+        self.done = False
+        self.result_value = None
+        self.error = None  # type: Optional[BatchCallError]
+
+    def resolve(self, response):
+        self.done = True
+        if response.get("error") is not None:
+            self.error = BatchCallError(self.method, self.params, bitcointx.rpc.JSONRPCError(response["error"]))
+        elif self.convert is not None:
+            self.result_value = self.convert(response["result"])
+        else:
+            self.result_value = response["result"]
+
+    def result(self):
+        if not self.done:
+            raise RuntimeError("{} has not been sent yet".format(self.method))
+        if self.error is not None:
+            raise self.error
+        return self.result_value
+
+
+class BatchingProxy(object):
+    """
+    Wraps a `bitcointx.rpc.Proxy` and queues calls whose results are not needed right away (transactions that only
+    have to reach the mempool before the next block, mocktime updates). Queued calls are sent as a single JSON-RPC
+    batch together with the next call that needs an answer, e.g. `generatetoaddress`.
+    """
+    DEFERRED = {"sendrawtransaction", "setmocktime"}
+
+    def __init__(self, proxy: bitcointx.rpc.Proxy, max_batch_size: int = 1000):
+        self.proxy = proxy
+        self.max_batch_size = max_batch_size
+        self.queue = []  # type: List[PendingCall]
+
+    def queue_call(self, method: str, *params, convert: Optional[Callable] = None,
+                   txid: Optional[bytes] = None) -> PendingCall:
+        pending = PendingCall(method, list(params), convert, txid)
+        self.queue.append(pending)
+        if len(self.queue) >= self.max_batch_size:
+            self.flush()
+        return pending
+
+    def flush(self):
+        """
+        Sends all queued calls in one batch and maps the responses back to them.
+        Raises the error of the first failed call, after all calls have been resolved. A failed transaction raises a
+        `TransactionRejectedError` with its txid and position in the batch.
+        """
+        if not self.queue:
+            return
+        queue, self.queue = self.queue, []
+        requests = [{"version": "1.1", "method": p.method, "params": p.params, "id": idx} for idx, p in enumerate(queue)]
+        for response in self.proxy._batch(requests):
+            queue[response["id"]].resolve(response)
+        for position, pending in enumerate(queue):
+            if not pending.done:
+                pending.error = BatchCallError(pending.method, pending.params, bitcointx.rpc.JSONRPCError(
+                    {"code": -343, "message": "missing JSON-RPC result"}))
+                pending.done = True
+            if pending.txid is not None and pending.error is not None:
+                e = pending.error
+                pending.error = TransactionRejectedError(pending.txid, position, e.method, e.params, e.error)
+        for pending in queue:
+            if pending.error is not None:
+                raise pending.error
+
+    def call(self, service_name: str, *args):
+        if service_name in self.DEFERRED:
+            self.queue_call(service_name, *args)
+            return None
+        pending = self.queue_call(service_name, *args)
+        self.flush()
+        return pending.result()
+
+    def sendrawtransaction(self, tx: CTransaction) -> bytes:
+        """
+        Queues the transaction. Its txid is computed locally, so the caller does not have to wait for the node.
+        A rejection is only known once the batch is sent: the next call that flushes the queue (e.g.
+        `generatetoaddress`) raises a `TransactionRejectedError` with the txid and its position in the batch.
+        """
+        txid = tx.GetTxid()
+        self.queue_call("sendrawtransaction", b2x(tx.serialize()), convert=lx, txid=txid)
+        return txid
+
+    def __getattr__(self, name: str):
+        # any other method of the proxy needs the node to be up to date
+        attr = getattr(self.proxy, name)
+        if not callable(attr):
+            return attr
+
+        def f(*args, **kwargs):
+            self.flush()
+            return attr(*args, **kwargs)
+        return f
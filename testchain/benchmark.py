@@ -0,0 +1,157 @@
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import tempfile
+import time
+from queue import Empty
+from typing import Dict, List, Optional
+
+from bitcointx.core import CBlock
+
+from testchain.blkfile import DISK_MAGIC, block_files, iter_records
+from testchain.generator import Generator
+from testchain.runner import Runner
+
+
+class BenchmarkRunner(Runner):
+    """
+    Runner that measures the wall time, the blocks and the RPC calls of every motif.
+    Checkpoints are not used, so every motif is actually executed.
+    """
+
+    def __init__(self, output_dir, chain, executable, **options):
+        options["cache_dir"] = None
+        super().__init__(output_dir, chain, executable, **options)
+        self.motif_results = []  # type: List[Dict]
+
+    def run_generator(self, generator: Generator):
+        calls = self.tracer.calls()
+        first_height = self.chain_state.height + 1
+        started = time.perf_counter()
+        super().run_generator(generator)
+        self.motif_results.append({
+            "name": type(generator).__name__,
+            "seconds": time.perf_counter() - started,
+            "first_height": first_height,
+            "last_height": self.chain_state.height,
+            "rpc_calls": dict(self.tracer.calls() - calls),
+        })
+
+
+def count_block_contents(blocks_dir: str, magic: bytes) -> Dict[int, List[int]]:
+    """
+    :return: height -> [number of transactions, number of signed (non-coinbase) inputs] of the blocks on disk
+    """
+    counts = {}
+    heights = {b"\x00" * 32: -1}
+    for file_no in block_files(blocks_dir):
+        with open(os.path.join(blocks_dir, "blk{:05d}.dat".format(file_no)), "rb") as f:
+            data = f.read()
+        for offset, length in iter_records(data, magic):
+            block = CBlock.deserialize(data[offset:offset + length])
+            height = heights[block.hashPrevBlock] + 1
+            heights[block.GetHash()] = height
+            counts[height] = [len(block.vtx), sum(len(tx.vin) for tx in block.vtx[1:])]
+    return counts
+
+
+def add_block_counts(motif_results: List[Dict], counts: Dict[int, List[int]]):
+    """
+    Adds the blocks, transactions and signatures (and their rates) of its heights to the result of every motif.
+    :param counts: as returned by `count_block_contents`
+    """
+    for result in motif_results:
+        heights = range(result["first_height"], result["last_height"] + 1)
+        seconds = result["seconds"]
+        result["blocks"] = len(heights)
+        result["transactions"] = sum(counts[h][0] for h in heights if h in counts)
+        result["signatures"] = sum(counts[h][1] for h in heights if h in counts)
+        for key in ["blocks", "transactions", "signatures"]:
+            result["{}_per_second".format(key)] = result[key] / seconds if seconds > 0 else None
+
+
+def _peak_rss_kb(who) -> int:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(who).ru_maxrss
+
+
+def run_benchmark(chain: str, executable: str, motifs: List[type], scale: float = 1, **options) -> Dict:
+    """
+    Generates a chain with the given motifs and returns the measurements.
+    Should run in a fresh process, so the peak RSS belongs to this run only.
+    """
+    output_dir = tempfile.mkdtemp(prefix="testchain-benchmark-")
+    started = time.perf_counter()
+    runner = BenchmarkRunner(output_dir, chain, executable, scale=scale, **options)
+    for motif in motifs:
+        runner.add_generator(motif)
+    runner.run()
+    total_seconds = time.perf_counter() - started
+    if runner.node is not None:
+        runner.node.stop()
+
+    counts = count_block_contents(os.path.join(output_dir, chain, "regtest", "blocks"), DISK_MAGIC[chain])
+    add_block_counts(runner.motif_results, counts)
+    return {
+        "chain": chain,
+        "scale": scale,
+        "options": {k: v for k, v in options.items() if k != "workload"},
+        "total_seconds": total_seconds,
+        "motifs": runner.motif_results,
+        "rpc_calls": dict(runner.tracer.calls()),
+        "rpc_latency": runner.tracer.summary(),
+        "peak_rss_kb": _peak_rss_kb(resource.RUSAGE_SELF),
+        "node_peak_rss_kb": _peak_rss_kb(resource.RUSAGE_CHILDREN),
+        "output_dir": output_dir,
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class BenchmarkError(Exception):
+    """Raised when a benchmark run did not finish"""
+
+
+def _run_benchmark_process(queue, *args, **kwargs):
+    queue.put(run_benchmark(*args, **kwargs))
+
+
+def run_benchmarks(chain: str, executable: str, motifs: List[type], scales: List[float], **options) -> Dict:
+    """
+    Runs one benchmark per scale, each in its own process. These are regular (not pool) processes, so they can start
+    signing workers themselves.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    runs = []
+    for scale in scales:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run_benchmark_process, args=(queue, chain, executable, motifs, scale),
+                           kwargs=options)
+        proc.start()
+        result = None
+        while result is None:
+            try:
+                result = queue.get(timeout=1)
+            except Empty:
+                if not proc.is_alive():
+                    break
+        proc.join()
+        if result is None:
+            raise BenchmarkError("Benchmark at scale {} failed with exit code {}".format(scale, proc.exitcode))
+        runs.append(result)
+    return {"revision": git_revision(), "timestamp": int(time.time()), "runs": runs}
+
+
+def write_results(results: Dict, path: Optional[str]):
+    if path is None:
+        print(json.dumps(results, indent=4))
+        return
+    with open(path, "w") as f:
+        json.dump(results, f, indent=4)
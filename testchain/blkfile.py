@@ -0,0 +1,95 @@
+import mmap
+import os
+import re
+import shutil
+import struct
+from typing import Iterator, List, Tuple
+
+# Magic in front of every record of the blk and rev files. On regtest it is the same for all chains, even where the
+# network magic differs (Bitcoin ABC uses dab5bffa on the wire)
+DISK_MAGIC = {"btc": bytes.fromhex("fabfb5da"), "bch": bytes.fromhex("fabfb5da"), "ltc": bytes.fromhex("fabfb5da")}
+BLK_FILE = re.compile(r"^blk(\d{5})\.dat$")
+# undo records are followed by a double-SHA256 checksum over the block hash and the undo data
+UNDO_CHECKSUM_SIZE = 32
+COPY_CHUNK_SIZE = 1 << 22
+
+
+def iter_records(data, magic: bytes, trailer: int = 0) -> Iterator[Tuple[int, int]]:
+    """
+    Walks the magic + length framing of a blk or rev file. Stops at the first position that does not start with
+    `magic` (bitcoind preallocates the files with zeros) or at a record that runs past the end of the data.
+    :param data: file contents, e.g. a memory map
+    :param trailer: number of bytes that follow every record (32 for rev files)
+    :return: offset and length of the payload of each record
+    """
+    offset = 0
+    end = len(data)
+    while offset + 8 <= end and data[offset:offset + 4] == magic:
+        length, = struct.unpack_from("<I", data, offset + 4)
+        if offset + 8 + length + trailer > end:
+            break
+        yield offset + 8, length
+        offset += 8 + length + trailer
+
+
+def used_length(data, magic: bytes, trailer: int = 0) -> int:
+    """
+    :return: the number of bytes taken up by complete records at the start of the file
+    """
+    used = 0
+    for offset, length in iter_records(data, magic, trailer):
+        used = offset + length + trailer
+    return used
+
+
+def copy_records(source: str, destination: str, magic: bytes, trailer: int = 0) -> int:
+    """
+    Copies the complete records of a blk or rev file, without the preallocated space behind them.
+    :return: the number of bytes copied
+    """
+    with open(source, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            used = 0
+            data = None
+        else:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            used = used_length(data, magic, trailer)
+        with open(destination, "wb") as dest:
+            for start in range(0, used, COPY_CHUNK_SIZE):
+                dest.write(data[start:min(start + COPY_CHUNK_SIZE, used)])
+        if data is not None:
+            data.close()
+    return used
+
+
+def block_files(blocks_dir: str) -> List[int]:
+    """
+    :return: the numbers of all blkNNNNN.dat files in the directory, in ascending order
+    """
+    numbers = [int(m.group(1)) for m in (BLK_FILE.match(name) for name in os.listdir(blocks_dir)) if m]
+    return sorted(numbers)
+
+
+def extract_block_files(blocks_dir: str, destination: str, magic: bytes, truncate: bool = True,
+                        include_undo: bool = False) -> List[str]:
+    """
+    Copies all blk files (and optionally the matching rev files) of a node's blocks directory.
+    :param truncate: only copy the used part of every file
+    :return: the names of the copied files
+    """
+    os.makedirs(destination, exist_ok=True)
+    copied = []
+    for number in block_files(blocks_dir):
+        names = [("blk{:05d}.dat".format(number), 0)]
+        if include_undo:
+            names.append(("rev{:05d}.dat".format(number), UNDO_CHECKSUM_SIZE))
+        for name, trailer in names:
+            source = os.path.join(blocks_dir, name)
+            if not os.path.exists(source):
+                continue
+            if truncate:
+                copy_records(source, os.path.join(destination, name), magic, trailer)
+            else:
+                shutil.copy(source, destination)
+            copied.append(name)
+    return copied
@@ -0,0 +1,133 @@
+import io
+import mmap
+import os
+import struct
+from collections import namedtuple
+from typing import List, Optional, Tuple
+
+from bitcointx.core import CTransaction, Hash
+from bitcointx.core.serialize import VarIntSerializer
+
+from testchain.blkfile import block_files, iter_records
+
+MAGIC = b"TCBI"
+VERSION = 1
+HEADER = struct.Struct("<4sIQQ")  # magic, version, number of blocks, number of transactions
+# height, block hash, blk file number, offset of the block in the file, block length, number of transactions
+BLOCK = struct.Struct("<I32sIQII")
+# txid, height of the block, offset of the transaction in the blk file
+TX = struct.Struct("<32sIQ")
+BLOCK_HEADER_SIZE = 80
+
+BlockRecord = namedtuple("BlockRecord", ["height", "hash", "file", "offset", "length", "tx_count"])
+
+
+class BlockIndexFormatError(Exception):
+    """The file is not a block index"""
+
+
+def scan_blocks(blocks_dir: str, magic: bytes) -> Tuple[List[BlockRecord], List[Tuple[bytes, int, int]]]:
+    """
+    Reads all blocks of the blk files in one pass. Heights are derived from the previous block hashes, so blocks may
+    appear in any order as long as parents come first.
+    :return: the block records in file order and the (txid, height, offset) of every transaction
+    """
+    heights = {b"\x00" * 32: -1}
+    blocks = []
+    txs = []
+    for file_no in block_files(blocks_dir):
+        with open(os.path.join(blocks_dir, "blk{:05d}.dat".format(file_no)), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                continue
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            for offset, length in iter_records(data, magic):
+                header = data[offset:offset + BLOCK_HEADER_SIZE]
+                block_hash = Hash(header)
+                height = heights[header[4:36]] + 1
+                heights[block_hash] = height
+                stream = io.BytesIO(data[offset + BLOCK_HEADER_SIZE:offset + length])
+                tx_count = VarIntSerializer.stream_deserialize(stream)
+                for _ in range(tx_count):
+                    tx_offset = offset + BLOCK_HEADER_SIZE + stream.tell()
+                    txs.append((CTransaction.stream_deserialize(stream).GetTxid(), height, tx_offset))
+                blocks.append(BlockRecord(height, block_hash, file_no, offset, length, tx_count))
+            data.close()
+    return blocks, txs
+
+
+def write_block_index(path: str, blocks_dir: str, magic: bytes):
+    """
+    Writes the index of the blk files in `blocks_dir`: the header, the block table sorted by height and the
+    transaction table sorted by txid. Hashes are stored in internal byte order.
+    """
+    blocks, txs = scan_blocks(blocks_dir, magic)
+    blocks.sort(key=lambda b: b.height)
+    txs.sort()
+    tmp_path = "{}.tmp-{}".format(path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(blocks), len(txs)))
+        for block in blocks:
+            f.write(BLOCK.pack(*block))
+        for tx in txs:
+            f.write(TX.pack(*tx))
+    os.replace(tmp_path, path)
+
+
+class BlockIndex(object):
+    """
+    Memory-mapped reader for files written by `write_block_index`.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.n_blocks, self.n_txs = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise BlockIndexFormatError("{} is not a block index (version {})".format(path, VERSION))
+        self._txs_start = HEADER.size + self.n_blocks * BLOCK.size
+
+    def __len__(self) -> int:
+        return self.n_blocks
+
+    def block(self, i: int) -> BlockRecord:
+        if not 0 <= i < self.n_blocks:
+            raise IndexError(i)
+        return BlockRecord(*BLOCK.unpack_from(self._map, HEADER.size + i * BLOCK.size))
+
+    def blocks_at(self, height: int) -> List[BlockRecord]:
+        """
+        :return: all blocks at `height`, more than one if the files contain stale blocks
+        """
+        lo, hi = 0, self.n_blocks
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.block(mid).height < height:
+                lo = mid + 1
+            else:
+                hi = mid
+        blocks = []
+        while lo < self.n_blocks and self.block(lo).height == height:
+            blocks.append(self.block(lo))
+            lo += 1
+        return blocks
+
+    def find_tx(self, txid: bytes) -> Optional[Tuple[int, int]]:
+        """
+        :param txid: txid in internal byte order
+        :return: the height of the block and the offset of the transaction in its blk file, or None
+        """
+        lo, hi = 0, self.n_txs
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry, height, offset = TX.unpack_from(self._map, self._txs_start + mid * TX.size)
+            if entry < txid:
+                lo = mid + 1
+            elif entry > txid:
+                hi = mid
+            else:
+                return height, offset
+        return None
+
+    def close(self):
+        self._map.close()
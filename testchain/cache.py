@@ -0,0 +1,125 @@
+import hashlib
+import inspect
+import json
+import os
+import shutil
+from typing import Dict, List, Optional
+
+# Files in the network directory that belong to the running node and must not be carried over
+VOLATILE_FILES = shutil.ignore_patterns(".lock", ".cookie", "debug.log")
+
+
+def cache_key(**parts) -> str:
+    """
+    Hashes the given JSON-serializable parts into a hex cache key.
+    """
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def source_hash(obj) -> str:
+    """
+    Hashes the source code of a module or class.
+    """
+    return hashlib.sha256(inspect.getsource(obj).encode()).hexdigest()
+
+
+class SnapshotCache(object):
+    """
+    Stores copies of a node's network directory (blocks, chainstate, wallet) together with the runner state at the
+    time the copy was taken. The node must not be running while a snapshot is saved or restored.
+    """
+
+    def __init__(self, cache_dir: str, network: str = "regtest"):
+        self.cache_dir = os.path.join(cache_dir, "snapshots")
+        self.network = network
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(os.path.join(self._path(key), "state.json"))
+
+    def save(self, key: str, datadir: str, state: Dict):
+        """
+        Copies the network directory of `datadir` into the cache and stores `state` alongside it.
+        The snapshot is written to a temporary directory first, so concurrent or aborted runs never leave a partial
+        snapshot behind.
+        """
+        path = self._path(key)
+        tmp_path = "{}.tmp-{}".format(path, os.getpid())
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        shutil.copytree(os.path.join(datadir, self.network), os.path.join(tmp_path, self.network),
+                        ignore=VOLATILE_FILES)
+        with open(os.path.join(tmp_path, "state.json"), "w") as f:
+            json.dump(state, f)
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # another process stored the same snapshot in the meantime
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def restore(self, key: str, datadir: str) -> Optional[Dict]:
+        """
+        Replaces the network directory of `datadir` with the snapshot stored under `key`.
+        :return: the stored state, or None if there is no snapshot for `key`
+        """
+        if not self.has(key):
+            return None
+        path = self._path(key)
+        target = os.path.join(datadir, self.network)
+        shutil.rmtree(target, ignore_errors=True)
+        shutil.copytree(os.path.join(path, self.network), target)
+        with open(os.path.join(path, "state.json")) as f:
+            return json.load(f)
+
+
+class OutputCache(object):
+    """
+    Stores the files written by a complete run (blk files, output.json, cospends.txt, ...), so an unchanged run can
+    restore them without starting a node. Entries are keyed by everything that determines the output.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = os.path.join(cache_dir, "outputs")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def has(self, key: str) -> bool:
+        return os.path.exists(os.path.join(self._path(key), "files.json"))
+
+    def save(self, key: str, output_dir: str, files: List[str]):
+        """
+        Copies `files` (paths relative to `output_dir`) into the cache. Like snapshots, the entry is written to a
+        temporary directory first.
+        """
+        path = self._path(key)
+        tmp_path = "{}.tmp-{}".format(path, os.getpid())
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        for name in files:
+            target = os.path.join(tmp_path, "files", name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(os.path.join(output_dir, name), target)
+        with open(os.path.join(tmp_path, "files.json"), "w") as f:
+            json.dump(files, f)
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # another process stored the same output in the meantime
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def restore(self, key: str, output_dir: str) -> Optional[List[str]]:
+        """
+        Copies the files stored under `key` into `output_dir`.
+        :return: the restored files, or None if there is no entry for `key`
+        """
+        if not self.has(key):
+            return None
+        path = self._path(key)
+        with open(os.path.join(path, "files.json")) as f:
+            files = json.load(f)
+        for name in files:
+            target = os.path.join(output_dir, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(os.path.join(path, "files", name), target)
+        return files
@@ -0,0 +1,151 @@
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+from bitcointx.core import CBlock, CTransaction, COutPoint, b2x, lx, x
+
+COINBASE_MATURITY = 100
+
+
+class NoSpendableOutputError(Exception):
+    """Raised when no mature output of the mining address is large enough to fund a transaction."""
+
+
+class ChainState(object):
+    """
+    Mirrors the parts of the node's state that the generators need: block height, tip, mocktime and the spendable
+    outputs of the mining address. It is updated from the results of the calls that change the chain, so the node only
+    has to be asked for the coinbase transactions that are actually spent.
+    """
+
+    def __init__(self, proxy, mocktime: int, script_pub_key: bytes):
+        self.proxy = proxy
+        self.mocktime = mocktime
+        self.script_pub_key = bytes(script_pub_key)
+        self.height = 0
+        self.tip = None  # type: Optional[bytes]
+        # confirmed outputs of the mining address, grouped by height: height -> {(txid, n): value}
+        self._confirmed = {}  # type: Dict[int, Dict[Tuple[bytes, int], int]]
+        self._heights = []  # type: List[int]
+        self._outpoint_heights = {}  # type: Dict[Tuple[bytes, int], int]
+        # blocks whose coinbase pays the mining address, but has not been fetched yet: height -> block hash
+        self._coinbase_blocks = {}  # type: Dict[int, bytes]
+        # unconfirmed outputs of the mining address: txid -> {n: value}
+        self._unconfirmed = {}  # type: Dict[bytes, Dict[int, int]]
+
+    def _add_height(self, height: int):
+        if height not in self._confirmed:
+            self._confirmed[height] = {}
+            insort(self._heights, height)
+
+    def _add_confirmed(self, height: int, outpoint: Tuple[bytes, int], value: int):
+        self._add_height(height)
+        self._confirmed[height][outpoint] = value
+        self._outpoint_heights[outpoint] = height
+
+    def _spend(self, outpoint: Tuple[bytes, int]):
+        height = self._outpoint_heights.pop(outpoint, None)
+        if height is None:
+            return
+        outputs = self._confirmed[height]
+        del outputs[outpoint]
+        if not outputs and height not in self._coinbase_blocks:
+            del self._confirmed[height]
+            del self._heights[bisect_left(self._heights, height)]
+
+    def _add_outputs(self, tx: CTransaction, height: Optional[int]):
+        txid = tx.GetTxid()
+        for n, out in enumerate(tx.vout):
+            if bytes(out.scriptPubKey) == self.script_pub_key:
+                if height is None:
+                    self._unconfirmed.setdefault(txid, {})[n] = out.nValue
+                else:
+                    self._add_confirmed(height, (txid, n), out.nValue)
+
+    def _resolve_coinbase(self, height: int):
+        block_hash = self._coinbase_blocks.pop(height, None)
+        if block_hash is not None:
+            self._add_outputs(self.proxy.getblock(block_hash).vtx[0], height)
+
+    def advance_time(self, seconds: int = 600) -> int:
+        self.mocktime += seconds
+        return self.mocktime
+
+    def connect_blocks(self, block_hashes: List[str], spendable_coinbase: bool):
+        """
+        Records blocks mined with `generatetoaddress`. They confirm all pending transactions.
+        :param block_hashes: hashes as returned by the node
+        :param spendable_coinbase: whether the coinbases pay the mining address
+        """
+        for block_hash in block_hashes:
+            self.height += 1
+            self.tip = lx(block_hash)
+            if self._unconfirmed:
+                for txid, outputs in self._unconfirmed.items():
+                    for n, value in outputs.items():
+                        self._add_confirmed(self.height, (txid, n), value)
+                self._unconfirmed = {}
+            if spendable_coinbase:
+                self._coinbase_blocks[self.height] = self.tip
+                self._add_height(self.height)
+
+    def connect_block(self, block: CBlock):
+        """
+        Records a block that was built and submitted by a generator. Only its own transactions are confirmed.
+        """
+        self.height += 1
+        self.tip = block.GetHash()
+        self._add_outputs(block.vtx[0], self.height)
+        for tx in block.vtx[1:]:
+            outputs = self._unconfirmed.pop(tx.GetTxid(), {})
+            for n, value in outputs.items():
+                self._add_confirmed(self.height, (tx.GetTxid(), n), value)
+
+    def add_transaction(self, tx: CTransaction):
+        """
+        Records a transaction that was sent to the mempool: its inputs are spent, outputs to the mining address become
+        spendable once they are confirmed.
+        """
+        for txin in tx.vin:
+            self._spend((txin.prevout.hash, txin.prevout.n))
+        self._add_outputs(tx, None)
+
+    def oldest_spendable(self, min_value: int) -> Tuple[COutPoint, int]:
+        """
+        Returns the output of the mining address with the most confirmations (at least 100) that is worth at least
+        `min_value` satoshi. Outputs with the same number of confirmations are ordered by txid, like the node wallet
+        orders them.
+        :return: the outpoint and its value in satoshi
+        """
+        max_height = self.height - COINBASE_MATURITY + 1
+        for height in self._heights:
+            if height > max_height:
+                break
+            self._resolve_coinbase(height)
+            outputs = self._confirmed[height]
+            for outpoint in sorted(outputs):
+                if outputs[outpoint] >= min_value:
+                    return COutPoint(*outpoint), outputs[outpoint]
+        raise NoSpendableOutputError("No mature output of the mining address is worth {} satoshi".format(min_value))
+
+    def to_dict(self) -> Dict:
+        return {
+            "mocktime": self.mocktime,
+            "height": self.height,
+            "tip": b2x(self.tip) if self.tip else None,
+            "confirmed": [[h, b2x(txid), n, v] for h in self._heights for (txid, n), v in self._confirmed[h].items()],
+            "coinbase_blocks": [[h, b2x(block_hash)] for h, block_hash in self._coinbase_blocks.items()],
+            "unconfirmed": [[b2x(txid), n, v] for txid, outputs in self._unconfirmed.items()
+                            for n, v in outputs.items()],
+        }
+
+    def load_dict(self, state: Dict):
+        self.mocktime = state["mocktime"]
+        self.height = state["height"]
+        self.tip = x(state["tip"]) if state["tip"] else None
+        for height, txid, n, value in state["confirmed"]:
+            self._add_confirmed(height, (x(txid), n), value)
+        for height, block_hash in state["coinbase_blocks"]:
+            self._coinbase_blocks[height] = x(block_hash)
+            self._add_height(height)
+        for txid, n, value in state["unconfirmed"]:
+            self._unconfirmed.setdefault(x(txid), {})[n] = value
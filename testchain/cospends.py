@@ -0,0 +1,118 @@
+import hashlib
+import mmap
+import os
+import struct
+from array import array
+from typing import Iterable, List, Optional
+
+MAGIC = b"TCCS"
+VERSION = 1
+HEADER = struct.Struct("<4sIQQ")  # magic, version, number of addresses, number of clusters
+ENTRY = struct.Struct("<32sI")  # sha256(scriptPubKey), cluster id
+
+
+class CospendIndexFormatError(Exception):
+    """The file is not a cospend index"""
+
+
+def script_hash(script_pub_key: bytes) -> bytes:
+    return hashlib.sha256(bytes(script_pub_key)).digest()
+
+
+def write_cospend_index(path: str, clusters: Iterable[List[bytes]]):
+    """
+    Writes the clusters in binary form. The file consists of
+      - the header
+      - the address table: (sha256(scriptPubKey), cluster id) entries sorted by hash
+      - n_clusters + 1 little-endian uint64 offsets into the member array; cluster i has the members
+        offsets[i] to offsets[i + 1] - 1
+      - the member array: uint32 row numbers into the address table
+    Cluster ids are assigned in the order of `clusters`.
+    :param clusters: scriptPubKeys of the members of each cluster
+    """
+    entries = []
+    for cluster_id, members in enumerate(clusters):
+        entries.extend((script_hash(script), cluster_id) for script in members)
+    n_clusters = entries[-1][1] + 1 if entries else 0
+    entries.sort()
+
+    counts = [0] * n_clusters
+    for _, cluster_id in entries:
+        counts[cluster_id] += 1
+    offsets = array("Q", [0] * (n_clusters + 1))
+    for i, count in enumerate(counts):
+        offsets[i + 1] = offsets[i] + count
+    members = array("I", [0] * len(entries))
+    fill = array("Q", offsets[:-1])
+    for row, (_, cluster_id) in enumerate(entries):
+        members[fill[cluster_id]] = row
+        fill[cluster_id] += 1
+
+    tmp_path = "{}.tmp-{}".format(path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(entries), n_clusters))
+        for entry in entries:
+            f.write(ENTRY.pack(*entry))
+        f.write(_little_endian(offsets).tobytes())
+        f.write(_little_endian(members).tobytes())
+    os.replace(tmp_path, path)
+
+
+def _little_endian(a: array) -> array:
+    if struct.pack("=H", 1) != struct.pack("<H", 1):
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a
+
+
+class CospendIndex(object):
+    """
+    Memory-mapped reader for files written by `write_cospend_index`. Looking up the cluster of an address is a binary
+    search over the address table.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.n_addresses, self.n_clusters = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise CospendIndexFormatError("{} is not a cospend index (version {})".format(path, VERSION))
+        self._offsets_start = HEADER.size + self.n_addresses * ENTRY.size
+        self._members_start = self._offsets_start + (self.n_clusters + 1) * 8
+
+    def __len__(self) -> int:
+        return self.n_clusters
+
+    def _entry(self, row: int):
+        return ENTRY.unpack_from(self._map, HEADER.size + row * ENTRY.size)
+
+    def cluster_of(self, script_pub_key: bytes) -> Optional[int]:
+        """
+        :return: the id of the cluster containing the address, or None if it was never cospent
+        """
+        target = script_hash(script_pub_key)
+        lo, hi = 0, self.n_addresses
+        while lo < hi:
+            mid = (lo + hi) // 2
+            h, cluster_id = self._entry(mid)
+            if h < target:
+                lo = mid + 1
+            elif h > target:
+                hi = mid
+            else:
+                return cluster_id
+        return None
+
+    def members(self, cluster_id: int) -> List[bytes]:
+        """
+        :return: the script hashes of the members of a cluster, in hash order
+        """
+        if not 0 <= cluster_id < self.n_clusters:
+            raise IndexError(cluster_id)
+        start, end = struct.unpack_from("<QQ", self._map, self._offsets_start + cluster_id * 8)
+        rows = struct.unpack_from("<{}I".format(end - start), self._map, self._members_start + start * 4)
+        return [self._entry(row)[0] for row in rows]
+
+    def close(self):
+        self._map.close()
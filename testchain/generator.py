@@ -1,13 +1,26 @@
-from typing import List, Callable, Dict
+import asyncio
+from typing import List, Callable, Dict, Optional, Tuple
 
 from logging import Logger
 import bitcointx.rpc
-from bitcointx.core import CMutableTxIn, CMutableTxOut, CMutableTransaction, COutPoint, CTxInWitness, CTxWitness, b2lx
-from bitcointx.core.script import CScript, CScriptWitness, OP_CHECKSIG, SignatureHash, SIGHASH_ALL, SIGVERSION_WITNESS_V0
+from bitcointx.core import CBlock, CMutableTxIn, CMutableTxOut, CMutableTransaction, COutPoint, CTxInWitness, \
+    CTxWitness, b2lx, b2x, lx
+from bitcointx.core.script import CScript, CScriptWitness
 from bitcointx.wallet import CBitcoinSecret
 
-from testchain.address import Address, UnsupportedAddressTypeError, COINBASE_KEY, COINBASE_ADDRESS, UNSPENDABLE_ADDRESS
-from testchain.util import Coin, DisjointSet
+from testchain.address import Address, AddressLedger, COINBASE_KEY, COINBASE_ADDRESS, UNSPENDABLE_ADDRESS
+from testchain.aiorpc import AsyncRPCClient
+from testchain.batch import BatchingProxy
+from testchain.chainstate import ChainState
+from testchain.sighash import SighashContext
+from testchain.signing import SigningPool, sign_input, sign_jobs
+from testchain.store import GroundTruthStore
+from testchain.txtable import TxTable
+from testchain.util import Amount, DisjointSet
+
+
+# fee of every transaction the generators create
+FEE = Amount(10000)
 
 
 class NoAddressError(Exception):
@@ -15,34 +28,66 @@ class NoAddressError(Exception):
 
 
 class Generator(object):
-    addresses: List[Address]
+    # addresses handed out by `next_address` by key index, spent ones are removed if the ledger drops them
+    addresses: Dict[int, Address]
 
     def run(self):
         raise NotImplementedError
 
-    def __init__(self, proxy: bitcointx.rpc.Proxy, chain, log: Logger, stored_hashes: Dict, offset: int,
-                 next_timestamp: Callable[[], int], cospends: DisjointSet):
+    def __init__(self, proxy: bitcointx.rpc.Proxy, chain, log: Logger, stored_hashes: GroundTruthStore, offset: int,
+                 next_timestamp: Callable[[], int], cospends: DisjointSet, chain_state: ChainState,
+                 async_client: Optional[AsyncRPCClient] = None, signing_pool: Optional[SigningPool] = None,
+                 scale: float = 1, motif_sizes: Optional[Dict[str, int]] = None,
+                 address_ledger: Optional[AddressLedger] = None, tx_table: Optional[TxTable] = None):
         self.proxy = proxy
+        self.scale = scale
+        self.motif_sizes = motif_sizes or {}
+        self.async_client = async_client
+        self.signing_pool = signing_pool
+        self.chain_state = chain_state
         self.chain = chain
         self.log = log
-        self.addresses = []
+        self.addresses = {}
+        self.address_ledger = address_ledger if address_ledger is not None else AddressLedger()
+        self._current = None  # type: Optional[Address]
         self.cospends = cospends
         self.offset = offset
         self.address_cursor = -1
         self.stored_hashes = stored_hashes
-        self.fee = 0.0001
+        self.tx_table = tx_table
+        self.fee = FEE
         self._next_timestamp = next_timestamp
         self.segwit = (self.chain == "btc") or (self.chain == "ltc")
 
+    def snapshot_params(self):
+        """
+        Parameters (as a JSON-serializable value) that influence the generator's output besides its source code.
+        They become part of the key under which the Runner checkpoints the chain after this generator.
+        """
+        if self.scale == 1 and not self.motif_sizes:
+            return None
+        return {"scale": self.scale, "motif_sizes": self.motif_sizes}
+
+    def size(self, name: str, default: int) -> int:
+        """
+        Returns the size of a motif: the override given for `name`, otherwise `default` multiplied by the scale factor.
+        :param name: name of the size, e.g. "fan"
+        :param default: size used in the default chain
+        """
+        if name in self.motif_sizes:
+            return self.motif_sizes[name]
+        return max(1, int(round(default * self.scale)))
+
     def log_value(self, k, v):
-        self.stored_hashes[k] = v
+        # amounts are stored in satoshi
+        self.stored_hashes[k] = v.satoshi if isinstance(v, Amount) else v
 
     def current_block_reward(self):
         """
         Returns the current reward the miner gets for each block.
         In regtest mode, the reward is halved after the first 150 blocks.
         """
-        return 50 if self.proxy.getblockcount() < 150 else 25
+        return 50 if self.chain_state.height < 150 else 25
 
     def _advance_time(self):
         """
@@ -55,56 +100,110 @@ class Generator(object):
     def generate_block(self, n: int = 1, spendable_coinbase=True):
         self._advance_time()
 
+        block_hashes = self.proxy.call("generatetoaddress", n, self._mining_address(spendable_coinbase))
+        self._log_blocks(block_hashes, spendable_coinbase)
+        return block_hashes
+
+    async def generate_block_async(self, n: int = 1, spendable_coinbase=True):
+        if self.async_client is None:
+            return self.generate_block(n, spendable_coinbase)
+        self._flush_batch()
+        await self.async_client.call("setmocktime", self._next_timestamp())
+        block_hashes = await self.async_client.call("generatetoaddress", n, self._mining_address(spendable_coinbase))
+        self._log_blocks(block_hashes, spendable_coinbase)
+        return block_hashes
+
+    @staticmethod
+    def _mining_address(spendable_coinbase):
         if spendable_coinbase:
-            address = COINBASE_ADDRESS
+            return COINBASE_ADDRESS
         else:
-            address = UNSPENDABLE_ADDRESS
+            return UNSPENDABLE_ADDRESS
 
-        block_hashes = self.proxy.call("generatetoaddress", n, address)
+    def _log_blocks(self, block_hashes, spendable_coinbase):
+        self.chain_state.connect_blocks(block_hashes, spendable_coinbase)
+        if self.tx_table is not None:
+            self._confirm_mined(block_hashes)
         if len(block_hashes) == 1:
             self.log.debug("Mined block: {}".format([x for x in block_hashes][0]))
         else:
             self.log.debug("Mined blocks: {}".format([x for x in block_hashes]))
-        return block_hashes
+
+    def _confirm_mined(self, block_hashes):
+        """
+        Adds the pending transactions to the tx table in the order of the blocks, which only the node knows for the
+        blocks it assembled. Blocks are only fetched while transactions are pending.
+        """
+        first_height = self.chain_state.height - len(block_hashes) + 1
+        for height, block_hash in enumerate(block_hashes, first_height):
+            if not self.tx_table.pending:
+                break
+            block = self.proxy.getblock(lx(block_hash))
+            self.tx_table.confirm(height, [tx.GetTxid() for tx in block.vtx[1:]])
 
     def next_address(self, address_type="p2pkh") -> Address:
         self.address_cursor += 1
-        self.addresses.append(Address.from_key_index(self.address_cursor + self.offset, address_type))
-        return self.addresses[self.address_cursor]
+        address = Address.from_key_index(self.address_cursor + self.offset, address_type)
+        self.address_ledger.add(address.key_index, address_type)
+        self.addresses[address.key_index] = address
+        self._current = address
+        return address
 
     def current_address(self) -> Address:
-        if self.address_cursor < 0:
+        if self._current is None:
             raise NoAddressError("No addresses exist yet. Create one using `next_address()`")
-        return self.addresses[self.address_cursor]
+        return self._current
 
-    def fund_address(self, address: Address, value: float):
+    def fund_address(self, address: Address, value: Amount):
         """
         Sends money to an address using a UTXO of the mining address
         :param address: the address that will receive the coins
         :param value: the value that the address will receive
         :return: the transaction id and
         """
+        tx, recipients = self._create_funding_transaction(address, value)
+        txid = self._send_transaction(tx, recipients)
+
+        self.log.debug("Address: {}".format(address.address))
+        self.log.debug("Tx: {}".format(txid))
+
+        return txid, address.vout
+
+    async def fund_address_async(self, address: Address, value: Amount):
+        tx, recipients = self._create_funding_transaction(address, value)
+        txid = await self._send_transaction_async(tx, recipients)
+        return txid, address.vout
+
+    def fund_addresses(self, funding: List[Tuple[Address, Amount]]) -> List[Tuple[str, int]]:
+        """
+        Funds several addresses. With an async RPC client, the funding transactions are in flight at the same time.
+        :param funding: pairs of address and value
+        :return: the transaction id and output index of every funding
+        """
+        if self.async_client is None:
+            return [self.fund_address(address, value) for address, value in funding]
+
+        async def fund_all():
+            return await asyncio.gather(*[self.fund_address_async(address, value) for address, value in funding])
+        return self.async_client.run(fund_all())
+
+    def _create_funding_transaction(self, address: Address, value: Amount):
         key = CBitcoinSecret(COINBASE_KEY)
         coinbase_addr = Address(key)
 
-        unspents = self.proxy.listunspent(minconf=100, addrs=[coinbase_addr.address])
-        unspents.sort(key=lambda x: x['confirmations'], reverse=True)
-        oldest_utxo = next(x for x in unspents if Coin.from_satoshi(x['amount']).bitcoin() >= value + self.fee)
+        outpoint, amount = self.chain_state.oldest_spendable((value + self.fee).satoshi)
 
-        coinbase_addr.txid = oldest_utxo['outpoint'].hash
-        coinbase_addr.vout = oldest_utxo['outpoint'].n
+        coinbase_addr.txid = outpoint.hash
+        coinbase_addr.vout = outpoint.n
 
-        coinbase_addr.value = Coin.from_satoshi(oldest_utxo['amount']).bitcoin()
+        coinbase_addr.value = Amount(amount)
         address.value = value
 
         # change address is always the second output
-        txid = self.create_transaction([coinbase_addr], [address, coinbase_addr],
-                                       values=[value, coinbase_addr.value - self.fee - value])
-
-        self.log.debug("Address: {}".format(address.address))
-        self.log.debug("Tx: {}".format(txid))
-
-        return txid, address.vout
+        recipients = [address, coinbase_addr]
+        tx = self._create_transaction([coinbase_addr], recipients, [value, coinbase_addr.value - self.fee - value],
+                                      n_locktime=0, n_sequence=0xffffffff)
+        return tx, recipients
 
     def create_transaction(self, sources: List[Address], recipients: List[Address], values=None, n_locktime=0,
                            n_sequence=0xffffffff):
@@ -112,7 +211,7 @@ class Generator(object):
         Creates a transaction using `sources` as inputs and `recipients` as outputs.
         :param sources: list of addresses to spend from
         :param recipients: list of addresses to send to
-        :param values: optional list of spend values
+        :param values: optional list of spend values (`Amount`s)
         :param n_locktime: locktime value of the transaction
         :param n_sequence: sequence no for inputs
         :return: the TXID of the transaction as returned by the proxy
@@ -120,9 +219,20 @@ class Generator(object):
         tx = self._create_transaction(sources, recipients, values, n_locktime=n_locktime, n_sequence=n_sequence)
         return self._send_transaction(tx, recipients)
 
+    async def create_transaction_async(self, sources: List[Address], recipients: List[Address], values=None,
+                                       n_locktime=0, n_sequence=0xffffffff):
+        """
+        Same as `create_transaction`, but the transaction is sent using the async RPC client.
+        """
+        tx = self._create_transaction(sources, recipients, values, n_locktime=n_locktime, n_sequence=n_sequence)
+        return await self._send_transaction_async(tx, recipients)
+
     def _create_transaction(self, sources: List[Address], recipients: List[Address], values, n_locktime, n_sequence):
         # save cospends
         self.cospends.union_all([str(x.address) for x in sources])
+        if self.address_ledger.drop_spent:
+            for source in sources:
+                self.addresses.pop(source.key_index, None)
 
         if not values:
             values = [recipient.value for recipient in recipients]
@@ -131,69 +241,84 @@ class Generator(object):
 
         cnt = 0
         for recipient, value in zip(recipients, values):
-            if value == 0:
+            if not value:
                 self.log.warning("Creating output with 0 BTC")
             recipient.vout = cnt
 
-            tx_outs.append(CMutableTxOut(Coin(value).satoshi(), recipient.address.to_scriptPubKey()))
+            tx_outs.append(CMutableTxOut(value.satoshi, recipient.script_pubkey))
             cnt += 1
 
         tx = CMutableTransaction(tx_ins, tx_outs, nLockTime=n_locktime)
 
-        in_idx = 0
-        witnesses = []
-        for txin, source in zip(tx_ins, sources):
-            key = source.key
+        jobs = [(source.script_code, in_idx, source.value.satoshi, source.key, source.type)
+                for in_idx, source in enumerate(sources)]
 
-            if source.type == 'p2pkh':
-                script = source.address.to_redeemScript()
-            elif source.type == 'p2sh':
-                script = CScript([key.pub, OP_CHECKSIG])
-            elif source.type == 'p2wpkh':
-                script = source.address.to_redeemScript()
-            elif source.type == 'p2wsh':
-                script = source.witness_program
-            else:
-                raise UnsupportedAddressTypeError()
-
-            # Create signature
-            amount = Coin(source.value).satoshi()
-            sig = self._sign(script, tx, in_idx, amount, key, source.type)
+        # Create signatures
+        if self.signing_pool is not None:
+            sigs = self.signing_pool.sign(self.chain, tx, jobs)
+        else:
+            sigs = sign_jobs(SighashContext(tx, self.chain), jobs)
 
+        witnesses = []
+        for txin, source, (script, _, _, _, _), sig in zip(tx_ins, sources, jobs, sigs):
             # Add signature to input or witness
             if source.type == 'p2pkh':
-                txin.scriptSig = CScript([sig, key.pub])
+                txin.scriptSig = CScript([sig, source.pub])
                 witnesses.append(CTxInWitness())
             elif source.type == 'p2sh':
                 txin.scriptSig = CScript([sig, script])
                 witnesses.append(CTxInWitness())
             elif source.type == 'p2wpkh':
                 txin.scriptSig = CScript()
-                witnesses.append(CTxInWitness(CScriptWitness([sig, key.pub])))
+                witnesses.append(CTxInWitness(CScriptWitness([sig, source.pub])))
             elif source.type == 'p2wsh':
                 txin.scriptSig = CScript()
                 witnesses.append(CTxInWitness(CScriptWitness([sig, script])))
-            in_idx += 1
 
         tx.wit = CTxWitness(witnesses)
         return tx
 
     def _send_transaction(self, tx: CMutableTransaction, recipients: List[Address]):
         txid = self.proxy.sendrawtransaction(tx)
+        self.chain_state.add_transaction(tx)
+        self._record_transaction(tx)
+        for rec in recipients:
+            rec.txid = txid
+        return b2lx(txid)
+
+    async def _send_transaction_async(self, tx: CMutableTransaction, recipients: List[Address]):
+        if self.async_client is None:
+            return self._send_transaction(tx, recipients)
+        self._flush_batch()
+        # record the spend before the first await, so concurrently built transactions pick other outputs
+        self.chain_state.add_transaction(tx)
+        self._record_transaction(tx)
+        txid = lx(await self.async_client.call("sendrawtransaction", b2x(tx.serialize())))
         for rec in recipients:
             rec.txid = txid
         return b2lx(txid)
 
+    def _record_transaction(self, tx: CMutableTransaction, height: Optional[int] = None):
+        if self.tx_table is not None:
+            self.tx_table.add(tx, type(self).__name__, height)
+
+    def _flush_batch(self):
+        # queued calls have to reach the node before anything sent around the batch
+        if isinstance(self.proxy, BatchingProxy):
+            self.proxy.flush()
+
+    def submit_block(self, block: CBlock):
+        """
+        Submits a block built by the generator.
+        :return: None if the node accepted the block, otherwise the reason for its rejection
+        """
+        result = self.proxy.submitblock(block)
+        if not result:
+            self.chain_state.connect_block(block)
+            if self.tx_table is not None:
+                self._record_transaction(block.vtx[0], self.chain_state.height)
+                self.tx_table.confirm(self.chain_state.height, [tx.GetTxid() for tx in block.vtx[1:]])
+        return result
+
     def _sign(self, script, tx, in_idx, amount, key, script_type="p2pkh"):
-        if self.chain == "bch":
-            sighash = SignatureHash(script, tx, in_idx, SIGHASH_ALL | 0x40, amount=amount,
-                                    sigversion=SIGVERSION_WITNESS_V0)
-            sig = key.sign(sighash) + bytes([SIGHASH_ALL | 0x40])
-        else:
-            if script_type == 'p2wpkh' or script_type == 'p2wsh':
-                sighash = SignatureHash(script, tx, in_idx, SIGHASH_ALL, amount=amount,
-                                        sigversion=SIGVERSION_WITNESS_V0)
-            else:
-                sighash = SignatureHash(script, tx, in_idx, SIGHASH_ALL)
-            sig = key.sign(sighash) + bytes([SIGHASH_ALL])
-        return sig
+        return sign_input(self.chain, script, tx, in_idx, amount, key, script_type)
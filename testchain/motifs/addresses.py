@@ -1,4 +1,5 @@
 from testchain.runner import Generator
+from testchain.util import Amount
 
 
 class Addresses(Generator):
@@ -11,15 +12,15 @@ class Addresses(Generator):
         """
         for i in range(3):
             address = self.next_address(address_type=addr_type)
-            txid, _ = self.fund_address(address, 1)
+            txid, _ = self.fund_address(address, Amount.from_btc(1))
 
             self._log_create_addresses(addr_type, i, address, txid)
 
             for j in range(1, i + 1):
                 if j > 1:
-                    self.fund_address(address, j)
+                    self.fund_address(address, Amount.from_btc(j))
                 dest = self.next_address()
-                dest.value = j - self.fee
+                dest.value = Amount.from_btc(j) - self.fee
                 self.create_transaction([address], [dest])
             self.generate_block()
 
@@ -27,7 +28,7 @@ class Addresses(Generator):
         self.log_value("address-{}-spend-{}".format(addr_type, idx), str(address.address))
         self.log_value("address-{}-spend-{}-value".format(addr_type, idx), 1)
         self.log_value("address-{}-spend-{}-tx".format(addr_type, idx), txid)
-        self.log_value("address-{}-spend-{}-height".format(addr_type, idx), self.proxy.getblockcount() + 1)
+        self.log_value("address-{}-spend-{}-height".format(addr_type, idx), self.chain_state.height + 1)
 
     def run(self):
         self.create_address("p2pkh")
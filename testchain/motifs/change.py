@@ -1,13 +1,13 @@
 import random
 from testchain.runner import Generator
-from testchain.util import Coin
+from testchain.util import Amount
 
 
 class Change(Generator):
 
     def create_power_of_ten_change(self):
         random.seed(20180919)
-        full_value = 2.11111111
+        full_value = Amount.from_btc(2.11111111)
         spend_value = 1.23456789
         for i in range(6):
             start_address = self.next_address()
@@ -15,7 +15,7 @@ class Change(Generator):
             self.generate_block()
 
             spend = self.next_address()
-            spend.value = float(str(spend_value)[:2 + i])
+            spend.value = Amount.from_btc(float(str(spend_value)[:2 + i]))
             change = self.next_address()
             change.value = full_value - spend.value - self.fee
 
@@ -35,14 +35,14 @@ class Change(Generator):
         for pos in range(2):
             in1 = self.next_address()
             in2 = self.next_address()
-            self.fund_address(in1, 1)
-            self.fund_address(in2, 2)
+            self.fund_address(in1, Amount.from_btc(1))
+            self.fund_address(in2, Amount.from_btc(2))
 
             spend = self.next_address()
-            spend.value = 2.9
+            spend.value = Amount.from_btc(2.9)
 
             change = self.next_address()
-            change.value = 0.1 - self.fee
+            change.value = Amount.from_btc(0.1) - self.fee
 
             if pos:
                 dest = [spend, change]
@@ -57,13 +57,13 @@ class Change(Generator):
     def create_address_type_change(self):
         for pos in range(3):
             in1 = self.next_address("p2pkh")
-            self.fund_address(in1, 3 + self.fee)
+            self.fund_address(in1, Amount.from_btc(3) + self.fee)
             change = self.next_address("p2pkh")
-            change.value = 1
+            change.value = Amount.from_btc(1)
             spend1 = self.next_address("p2sh")
-            spend1.value = 1
+            spend1.value = Amount.from_btc(1)
             spend2 = self.next_address("p2sh")
-            spend2.value = 1
+            spend2.value = Amount.from_btc(1)
 
             dest = [spend1, spend2]
             dest.insert(pos, change)
@@ -78,13 +78,13 @@ class Change(Generator):
     def create_locktime_change(self):
         for pos in range(3):
             start = self.next_address()
-            self.fund_address(start, 3 + self.fee)
+            self.fund_address(start, Amount.from_btc(3) + self.fee)
             change = self.next_address()
-            change.value = 1
+            change.value = Amount.from_btc(1)
             spend1 = self.next_address()
-            spend1.value = 1
+            spend1.value = Amount.from_btc(1)
             spend2 = self.next_address()
-            spend2.value = 1
+            spend2.value = Amount.from_btc(1)
 
             dest = [spend1, spend2]
             dest.insert(pos, change)
@@ -97,11 +97,11 @@ class Change(Generator):
 
             for x in [spend1, spend2]:
                 dummy = self.next_address()
-                dummy.value = 1 - self.fee
+                dummy.value = Amount.from_btc(1) - self.fee
                 self.create_transaction([x], [dummy])
 
             dummy_change = self.next_address()
-            dummy_change.value = 1 - self.fee
+            dummy_change.value = Amount.from_btc(1) - self.fee
 
             self.create_transaction([change], [dummy_change], n_locktime=111)
             self.generate_block()
@@ -109,17 +109,17 @@ class Change(Generator):
     def create_address_reuse_change(self):
         for pos in range(3):
             change = self.next_address()
-            self.fund_address(change, 3 + self.fee)
+            self.fund_address(change, Amount.from_btc(3) + self.fee)
 
             spend1 = self.next_address()
-            spend1.value = 1
+            spend1.value = Amount.from_btc(1)
 
             spend2 = self.next_address()
-            spend2.value = 1
+            spend2.value = Amount.from_btc(1)
 
             dest = [spend1, spend2]
             dest.insert(pos, change)
-            txid = self.create_transaction([change], dest, values=[1, 1, 1])
+            txid = self.create_transaction([change], dest, values=[Amount.from_btc(1)] * 3)
 
             self.log_value("change-reuse-tx-{}".format(pos), txid)
             self.log_value("change-reuse-position-{}".format(pos), pos)
@@ -128,19 +128,19 @@ class Change(Generator):
     def create_client_behavior_change(self):
         for pos in range(3):
             start = self.next_address()
-            self.fund_address(start, 3 + self.fee)
+            self.fund_address(start, Amount.from_btc(3) + self.fee)
 
             spend1 = self.next_address()
-            self.fund_address(spend1, 1)
+            self.fund_address(spend1, Amount.from_btc(1))
 
             spend2 = self.next_address()
-            self.fund_address(spend2, 1)
+            self.fund_address(spend2, Amount.from_btc(1))
             self.generate_block()
 
             change = self.next_address()
             dest = [spend1, spend2]
             dest.insert(pos, change)
-            txid = self.create_transaction([start], dest, values=[1, 1, 1])
+            txid = self.create_transaction([start], dest, values=[Amount.from_btc(1)] * 3)
             self.log_value("change-client-behavior-tx-{}".format(pos), txid)
             self.log_value("change-client-behavior-position-{}".format(pos), pos)
 
@@ -149,16 +149,16 @@ class Change(Generator):
     def create_negative_testcase(self):
         sources = [self.next_address() for _ in range(3)]
         for s in sources:
-            self.fund_address(s, 1 + self.fee)
+            self.fund_address(s, Amount.from_btc(1) + self.fee)
 
         destinations = [self.next_address() for _ in range(3)]
 
-        v0 = 1.488888
-        v1 = 1.511112
+        v0 = Amount.from_btc(1.488888)
+        v1 = Amount.from_btc(1.511112)
         txid = self.create_transaction(sources, destinations, values=[v0, v1])
 
-        self.log_value("change-negative-testcase-value-0", Coin(v0).satoshi())
-        self.log_value("change-negative-testcase-value-1", Coin(v1).satoshi())
+        self.log_value("change-negative-testcase-value-0", v0)
+        self.log_value("change-negative-testcase-value-1", v1)
         self.log_value("change-negative-testcase-tx", txid)
 
         self.generate_block()
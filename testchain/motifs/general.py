@@ -1,13 +1,18 @@
 from testchain.runner import Generator
+from testchain.address import COINBASE_ADDRESS
 
 
 class SetupChain(Generator):
+    blocks = 110
+
+    def snapshot_params(self):
+        return {"blocks": self.blocks, "coinbase": COINBASE_ADDRESS}
 
     def setup(self):
         """
         Generate 110 blocks, so we have 10 coinbase transactions to spend from.
         """
-        block_hashes = self.generate_block(110)
+        block_hashes = self.generate_block(self.blocks)
         self.log.info("Starting chain tip is {}".format(block_hashes[-1]))
 
     def run(self):
@@ -1,4 +1,5 @@
 from testchain.runner import Generator
+from testchain.util import Amount
 
 
 class Heuristics(Generator):
@@ -8,16 +9,15 @@ class Heuristics(Generator):
 
     def create_simple_coinjoin(self):
         in_1 = self.next_address()
-        self.fund_address(in_1, 1)
         in_2 = self.next_address()
-        self.fund_address(in_2, 2)
         in_3 = self.next_address()
-        self.fund_address(in_3, 3)
+        self.fund_addresses([(in_1, Amount.from_btc(1)), (in_2, Amount.from_btc(2)), (in_3, Amount.from_btc(3))])
 
         self.generate_block(1)
 
         out_addresses = [self.next_address() for _ in range(6)]
-        values = [0.5, 1.5 - self.fee, 0.5, 0.5 - self.fee, 2.5 - self.fee, 0.5]
+        values = [Amount.from_btc(0.5), Amount.from_btc(1.5) - self.fee, Amount.from_btc(0.5),
+                  Amount.from_btc(0.5) - self.fee, Amount.from_btc(2.5) - self.fee, Amount.from_btc(0.5)]
         for address, value in zip(out_addresses, values):
             address.value = value
 
@@ -1,19 +1,22 @@
 from testchain.runner import Generator
 from testchain.address import Address
+from testchain.util import Amount
 import random
 
 
 class Motifs(Generator):
 
     def run(self):
-        self.create_m_input_n_output_tx(2, 2)
-        self.create_m_input_n_output_tx(2, 3)
-        self.create_tx_chain()
-        self.create_peeling_chain()
-        self.create_fan()
+        inputs = self.size("m-in-n-out-inputs", 2)
+        outputs = self.size("m-in-n-out-outputs", 2)
+        self.create_m_input_n_output_tx(inputs, outputs)
+        self.create_m_input_n_output_tx(inputs, outputs + 1)
+        self.create_tx_chain(self.size("tx-chain", 10))
+        self.create_peeling_chain(self.size("peeling-chain", 10))
+        self.create_fan(self.size("fan", 8))
         self.create_merge()
 
-    def init_pattern(self, name: str, value: float):
+    def init_pattern(self, name: str, value: Amount):
         """
         Creates a transaction output to a fresh address
         :param name: name of the pattern
@@ -35,7 +38,7 @@ class Motifs(Generator):
         :param n: number of outputs
         """
         random.seed(20180917)
-        self.init_pattern("{}-in-{}-out".format(m, n), 42)
+        self.init_pattern("{}-in-{}-out".format(m, n), Amount.from_btc(42))
 
         # split
         sources = [self.current_address()]
@@ -43,17 +46,17 @@ class Motifs(Generator):
         destinations = []
         for _ in range(m):
             d = self.next_address()
-            d.value = round(total_value / m, 8)
+            d.value = total_value // m
             destinations.append(d)
 
         self.create_transaction(sources, destinations)
         self.generate_block()
 
-        total_value = round(total_value / m, 8) * m - self.fee
+        total_value = (total_value // m) * m - self.fee
         new_destinations = []
         for _ in range(n):
             d = self.next_address()
-            d.value = round(total_value / n, 8)
+            d.value = total_value // n
             new_destinations.append(d)
 
         self.create_transaction(destinations, new_destinations)
@@ -64,7 +67,7 @@ class Motifs(Generator):
         Create a chain of {length} 1-input/1-output transactions, each only losing FEE in value
         """
         random.seed(20180917)
-        self.fund_address(self.next_address(), 10)  # 10 BTC
+        self.fund_address(self.next_address(), Amount.from_btc(10))
 
         for i in range(length):
             source = self.current_address()
@@ -75,20 +78,25 @@ class Motifs(Generator):
             self.log_value("tx-chain-{}-tx-{}".format(length, i), txid)
             self.generate_block()
 
-    def create_peeling_chain(self):
+    def create_peeling_chain(self, length: int = 10):
         """
-        Create a peeling chain of length 10.
+        Create a peeling chain of {length} transactions. The peeled values grow linearly and add up to about 5 BTC,
+        independent of the length.
         """
         random.seed(20180913)
-        self.init_pattern("peeling-chain", 42)
-        dead_ends = [Address.from_key_index(x) for x in range(20181013, 20181023)]
+        self.init_pattern("peeling-chain", Amount.from_btc(42))
+        dead_ends = [Address.from_key_index(x) for x in range(20181013, 20181013 + length)]
 
-        for i in range(10):
+        for i in range(length):
             sources = [self.current_address()]
             total_value = self.current_address().value - self.fee
+            peeled = Amount.from_btc(10) * i // (length * length)
+            if i:
+                # long chains would otherwise peel dust
+                peeled = max(peeled, Amount(1000))
 
-            self.next_address().value = total_value - round(i / 10, 8)
-            dead_ends[i].value = round(i / 10, 8)
+            self.next_address().value = total_value - peeled
+            dead_ends[i].value = peeled
 
             change_position = random.randint(0, 1)
             if change_position:
@@ -107,13 +115,13 @@ class Motifs(Generator):
 
     def create_fan(self, n: int = 8):
         random.seed(20180914)
-        self.init_pattern("fan-{}".format(n), 42)
+        self.init_pattern("fan-{}".format(n), Amount.from_btc(42))
 
         start_address = self.current_address()
         total_value = start_address.value - self.fee
         recipients = [self.next_address() for _ in range(n)]
         for x in recipients:
-            x.value = round(total_value / n, 8)
+            x.value = total_value // n
 
         txid = self.create_transaction([start_address], recipients)
         self.log_value("fan-{}-tx".format(n), txid)
@@ -121,7 +129,7 @@ class Motifs(Generator):
         self.generate_block()
 
         final_destination = self.next_address()
-        final_destination.value = round(total_value / n, 8) * n - self.fee
+        final_destination.value = (total_value // n) * n - self.fee
 
         txid = self.create_transaction(recipients, [final_destination])
         self.log_value("fan-{}-tx-collect".format(n), txid)
@@ -130,29 +138,29 @@ class Motifs(Generator):
 
     def create_merge(self):
         random.seed(20181001)
-        self.init_pattern("merge-0", value=1)
+        self.init_pattern("merge-0", value=Amount.from_btc(1))
         addr1 = self.current_address()
-        self.init_pattern("merge-1", value=2)
+        self.init_pattern("merge-1", value=Amount.from_btc(2))
         addr2 = self.current_address()
-        self.init_pattern("merge-2", value=3)
+        self.init_pattern("merge-2", value=Amount.from_btc(3))
         addr3 = self.current_address()
 
         addr1_1 = self.next_address()
-        addr1_1.value = 1 - self.fee
+        addr1_1.value = Amount.from_btc(1) - self.fee
         self.create_transaction([addr1], [addr1_1])
 
         addr2_1 = self.next_address()
-        addr2_1.value = 2 - self.fee
+        addr2_1.value = Amount.from_btc(2) - self.fee
         self.create_transaction([addr2], [addr2_1])
 
         addr3_1 = self.next_address()
-        addr3_1.value = 3 - self.fee
+        addr3_1.value = Amount.from_btc(3) - self.fee
         self.create_transaction([addr3], [addr3_1])
 
         self.generate_block()
 
         addr_dest = self.next_address()
-        addr_dest.value = 6 - 4 * self.fee
+        addr_dest.value = Amount.from_btc(6) - 4 * self.fee
 
         txid = self.create_transaction([addr1_1, addr2_1, addr3_1], [addr_dest])
         self.log_value("merge-final-tx", txid)
@@ -2,7 +2,8 @@ from bitcointx.core import CBlock, CMutableTransaction, CMutableTxIn, CMutableTx
 from bitcointx.core.script import CScript, OP_RETURN, OP_0, OP_2, OP_3, OP_CHECKMULTISIG
 
 from testchain.runner import Generator
-from testchain.util import Coin
+from testchain.sighash import SighashContext
+from testchain.util import Amount
 
 
 class SpecialCases(Generator):
@@ -12,21 +13,21 @@ class SpecialCases(Generator):
     """
 
     def create_custom_block(self, reward):
-        txid, _ = self.fund_address(self.next_address(), 10)
+        txid, _ = self.fund_address(self.next_address(), Amount.from_btc(10))
         tx2 = self.proxy.getrawtransaction(lx(txid))
 
         coinbase = CMutableTransaction()
-        coinbase.vin.append(CMutableTxIn(COutPoint(), CScript([self.proxy.getblockcount() + 1])))
-        coinbase.vout.append(CMutableTxOut(reward * COIN, self.next_address().address.to_scriptPubKey()))
+        coinbase.vin.append(CMutableTxIn(COutPoint(), CScript([self.chain_state.height + 1])))
+        coinbase.vout.append(CMutableTxOut(reward * COIN, self.next_address().script_pubkey))
 
-        prev_block_hash = self.proxy.getblockhash(self.proxy.getblockcount())
+        prev_block_hash = self.chain_state.tip
 
         ts = self._next_timestamp()
         self.proxy.call("setmocktime", ts)
 
         for nonce in range(1000):
             block = CBlock(nBits=0x207fffff, vtx=[coinbase, tx2], hashPrevBlock=prev_block_hash, nTime=ts, nNonce=nonce)
-            result = self.proxy.submitblock(block)
+            result = self.submit_block(block)
             if not result:
                 self.log.debug("Chosen nonce: {}".format(nonce))
                 break
@@ -34,18 +35,18 @@ class SpecialCases(Generator):
     def coinbase_does_not_claim_fees(self):
         reward = self.current_block_reward()
         self.create_custom_block(reward)
-        self.log_value("block-fee-unclaimed-height", self.proxy.getblockcount())
+        self.log_value("block-fee-unclaimed-height", self.chain_state.height)
 
     def coinbase_does_not_claim_full_reward(self):
         reward = self.current_block_reward() - 10
         self.create_custom_block(reward)
-        self.log_value("block-partial-reward-height", self.proxy.getblockcount())
+        self.log_value("block-partial-reward-height", self.chain_state.height)
 
     def non_max_nsequence_no(self):
         source = self.next_address()
-        self.fund_address(source, 1)
+        self.fund_address(source, Amount.from_btc(1))
         destination = self.next_address()
-        destination.value = 1 - self.fee
+        destination.value = Amount.from_btc(1) - self.fee
         txid = self.create_transaction([source], [destination], n_sequence=0xfffffffe)
         self.log_value("nsequence-fffffffe-tx", txid)
 
@@ -54,13 +55,13 @@ class SpecialCases(Generator):
         self.fund_address(source, 2 * self.fee)
 
         tx_ins = [CMutableTxIn(COutPoint(source.txid, source.vout))]
-        tx_outs = [CMutableTxOut(Coin(self.fee).satoshi(), CScript([OP_RETURN, x("4c6f726420566f6c64656d6f7274")]))]
+        tx_outs = [CMutableTxOut(self.fee.satoshi, CScript([OP_RETURN, x("4c6f726420566f6c64656d6f7274")]))]
         tx = CMutableTransaction(tx_ins, tx_outs)
 
         key = source.key
-        script = source.address.to_scriptPubKey()
+        script = source.script_pubkey
 
-        sig = self._sign(script, tx, 0, Coin(source.value).satoshi(), key)
+        sig = self._sign(script, tx, 0, source.value.satoshi, key)
         tx_ins[0].scriptSig = CScript([sig, key.pub])
 
         txid = self._send_transaction(tx, [])
@@ -68,7 +69,7 @@ class SpecialCases(Generator):
 
     def raw_multisig(self):
         source = self.next_address()
-        self.fund_address(source, 0.1)
+        self.fund_address(source, Amount.from_btc(0.1))
 
         # construct transaction manually
         tx_ins = [CMutableTxIn(COutPoint(source.txid, source.vout))]
@@ -76,15 +77,15 @@ class SpecialCases(Generator):
         keys = [self.next_address().key for _ in range(3)]
         redeem_script = CScript([OP_2, keys[0].pub, keys[1].pub, keys[2].pub, OP_3, OP_CHECKMULTISIG])
         tx_outs = [
-            CMutableTxOut(Coin(0.1 - self.fee).satoshi(), redeem_script)]
+            CMutableTxOut((Amount.from_btc(0.1) - self.fee).satoshi, redeem_script)]
 
         tx = CMutableTransaction(tx_ins, tx_outs)
 
         # sign and submit
         key = source.key
-        script = source.address.to_scriptPubKey()
+        script = source.script_pubkey
 
-        sig = self._sign(script, tx, 0, Coin(source.value).satoshi(), key)
+        sig = self._sign(script, tx, 0, source.value.satoshi, key)
         tx_ins[0].scriptSig = CScript([sig, key.pub])
 
         txid = self._send_transaction(tx, [])
@@ -93,12 +94,13 @@ class SpecialCases(Generator):
         # Redeem Transaction
         tx_ins = [CMutableTxIn(COutPoint(lx(txid), 0))]
         destination = self.next_address()
-        tx_outs = [CMutableTxOut(Coin(0.1 - 2 * self.fee).satoshi(), destination.address.to_scriptPubKey())]
+        tx_outs = [CMutableTxOut((Amount.from_btc(0.1) - 2 * self.fee).satoshi, destination.script_pubkey)]
         tx = CMutableTransaction(tx_ins, tx_outs)
 
         # Sign with 2 out of three keys
-        sig1 = self._sign(redeem_script, tx, 0, Coin(0.1 - self.fee).satoshi(), keys[0])
-        sig3 = self._sign(redeem_script, tx, 0, Coin(0.1 - self.fee).satoshi(), keys[2])
+        context = SighashContext(tx, self.chain)
+        sig1 = context.sign(redeem_script, 0, (Amount.from_btc(0.1) - self.fee).satoshi, keys[0])
+        sig3 = context.sign(redeem_script, 0, (Amount.from_btc(0.1) - self.fee).satoshi, keys[2])
 
         tx_ins[0].scriptSig = CScript([OP_0, sig1, sig3])
 
@@ -108,7 +110,7 @@ class SpecialCases(Generator):
 
     def p2sh_multisig(self):
         source = self.next_address()
-        self.fund_address(source, 0.1)
+        self.fund_address(source, Amount.from_btc(0.1))
 
         # construct transaction manually
         tx_ins = [CMutableTxIn(COutPoint(source.txid, source.vout))]
@@ -116,14 +118,14 @@ class SpecialCases(Generator):
         keys = [self.next_address().key for _ in range(3)]
         redeem_script = CScript([OP_2, keys[0].pub, keys[1].pub, keys[2].pub, OP_3, OP_CHECKMULTISIG])
         tx_outs = [
-            CMutableTxOut(Coin(0.1 - self.fee).satoshi(), redeem_script.to_p2sh_scriptPubKey())]
+            CMutableTxOut((Amount.from_btc(0.1) - self.fee).satoshi, redeem_script.to_p2sh_scriptPubKey())]
 
         tx = CMutableTransaction(tx_ins, tx_outs)
 
         # sign and submit
         key = source.key
-        script = source.address.to_scriptPubKey()
-        sig = self._sign(script, tx, 0, Coin(source.value).satoshi(), key)
+        script = source.script_pubkey
+        sig = self._sign(script, tx, 0, source.value.satoshi, key)
         tx_ins[0].scriptSig = CScript([sig, key.pub])
 
         txid = self._send_transaction(tx, [])
@@ -132,12 +134,13 @@ class SpecialCases(Generator):
         # Redeem Transaction
         tx_ins = [CMutableTxIn(COutPoint(lx(txid), 0))]
         destination = self.next_address()
-        tx_outs = [CMutableTxOut(Coin(0.1 - 2 * self.fee).satoshi(), destination.address.to_scriptPubKey())]
+        tx_outs = [CMutableTxOut((Amount.from_btc(0.1) - 2 * self.fee).satoshi, destination.script_pubkey)]
         tx = CMutableTransaction(tx_ins, tx_outs)
 
         # Sign with 2 out of three keys
-        sig1 = self._sign(redeem_script, tx, 0, Coin(0.1 - self.fee).satoshi(), keys[0], "p2sh")
-        sig3 = self._sign(redeem_script, tx, 0, Coin(0.1 - self.fee).satoshi(), keys[2], "p2sh")
+        context = SighashContext(tx, self.chain)
+        sig1 = context.sign(redeem_script, 0, (Amount.from_btc(0.1) - self.fee).satoshi, keys[0], "p2sh")
+        sig3 = context.sign(redeem_script, 0, (Amount.from_btc(0.1) - self.fee).satoshi, keys[2], "p2sh")
 
         tx_ins[0].scriptSig = CScript([OP_0, sig1, sig3, redeem_script])
 
@@ -0,0 +1,220 @@
+import hashlib
+import random
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from bitcointx.core import lx
+from bitcointx.wallet import CBitcoinSecret
+
+from testchain.address import Address
+from testchain.runner import Generator
+from testchain.util import Amount
+
+# smallest output created by the workload
+MIN_OUTPUT_SATOSHI = 5000
+
+
+class WorkloadConfig(object):
+    """
+    Shape of the transactions generated by `Workload`.
+    """
+
+    def __init__(self, seed: int = 20181101, target_bytes: int = 10000000, max_block_weight: int = 3000000,
+                 inputs_alpha: float = 2.5, max_inputs: int = 50, outputs_alpha: float = 1.8, max_outputs: int = 100,
+                 address_types: Optional[Dict[str, float]] = None, reuse_rate: float = 0.1,
+                 reuse_window: int = 10000, value_sigma: float = 1.5, recent_bias: float = 0.5,
+                 recent_window: int = 1000, funding_value: float = 10, min_pool_size: int = 50):
+        """
+        :param seed: seed of the random number generator, the same seed and config produce the same chain
+        :param target_bytes: stop once the generated transactions add up to this many bytes
+        :param max_block_weight: a block is mined before the mempool would exceed this weight
+        :param inputs_alpha: shape of the power-law distribution of the number of inputs (larger: fewer inputs)
+        :param max_inputs: upper bound for the number of inputs
+        :param outputs_alpha: shape of the power-law distribution of the number of outputs
+        :param max_outputs: upper bound for the number of outputs
+        :param address_types: relative frequencies of the address types of new outputs
+        :param reuse_rate: probability that an output goes to a previously used address
+        :param reuse_window: number of recently used addresses that can be reused
+        :param value_sigma: spread of the log-normal weights used to split the value among the outputs
+        :param recent_bias: probability that an input is taken from the most recently confirmed outputs, which
+        creates long spending chains
+        :param recent_window: number of most recently confirmed outputs that count as recent
+        :param funding_value: value (in BTC) of every output funded from a coinbase
+        :param min_pool_size: new funds are added when fewer confirmed outputs are available
+        """
+        self.seed = seed
+        self.target_bytes = target_bytes
+        self.max_block_weight = max_block_weight
+        self.inputs_alpha = inputs_alpha
+        self.max_inputs = max_inputs
+        self.outputs_alpha = outputs_alpha
+        self.max_outputs = max_outputs
+        self.address_types = address_types or {"p2pkh": 0.45, "p2sh": 0.2, "p2wpkh": 0.3, "p2wsh": 0.05}
+        self.reuse_rate = reuse_rate
+        self.reuse_window = reuse_window
+        self.value_sigma = value_sigma
+        self.recent_bias = recent_bias
+        self.recent_window = recent_window
+        self.funding_value = funding_value
+        self.min_pool_size = min_pool_size
+
+    def to_dict(self) -> Dict:
+        return dict(vars(self))
+
+
+# an output owned by the workload: txid, vout, value in satoshi, address id, address type
+Output = Tuple[bytes, int, int, int, str]
+
+
+class Workload(Generator):
+    """
+    Generates a large number of transactions with a realistic shape, e.g. to benchmark parsing and clustering.
+    Input and output counts, address types, address reuse, values and spending chain depth are sampled from the
+    distributions in `WorkloadConfig`, until the transactions add up to the target size.
+
+    Only the spendable outputs are kept in memory. Keys are derived from the seed and a counter, and addresses are
+    recreated when they are spent, so the generator does not keep an `Address` per output. The ground truth consists
+    of summary statistics.
+
+    Workload addresses are not registered in the `AddressLedger`: their keys do not come from the key index space of
+    the other generators, so they can neither collide with those keys nor be checked against them. The address counts
+    and the duplicate check of the ledger cover the motifs only, the workload logs `workload-address-count` instead.
+    """
+
+    def __init__(self, *args, config: Optional[WorkloadConfig] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.config = config or WorkloadConfig()
+        self.random = random.Random(self.config.seed)
+        self.key_seed = hashlib.sha256("workload-{}".format(self.config.seed).encode()).digest()
+        types = [t for t in sorted(self.config.address_types) if self.segwit or not t.startswith("p2w")]
+        self.address_types = types
+        self.type_weights = [self.config.address_types[t] for t in types]
+        self._confirmed = []  # type: List[Output]
+        self._pending = []  # type: List[Output]
+        self._recent_addresses = deque(maxlen=self.config.reuse_window)
+        self._block_weight = 0
+        self.stats = {"tx-count": 0, "tx-bytes": 0, "block-count": 0, "input-count": 0, "output-count": 0,
+                      "reused-address-outputs": 0, "funding-tx-count": 0}
+        self.input_histogram = {}  # type: Dict[int, int]
+        self.output_histogram = {}  # type: Dict[int, int]
+
+    def snapshot_params(self):
+        return {"workload": self.config.to_dict(), "base": super().snapshot_params()}
+
+    def _address(self, address_id: int, address_type: str) -> Address:
+        secret = hashlib.sha256(self.key_seed + address_id.to_bytes(8, "little")).digest()
+        return Address(CBitcoinSecret.from_secret_bytes(secret), address_type)
+
+    def next_address(self, address_type="p2pkh") -> Address:
+        # unlike the base class, addresses are neither retained nor added to the address ledger, see above
+        self.address_cursor += 1
+        self._current = self._address(self.address_cursor, address_type)
+        self._current.key_index = self.address_cursor
+        return self._current
+
+    def _pareto_count(self, alpha: float, maximum: int) -> int:
+        return min(maximum, int(self.random.paretovariate(alpha)))
+
+    def _recipient(self) -> Address:
+        if self._recent_addresses and self.random.random() < self.config.reuse_rate:
+            self.stats["reused-address-outputs"] += 1
+            address_id, address_type = self.random.choice(self._recent_addresses)
+            address = self._address(address_id, address_type)
+            address.key_index = address_id
+            return address
+        address = self.next_address(self.random.choices(self.address_types, self.type_weights)[0])
+        self._recent_addresses.append((address.key_index, address.type))
+        return address
+
+    def _take_input(self) -> Output:
+        recent = min(len(self._confirmed), self.config.recent_window)
+        if self.random.random() < self.config.recent_bias:
+            idx = len(self._confirmed) - 1 - self.random.randrange(recent)
+        else:
+            idx = self.random.randrange(len(self._confirmed))
+        # swap with the last element, so removal is O(1)
+        self._confirmed[idx], self._confirmed[-1] = self._confirmed[-1], self._confirmed[idx]
+        return self._confirmed.pop()
+
+    def _split(self, total: int, n: int) -> List[Amount]:
+        weights = [self.random.lognormvariate(0, self.config.value_sigma) for _ in range(n)]
+        minimum = Amount(MIN_OUTPUT_SATOSHI)
+        return [minimum + part for part in Amount(total - n * MIN_OUTPUT_SATOSHI).allocate(weights)]
+
+    def _fund(self):
+        address = self._recipient()
+        value = Amount.from_btc(self.config.funding_value)
+        txid, vout = self.fund_address(address, value)
+        self._pending.append((lx(txid), vout, value.satoshi, address.key_index, address.type))
+        self.stats["funding-tx-count"] += 1
+
+    def _mine(self):
+        self.generate_block()
+        self.stats["block-count"] += 1
+        self._confirmed.extend(self._pending)
+        self._pending = []
+        self._block_weight = 0
+
+    def _create_random_transaction(self):
+        fee = self.fee.satoshi
+        n_in = min(self._pareto_count(self.config.inputs_alpha, self.config.max_inputs), len(self._confirmed))
+        inputs = [self._take_input() for _ in range(n_in)]
+        total = sum(value for _, _, value, _, _ in inputs) - fee
+        n_out = min(self._pareto_count(self.config.outputs_alpha, self.config.max_outputs),
+                    max(1, total // (2 * MIN_OUTPUT_SATOSHI)))
+
+        sources = []
+        for txid, vout, value, address_id, address_type in inputs:
+            source = self._address(address_id, address_type)
+            source.txid, source.vout, source.value = txid, vout, Amount(value)
+            sources.append(source)
+        recipients = [self._recipient() for _ in range(n_out)]
+        values = self._split(total, n_out)
+        tx = self._create_transaction(sources, recipients, values, n_locktime=0, n_sequence=0xffffffff)
+        return tx, recipients, values
+
+    def run(self):
+        config = self.config
+        first_height = self.chain_state.height + 1
+        self.log.info("Generating a workload of {} bytes (seed {})".format(config.target_bytes, config.seed))
+        while self.stats["tx-bytes"] < config.target_bytes:
+            if len(self._confirmed) + len(self._pending) < config.min_pool_size:
+                self._fund()
+                continue
+            if not self._confirmed:
+                self._mine()
+                continue
+
+            tx, recipients, values = self._create_random_transaction()
+            size = len(tx.serialize())
+            # four times the size is an upper bound of the weight
+            if self._block_weight + 4 * size > config.max_block_weight:
+                self._mine()
+            self._send_transaction(tx, recipients)
+            self._block_weight += 4 * size
+
+            txid = tx.GetTxid()
+            for recipient, value in zip(recipients, values):
+                # outputs that cannot pay the fee of spending them are left unspent
+                if value.satoshi >= MIN_OUTPUT_SATOSHI + self.fee.satoshi:
+                    self._pending.append((txid, recipient.vout, value.satoshi, recipient.key_index, recipient.type))
+            self.stats["tx-count"] += 1
+            self.stats["tx-bytes"] += size
+            self.stats["input-count"] += len(tx.vin)
+            self.stats["output-count"] += len(tx.vout)
+            self.input_histogram[len(tx.vin)] = self.input_histogram.get(len(tx.vin), 0) + 1
+            self.output_histogram[len(tx.vout)] = self.output_histogram.get(len(tx.vout), 0) + 1
+
+            if self.stats["tx-count"] % 10000 == 0:
+                self.log.info("Workload: {} transactions, {} bytes".format(self.stats["tx-count"],
+                                                                          self.stats["tx-bytes"]))
+        self._mine()
+
+        for k, v in sorted(self.stats.items()):
+            self.log_value("workload-{}".format(k), v)
+        self.log_value("workload-address-count", self.address_cursor + 1)
+        self.log_value("workload-first-block", first_height)
+        self.log_value("workload-last-block", self.chain_state.height)
+        self.log_value("workload-input-histogram", {str(k): v for k, v in sorted(self.input_histogram.items())})
+        self.log_value("workload-output-histogram", {str(k): v for k, v in sorted(self.output_histogram.items())})
+
@@ -0,0 +1,126 @@
+import http.client
+import socket
+import subprocess
+from logging import Logger
+from time import monotonic, sleep
+from typing import Callable, List, Optional
+
+import bitcointx.rpc
+
+RPC_ERRORS = (OSError, http.client.HTTPException, bitcointx.rpc.JSONRPCError)
+
+
+def free_port() -> int:
+    """
+    Asks the OS for a currently unused TCP port on localhost.
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class NodeStartupError(Exception):
+    """Raised when the node process exits or does not answer RPC requests before the startup timeout."""
+
+
+class NodeExitedError(NodeStartupError):
+    """Raised when the node process exits during startup, e.g. because it could not bind one of its ports."""
+
+
+class Node(object):
+    """
+    Manages the lifecycle of a node process: launches it, waits until its RPC interface is ready and shuts it down
+    cleanly again.
+
+    Ports picked with `free_port` are only free at the time they are picked, another process (e.g. a node of a chain
+    generated in parallel) may bind them before the node does. With `ports`, the node is restarted with new ports
+    when it exits during startup.
+    """
+
+    def __init__(self, executable: str, conf_file: str, params: List[str], log: Logger, startup_timeout: float = 60,
+                 shutdown_timeout: float = 30, ports: Optional[Callable[[], List[str]]] = None,
+                 start_attempts: int = 3):
+        """
+        :param ports: returns the port parameters, and writes the RPC port to `conf_file`. Called once before the
+        first start and again after every start attempt that failed.
+        :param start_attempts: number of port assignments that are tried
+        """
+        self.exec = executable
+        self.conf_file = conf_file
+        self.params = params
+        self.log = log
+        self.startup_timeout = startup_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.ports = ports
+        self.port_params = ports() if ports is not None else []
+        self.start_attempts = start_attempts if ports is not None else 1
+        self.proc = None
+
+    def _rpc(self, method: str, *args):
+        # use a fresh connection, a failed attempt may leave the previous one in an unusable state
+        return bitcointx.rpc.Proxy(btc_conf_file=self.conf_file).call(method, *args)
+
+    def version(self) -> str:
+        """
+        Returns the version line reported by the node executable, without starting a node.
+        """
+        output = subprocess.run([self.exec, "-version"], stdout=subprocess.PIPE, check=True).stdout
+        return output.decode().splitlines()[0].strip()
+
+    def start(self, extra_params: List[str] = ()):
+        for attempt in range(1, self.start_attempts + 1):
+            self.proc = subprocess.Popen([self.exec] + self.params + self.port_params + list(extra_params),
+                                         stdout=subprocess.DEVNULL)
+            try:
+                self.wait_until_ready()
+                return
+            except NodeExitedError as e:
+                if attempt == self.start_attempts:
+                    raise
+                self.port_params = self.ports()
+                self.log.warning("{}, retrying with {}".format(e, " ".join(self.port_params)))
+
+    def wait_until_ready(self):
+        """
+        Polls `getblockchaininfo` with exponential backoff until the node answers.
+        Raises NodeStartupError if the process dies or the startup timeout is exceeded.
+        """
+        start = monotonic()
+        delay = 0.05
+        while True:
+            if self.proc.poll() is not None:
+                raise NodeExitedError("Node exited with code {} during startup".format(self.proc.returncode))
+            try:
+                self._rpc("getblockchaininfo")
+                break
+            except RPC_ERRORS as e:
+                # connection refused while the RPC server binds, error -28 while the node is warming up
+                if monotonic() - start > self.startup_timeout:
+                    self.stop()
+                    raise NodeStartupError("Node did not become ready within {} seconds: {}"
+                                           .format(self.startup_timeout, e))
+            sleep(delay)
+            delay = min(delay * 2, 1.0)
+        self.log.info("Node ready after {:.2f} seconds".format(monotonic() - start))
+
+    def is_running(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def stop(self):
+        """
+        Shuts the node down using the `stop` RPC and waits for the process to exit.
+        Falls back to terminating and finally killing the process if it does not quit in time.
+        """
+        if not self.is_running():
+            return
+        try:
+            self._rpc("stop")
+        except RPC_ERRORS as e:
+            self.log.warning("stop RPC failed ({}), terminating node".format(e))
+            self.proc.terminate()
+        try:
+            self.proc.wait(timeout=self.shutdown_timeout)
+        except subprocess.TimeoutExpired:
+            self.log.warning("Node did not quit within {} seconds, killing it".format(self.shutdown_timeout))
+            self.proc.kill()
+            self.proc.wait()
@@ -0,0 +1,349 @@
+import hashlib
+import os
+import struct
+from logging import Logger
+from typing import Dict, List, Optional, Tuple
+
+import bitcointx.core
+import bitcointx.rpc
+from bitcointx.core import CBlock, CMutableTransaction, CMutableTxIn, CMutableTxOut, COutPoint, CTransaction, \
+    CTxInWitness, CTxWitness, Hash, COIN, b2lx
+from bitcointx.core.script import CScript, CScriptWitness, OP_0, OP_RETURN
+from bitcointx.wallet import CBitcoinAddress
+
+from testchain.blkfile import DISK_MAGIC
+
+# Regtest genesis header (nTime, nNonce), the coinbase is the same as on mainnet
+GENESIS = {"btc": (1296688602, 2), "bch": (1296688602, 2), "ltc": (1296688602, 0)}
+
+REGTEST_BITS = 0x207fffff
+BLOCK_VERSION = 0x20000000
+COINBASE_MATURITY = 100
+SUBSIDY_HALVING_INTERVAL = 150
+MAX_BLOCKFILE_SIZE = 0x8000000  # 128 MiB, same as bitcoind
+WITNESS_COMMITMENT_HEADER = bytes.fromhex("aa21a9ed")
+LOCKTIME_THRESHOLD = 500000000
+
+
+def compact_size(n: int) -> bytes:
+    if n < 0xfd:
+        return struct.pack("<B", n)
+    elif n <= 0xffff:
+        return b"\xfd" + struct.pack("<H", n)
+    elif n <= 0xffffffff:
+        return b"\xfe" + struct.pack("<I", n)
+    return b"\xff" + struct.pack("<Q", n)
+
+
+def merkle_root(hashes: List[bytes]) -> bytes:
+    """
+    Computes the merkle root of a list of (internal byte order) hashes.
+    """
+    if not hashes:
+        return b"\x00" * 32
+    while len(hashes) > 1:
+        if len(hashes) % 2:
+            hashes = hashes + [hashes[-1]]
+        hashes = [Hash(hashes[i] + hashes[i + 1]) for i in range(0, len(hashes), 2)]
+    return hashes[0]
+
+
+def block_subsidy(height: int) -> int:
+    halvings = height // SUBSIDY_HALVING_INTERVAL
+    if halvings >= 64:
+        return 0
+    return (50 * COIN) >> halvings
+
+
+def pow_hash(chain: str, header: bytes) -> bytes:
+    """
+    Returns the hash that has to meet the target: scrypt on Litecoin, otherwise the block hash (double SHA-256).
+    """
+    if chain == "ltc":
+        return hashlib.scrypt(header, salt=header, n=1024, r=1, p=1, dklen=32)
+    return Hash(header)
+
+
+def bits_to_target(bits: int) -> int:
+    return (bits & 0x007fffff) << (8 * ((bits >> 24) - 3))
+
+
+class OfflineNode(object):
+    """
+    In-process stand-in for the node: accepts fully signed transactions, mines regtest blocks and writes them to
+    blk files using the same framing as bitcoind (magic + length + block).
+
+    It implements the subset of the RPC interface that the generators use, so it can be handed to them in place of a
+    `bitcointx.rpc.Proxy`. Scripts and signatures are not verified, the signing code is trusted to produce valid
+    transactions.
+    """
+
+    def __init__(self, chain: str, datadir: str, log: Logger, mocktime: int):
+        if chain not in DISK_MAGIC:
+            raise ValueError("Unkown chain. Please add an entry for the disk magic.")
+        self.chain = chain
+        self.log = log
+        self.mocktime = mocktime
+        self.magic = DISK_MAGIC[chain]
+        self.segwit = chain != "bch"
+        self.blocks_dir = os.path.join(datadir, "regtest", "blocks")
+        os.makedirs(self.blocks_dir, exist_ok=True)
+
+        # outpoint (txid, n) -> (value, scriptPubKey, height, is_coinbase)
+        self.utxos = {}  # type: Dict[Tuple[bytes, int], Tuple[int, bytes, int, bool]]
+        # txid -> transaction, in order of acceptance (which is always a valid topological order)
+        self.mempool = {}  # type: Dict[bytes, CTransaction]
+        self.mempool_spent = {}  # type: Dict[Tuple[bytes, int], bytes]
+        self.mempool_fees = {}  # type: Dict[bytes, int]
+
+        self.block_hashes = []  # type: List[bytes]
+        self.block_locations = {}  # type: Dict[bytes, Tuple[int, int, int]]
+        self.timestamps = []  # type: List[int]
+        self.file_no = 0
+        self.blk_file = None
+        self._connect_genesis()
+
+    # -- block files
+
+    def _blk_path(self, file_no: int) -> str:
+        return os.path.join(self.blocks_dir, "blk{:05d}.dat".format(file_no))
+
+    def _write_block(self, block_hash: bytes, data: bytes):
+        if self.blk_file is None:
+            self.blk_file = open(self._blk_path(self.file_no), "ab")
+        elif self.blk_file.tell() + len(data) + 8 > MAX_BLOCKFILE_SIZE:
+            self.blk_file.close()
+            self.file_no += 1
+            self.blk_file = open(self._blk_path(self.file_no), "ab")
+        self.blk_file.write(self.magic + struct.pack("<I", len(data)))
+        self.block_locations[block_hash] = (self.file_no, self.blk_file.tell(), len(data))
+        self.blk_file.write(data)
+        self.blk_file.flush()
+
+    def _read_block(self, block_hash: bytes) -> CBlock:
+        file_no, offset, length = self.block_locations[block_hash]
+        with open(self._blk_path(file_no), "rb") as f:
+            f.seek(offset)
+            return CBlock.deserialize(f.read(length))
+
+    # -- validation
+
+    def _reject(self, reason: str, code: int = -26):
+        raise bitcointx.rpc.JSONRPCError({"code": code, "message": reason})
+
+    def _lookup(self, outpoint: Tuple[bytes, int], include_mempool: bool):
+        if outpoint in self.utxos:
+            return self.utxos[outpoint]
+        if include_mempool and outpoint[0] in self.mempool:
+            tx = self.mempool[outpoint[0]]
+            if outpoint[1] < len(tx.vout):
+                out = tx.vout[outpoint[1]]
+                return out.nValue, bytes(out.scriptPubKey), None, False
+        return None
+
+    def _check_transaction(self, tx: CTransaction, height: int, include_mempool: bool) -> int:
+        """
+        Checks that all inputs of `tx` are unspent and mature and that it does not create money.
+        :return: the fee of the transaction
+        """
+        if not self._is_final(tx, height):
+            self._reject("non-final")
+        value_in = 0
+        for txin in tx.vin:
+            outpoint = (txin.prevout.hash, txin.prevout.n)
+            coin = self._lookup(outpoint, include_mempool)
+            if coin is None or (include_mempool and outpoint in self.mempool_spent):
+                self._reject("bad-txns-inputs-missingorspent")
+            value, _, coin_height, is_coinbase = coin
+            if is_coinbase and height - coin_height < COINBASE_MATURITY:
+                self._reject("bad-txns-premature-spend-of-coinbase")
+            value_in += value
+        value_out = sum(out.nValue for out in tx.vout)
+        if value_out > value_in:
+            self._reject("bad-txns-in-belowout")
+        return value_in - value_out
+
+    def _is_final(self, tx: CTransaction, height: int) -> bool:
+        if tx.nLockTime == 0:
+            return True
+        limit = height if tx.nLockTime < LOCKTIME_THRESHOLD else self._median_time_past()
+        if tx.nLockTime < limit:
+            return True
+        return all(txin.nSequence == 0xffffffff for txin in tx.vin)
+
+    def _median_time_past(self) -> int:
+        last = sorted(self.timestamps[-11:])
+        return last[len(last) // 2]
+
+    # -- chain state
+
+    def height(self) -> int:
+        return len(self.block_hashes) - 1
+
+    def _connect(self, block_hash: bytes, data: bytes, vtx: List[CTransaction], timestamp: int):
+        height = len(self.block_hashes)
+        # add all outputs before removing the spent ones, with canonical ordering a child may precede its parent
+        for idx, tx in enumerate(vtx):
+            txid = tx.GetTxid()
+            for n, out in enumerate(tx.vout):
+                script = bytes(out.scriptPubKey)
+                if script[:1] == bytes([OP_RETURN]):
+                    continue
+                self.utxos[(txid, n)] = (out.nValue, script, height, idx == 0)
+        for tx in vtx[1:]:
+            for txin in tx.vin:
+                del self.utxos[(txin.prevout.hash, txin.prevout.n)]
+            self._remove_from_mempool(tx.GetTxid())
+        self.block_hashes.append(block_hash)
+        self.timestamps.append(timestamp)
+        self._write_block(block_hash, data)
+
+    def _remove_from_mempool(self, txid: bytes):
+        tx = self.mempool.pop(txid, None)
+        if tx is None:
+            return
+        self.mempool_fees.pop(txid)
+        for txin in tx.vin:
+            self.mempool_spent.pop((txin.prevout.hash, txin.prevout.n), None)
+
+    def _connect_genesis(self):
+        template = bitcointx.core.coreparams.GENESIS_BLOCK
+        n_time, n_nonce = GENESIS[self.chain]
+        genesis = CBlock(nVersion=1, hashPrevBlock=b"\x00" * 32, hashMerkleRoot=template.hashMerkleRoot,
+                         nTime=n_time, nBits=REGTEST_BITS, nNonce=n_nonce, vtx=template.vtx)
+        # the genesis coinbase is not spendable, it never enters the UTXO set
+        self.block_hashes.append(genesis.GetHash())
+        self.timestamps.append(n_time)
+        self._write_block(genesis.GetHash(), genesis.serialize())
+
+    def _create_coinbase(self, height: int, script_pub_key: bytes, fees: int, vtx: List[CTransaction]):
+        coinbase = CMutableTransaction(
+            [CMutableTxIn(COutPoint(), CScript([height, OP_0]), nSequence=0xffffffff)],
+            [CMutableTxOut(block_subsidy(height) + fees, CScript(script_pub_key))])
+        if self.segwit:
+            # BIP141 commitment to the witness merkle root, the coinbase wtxid counts as zero
+            reserved = b"\x00" * 32
+            wtxids = [b"\x00" * 32] + [Hash(tx.serialize()) for tx in vtx]
+            commitment = Hash(merkle_root(wtxids) + reserved)
+            coinbase.vout.append(CMutableTxOut(0, CScript([OP_RETURN, WITNESS_COMMITMENT_HEADER + commitment])))
+            coinbase.wit = CTxWitness([CTxInWitness(CScriptWitness([reserved]))])
+        return CTransaction.from_tx(coinbase)
+
+    def _mine_block(self, script_pub_key: bytes) -> bytes:
+        height = len(self.block_hashes)
+        vtx = list(self.mempool.values())
+        if self.chain == "bch":
+            # canonical transaction ordering
+            vtx.sort(key=lambda tx: tx.GetTxid())
+        fees = sum(self.mempool_fees.values())
+        coinbase = self._create_coinbase(height, script_pub_key, fees, vtx)
+        vtx = [coinbase] + vtx
+
+        root = merkle_root([tx.GetTxid() for tx in vtx])
+        timestamp = max(self.mocktime, self._median_time_past() + 1)
+        target = bits_to_target(REGTEST_BITS)
+        prefix = struct.pack("<i", BLOCK_VERSION) + self.block_hashes[-1] + root + struct.pack("<II", timestamp,
+                                                                                               REGTEST_BITS)
+        nonce = 0
+        while True:
+            header = prefix + struct.pack("<I", nonce)
+            if int.from_bytes(pow_hash(self.chain, header), "little") <= target:
+                break
+            nonce += 1
+        block_hash = Hash(header)
+
+        data = header + compact_size(len(vtx)) + b"".join(tx.serialize() for tx in vtx)
+        self._connect(block_hash, data, vtx, timestamp)
+        return block_hash
+
+    # -- RPC interface
+
+    def call(self, service_name: str, *args):
+        return getattr(self, service_name)(*args)
+
+    def getblockchaininfo(self):
+        return {"chain": "regtest", "blocks": self.height(), "bestblockhash": b2lx(self.block_hashes[-1])}
+
+    def stop(self):
+        if self.blk_file is not None:
+            self.blk_file.close()
+            self.blk_file = None
+
+    def setmocktime(self, timestamp: int):
+        self.mocktime = timestamp
+
+    def getblockcount(self) -> int:
+        return self.height()
+
+    def getblockhash(self, height: int) -> bytes:
+        return self.block_hashes[height]
+
+    def getbestblockhash(self) -> bytes:
+        return self.block_hashes[-1]
+
+    def getblock(self, block_hash: bytes) -> CBlock:
+        return self._read_block(block_hash)
+
+    def getrawmempool(self) -> List[bytes]:
+        return list(self.mempool)
+
+    def getrawtransaction(self, txid: bytes) -> CTransaction:
+        if txid not in self.mempool:
+            # like bitcoind without -txindex
+            self._reject("No such mempool transaction", code=-5)
+        return self.mempool[txid]
+
+    def generatetoaddress(self, n: int, address: str) -> List[str]:
+        script = bytes(CBitcoinAddress(address).to_scriptPubKey())
+        return [b2lx(self._mine_block(script)) for _ in range(n)]
+
+    def sendrawtransaction(self, tx: CTransaction) -> bytes:
+        tx = CTransaction.from_tx(tx)
+        txid = tx.GetTxid()
+        if txid in self.mempool:
+            self._reject("txn-already-in-mempool", code=-27)
+        fee = self._check_transaction(tx, len(self.block_hashes), include_mempool=True)
+        self.mempool[txid] = tx
+        self.mempool_fees[txid] = fee
+        for txin in tx.vin:
+            self.mempool_spent[(txin.prevout.hash, txin.prevout.n)] = txid
+        return txid
+
+    def submitblock(self, block: CBlock) -> Optional[str]:
+        """
+        Validates and connects an externally built block.
+        :return: None if the block was accepted, otherwise the reason for its rejection
+        """
+        if block.hashPrevBlock != self.block_hashes[-1]:
+            return "prev-blk-not-found"
+        header = block.serialize()[:80]
+        if int.from_bytes(pow_hash(self.chain, header), "little") > bits_to_target(block.nBits) or \
+                block.nBits != REGTEST_BITS:
+            return "high-hash"
+        if not block.vtx or not block.vtx[0].is_coinbase():
+            return "bad-cb-missing"
+        if block.hashMerkleRoot != merkle_root([tx.GetTxid() for tx in block.vtx]):
+            return "bad-txnmrklroot"
+
+        height = len(self.block_hashes)
+        fees = 0
+        spent = set()
+        for tx in block.vtx[1:]:
+            for txin in tx.vin:
+                outpoint = (txin.prevout.hash, txin.prevout.n)
+                if outpoint in spent:
+                    return "bad-txns-inputs-missingorspent"
+                spent.add(outpoint)
+            try:
+                fees += self._check_transaction(tx, height, include_mempool=False)
+            except bitcointx.rpc.JSONRPCError as e:
+                return e.error["message"]
+        if sum(out.nValue for out in block.vtx[0].vout) > block_subsidy(height) + fees:
+            return "bad-cb-amount"
+
+        # transactions that conflict with the block are evicted from the mempool
+        for txid, tx in list(self.mempool.items()):
+            if any((txin.prevout.hash, txin.prevout.n) in spent for txin in tx.vin):
+                self._remove_from_mempool(txid)
+        self._connect(block.GetHash(), block.serialize(), list(block.vtx), block.nTime)
+        return None
@@ -0,0 +1,52 @@
+from testchain.motifs.general import SetupChain, FinalizeChain
+from testchain.motifs.change import Change
+from testchain.motifs.motifs import Motifs
+from testchain.motifs.addresses import Addresses
+from testchain.motifs.special import SpecialCases
+from testchain.motifs.taint import Taint
+from testchain.motifs.heuristics import Heuristics
+from testchain.motifs.cash import BitcoinCash
+from testchain.motifs.workload import Workload
+from testchain.generator import FEE
+from testchain.runner import Runner
+from testchain.util import Amount
+
+# Order matters: every motif builds on the chain left behind by its predecessors
+MOTIFS = [SetupChain, Addresses, Motifs, Change, SpecialCases, Taint, Heuristics, BitcoinCash, FinalizeChain]
+
+# names of the sizes the motifs look up with `Generator.size`
+MOTIF_SIZES = ["tx-chain", "peeling-chain", "fan", "m-in-n-out-inputs", "m-in-n-out-outputs", "bch-block"]
+# chains of 1-input/1-output transactions that start from a fixed output and pay the fee at every step
+FUNDED_CHAINS = {"tx-chain": Amount.from_btc(10), "bch-block": Amount.from_btc(10)}
+
+
+def parse_motif_sizes(values):
+    """
+    Parses NAME=N overrides for `Generator.size`, NAME must be one of MOTIF_SIZES.
+    """
+    sizes = {}
+    for value in values:
+        name, _, size = value.partition("=")
+        if not size.isdigit() or int(size) < 1:
+            raise ValueError("Expected NAME=N with a positive N, got {}".format(value))
+        if name not in MOTIF_SIZES:
+            raise ValueError("Unknown motif size {}, expected one of {}".format(name, ", ".join(MOTIF_SIZES)))
+        if name in FUNDED_CHAINS and FEE * int(size) >= FUNDED_CHAINS[name]:
+            raise ValueError("{} is too long, the fees of {} transactions use up its funding of {} BTC".format(
+                name, size, FUNDED_CHAINS[name]))
+        sizes[name] = int(size)
+    return sizes
+
+
+def generate(output_dir, chain, executable, workload=None, **options):
+    """
+    Generates the full test chain for `chain` and writes it to `output_dir`.
+    :param workload: optional `WorkloadConfig`, a `Workload` is then generated after the regular motifs
+    :param options: passed on to the Runner, e.g. `cache_dir`, `offline` or `scale`
+    """
+    runner = Runner(output_dir, chain, executable, **options)
+    for motif in MOTIFS:
+        if motif is FinalizeChain and workload is not None:
+            runner.add_generator(Workload, config=workload)
+        runner.add_generator(motif)
+    runner.run()
@@ -1,43 +1,121 @@
 import atexit
-import json
 import logging
+import math
 import os
 import shutil
-import subprocess
+import sys
 import tempfile
-from time import sleep
-from typing import List, Type
+from typing import Dict, List, Type
 
 import bitcointx
 import bitcointx.rpc
+from bitcointx.wallet import CBitcoinAddress
+import testchain.address
+import testchain.blkfile
+import testchain.blockindex
+import testchain.chainstate
+import testchain.cospends
+import testchain.generator
+import testchain.offline
+import testchain.store
+import testchain.txtable
+import testchain.util
 from testchain.generator import Generator
-from testchain.address import COINBASE_KEY
+from testchain.address import Address, AddressLedger, COINBASE_ADDRESS
+from testchain.blkfile import DISK_MAGIC, extract_block_files
+from testchain.blockindex import write_block_index
+from testchain.addresspool import AddressPool, build_pool
+from testchain.aiorpc import AsyncRPCClient
+from testchain.batch import BatchingProxy
+from testchain.chainstate import ChainState
+from testchain.cospends import write_cospend_index
+from testchain.cache import OutputCache, SnapshotCache, cache_key, source_hash
+from testchain.node import Node, free_port
+from testchain.offline import OfflineNode
+from testchain.signing import SigningPool
+from testchain.store import STORE_FILES, open_store
+from testchain.tracing import RUNNER, RpcTracer, TracingProxy
+from testchain.txtable import TX_TABLE_DIR, TxTable
 from testchain.util import DisjointSet
 
 LOG_LEVEL = logging.INFO
 bitcointx.SelectParams('regtest')
 
+# Number of keys per generator that are precomputed into the address pool
+ADDRESS_POOL_SIZE = 1000
+
+# Modules that every generator depends on. Changing them invalidates all checkpoints.
+CORE_MODULES = [testchain.address, testchain.chainstate, testchain.generator, testchain.txtable, testchain.util]
+
+# Modules that write the output files. Changing them invalidates the cached outputs.
+OUTPUT_MODULES = [testchain.blkfile, testchain.blockindex, testchain.cospends, testchain.offline, testchain.store,
+                  sys.modules[__name__]]
+
+
+def address_spacing(scale: float, motif_sizes: Dict[str, int]) -> int:
+    """
+    Returns the number of key indices reserved per generator. Scaled motifs need more addresses, the default chain
+    uses 10000.
+    """
+    largest = max(motif_sizes.values(), default=0)
+    return 10000 * max(1, math.ceil(scale), math.ceil(largest / 10))
+
 
 class Runner(object):
     motif_generators: List[Generator]
 
-    def __init__(self, output_dir, chain, executable):
+    def __init__(self, output_dir, chain, executable, cache_dir=None, offline=False, batch_rpc=False,
+                 async_rpc=False, sign_processes=0, undo_files=False, scale=1, motif_sizes=None,
+                 trace_file=None, drop_spent_addresses=False, store="memory", tx_table=False):
         self.chain = chain
+        self.offline = offline
         self.exec = executable
-        self.current_time = 1535760000
+        self.start_time = 1535760000
         self.prev_block = None
         self.motif_generators = []
-        self.kv = {}
         self.cospends = DisjointSet()
+        self.address_ledger = AddressLedger(drop_spent=drop_spent_addresses)
         self.output_dir = os.path.join(output_dir, '')
         self._setup_logger()
         self._setup_chain_params()
-        self._setup_bitcoind()
-        self.proxy = bitcointx.rpc.Proxy(btc_conf_file=self.conf_file)
-        self.proxy.call("importprivkey", COINBASE_KEY)
+        self._setup_store(store)
+        self.cache_dir = cache_dir
+        self.undo_files = undo_files
+        self.scale = scale
+        self.motif_sizes = motif_sizes or {}
+        self.address_spacing = address_spacing(scale, self.motif_sizes)
+        self.snapshots = None
+        self.outputs = OutputCache(cache_dir) if cache_dir else None
+        self.output_files = []  # type: List[str]
+        self.async_client = None
+        self.signing_pool = SigningPool(sign_processes) if sign_processes > 1 else None
+        if offline:
+            self._setup_offline()
+            if cache_dir:
+                self.log.warning("Checkpoints are not supported in offline mode, only complete outputs are cached")
+            if async_rpc:
+                self.log.warning("There is no RPC server in offline mode, ignoring async RPC")
+        else:
+            self._setup_bitcoind()
+            self.proxy = bitcointx.rpc.Proxy(btc_conf_file=self.conf_file)
+            if batch_rpc:
+                self.proxy = BatchingProxy(self.proxy)
+            if async_rpc:
+                self.async_client = AsyncRPCClient.from_conf(self.conf_file)
+            if cache_dir:
+                self.snapshots = SnapshotCache(cache_dir)
+        self._setup_tracing(trace_file)
+        # kept in the network directory, so checkpoints include it
+        self.tx_table = TxTable(os.path.join(self.tempdir.name, "regtest", TX_TABLE_DIR)) if tx_table else None
+        self.chain_state = ChainState(self.proxy, self.start_time,
+                                      CBitcoinAddress(COINBASE_ADDRESS).to_scriptPubKey())
+
+    @property
+    def current_time(self):
+        return self.chain_state.mocktime
 
     def _setup_logger(self):
-        self.log = logging.getLogger(__name__)
+        self.log = logging.getLogger("{}.{}".format(__name__, self.chain))
         self.log.setLevel(LOG_LEVEL)
         ch = logging.StreamHandler()
         ch.setLevel(LOG_LEVEL)
@@ -51,6 +129,19 @@ class Runner(object):
             from testchain.util import CoreLitecoinParams, RegtestLitecoinParams
             bitcointx.SelectAlternativeParams(CoreLitecoinParams, RegtestLitecoinParams)
 
+    def _setup_store(self, kind):
+        """
+        Opens the ground truth store. Stores that write a file start from scratch on every run.
+        """
+        self.store_kind = kind
+        self.store_file = STORE_FILES.get(kind)
+        if self.store_file is not None:
+            path = self.prepare_output_dir() + self.store_file
+            for suffix in ["", "-wal", "-shm"]:
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        self.kv = open_store(kind, self.prepare_output_dir())
+
     def _setup_bitcoind(self):
         self.tempdir = tempfile.TemporaryDirectory()
         self.log.info("datadir: {}".format(self.tempdir.name))
@@ -62,92 +153,208 @@ class Runner(object):
         else:
             raise ValueError("Unkown chain. Please add an entry for the config file name.")
 
-        # copy conf file to temp dir
         self.conf_file = self.tempdir.name + "/" + filename
         self.log.info("Config file created at {}".format(self.conf_file))
-        shutil.copy("bitcoin.conf", self.conf_file)
 
         # launch bitcoind
-        params = [self.exec, "-rpcport=18443", "-datadir={}".format(self.tempdir.name),
-                  "-mocktime={}".format(self.current_time)]
+        params = ["-datadir={}".format(self.tempdir.name)]
 
         # Disable Bitcoin Cash specific address format (breaks Python library)
         # Enable CTOR
         if self.chain == "bch":
             params += ["-usecashaddr=0", "-magneticanomalyactivationtime=0"]
-        self.proc = subprocess.Popen(params, stdout=subprocess.DEVNULL)
+        self.node = Node(self.exec, self.conf_file, params, self.log, ports=self._assign_ports)
 
-        # kill process when generator is done
+        # stop process when generator is done
         atexit.register(self._terminate)
 
-        self.log.info("Waiting 10 seconds for node to start")
-        sleep(10)
+    def _assign_ports(self) -> List[str]:
+        """
+        Picks free ports, so multiple nodes can run side by side, and writes the conf file with the RPC port, which the
+        RPC clients read.
+        :return: the port parameters of the node
+        """
+        self.rpc_port = free_port()
+        self.p2p_port = free_port()
+        while self.p2p_port == self.rpc_port:
+            self.p2p_port = free_port()
+        shutil.copy("bitcoin.conf", self.conf_file)
+        with open(self.conf_file, "a") as f:
+            f.write("rpcport={}\n".format(self.rpc_port))
+        return ["-rpcport={}".format(self.rpc_port), "-port={}".format(self.p2p_port)]
+
+    def _setup_offline(self):
+        """
+        Builds blocks in-process instead of launching bitcoind
+        """
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.log.info("datadir: {} (offline)".format(self.tempdir.name))
+        self.node = None
+        self.proxy = OfflineNode(self.chain, self.tempdir.name, self.log, self.start_time)
+
+    def _setup_tracing(self, trace_file):
+        """
+        Records the RPC calls where they reach the node, i.e. below the batching layer
+        """
+        self.trace_file = trace_file
+        self.tracer = RpcTracer(keep_events=trace_file is not None)
+        if isinstance(self.proxy, BatchingProxy):
+            self.proxy.proxy = TracingProxy(self.proxy.proxy, self.tracer)
+        else:
+            self.proxy = TracingProxy(self.proxy, self.tracer)
+        if self.async_client is not None:
+            self.async_client.tracer = self.tracer
+
+    def _start_node(self):
+        """
+        Launches bitcoind with the current mocktime and waits until it accepts RPC requests
+        """
+        if self.offline:
+            return
+        rpc_port = self.rpc_port
+        self.node.start(["-mocktime={}".format(self.current_time)])
+        if self.rpc_port != rpc_port:
+            self._reconnect_rpc()
 
     def _terminate(self):
         """
-        Kills the bitcoind process
+        Shuts down the bitcoind process
+        """
+        self.node.stop()
+
+    def _checkpoint_keys(self) -> List[str]:
+        """
+        Returns one checkpoint key per generator. Each key covers the generator's source code and parameters as well
+        as the key of its predecessor, so editing a motif invalidates its checkpoint and all later ones.
+        """
+        keys = []
+        key = cache_key(chain=self.chain, node=self.node.version(), mocktime=self.start_time,
+                        tx_table=self.tx_table is not None, core=[source_hash(m) for m in CORE_MODULES])
+        for g in self.motif_generators:
+            key = cache_key(prev=key, generator=type(g).__name__, source=source_hash(type(g)),
+                            params=g.snapshot_params())
+            keys.append(key)
+        return keys
+
+    def _output_key(self) -> str:
+        """
+        Returns the key of the complete output. It covers the source files of all motifs in their order, their
+        parameters, the chain, the node version and the options that change the written files.
         """
-        self.proc.terminate()
-        self.log.info("Waiting 5 seconds for node to quit")
-        sleep(5)
+        node = self.node.version() if self.node is not None else "offline"
+        return cache_key(chain=self.chain, node=node, mocktime=self.start_time, undo_files=self.undo_files,
+                         store=self.store_file, tx_table=self.tx_table is not None,
+                         core=[source_hash(m) for m in CORE_MODULES + OUTPUT_MODULES],
+                         generators=[[type(g).__name__, source_hash(sys.modules[type(g).__module__]),
+                                      g.snapshot_params()] for g in self.motif_generators])
+
+    def _checkpoint_state(self, generators: List[Generator]):
+        return {
+            "chain_state": self.chain_state.to_dict(),
+            "kv": dict(self.kv.items()),
+            "cospends": [list(s) for s in self.cospends.all()],
+            "address_ledger": self.address_ledger.to_dict(),
+            "tx_table": self.tx_table.to_dict() if self.tx_table is not None else None,
+            "generators": [{"address_cursor": g.address_cursor,
+                            "addresses": [[a.key_index, a.type] for a in g.addresses.values()]} for g in generators],
+        }
+
+    def _restore_checkpoint(self, keys: List[str]) -> int:
+        """
+        Restores the newest checkpoint in `keys`.
+        :return: the number of generators covered by the restored checkpoint
+        """
+        for idx in reversed(range(len(keys))):
+            state = self.snapshots.restore(keys[idx], self.tempdir.name)
+            if state is None:
+                continue
+            self.chain_state.load_dict(state["chain_state"])
+            self.kv.update(state["kv"])
+            for s in state["cospends"]:
+                self.cospends.union_all(s)
+            self.address_ledger.load_dict(state["address_ledger"])
+            if self.tx_table is not None:
+                self.tx_table.load_dict(state["tx_table"])
+            for g, g_state in zip(self.motif_generators, state["generators"]):
+                g.address_cursor = g_state["address_cursor"]
+                g.addresses = {key_index: Address.from_key_index(key_index, address_type)
+                               for key_index, address_type in g_state["addresses"]}
+            self.log.info("Restored checkpoint after {}".format(type(self.motif_generators[idx]).__name__))
+            return idx + 1
+        return 0
+
+    def _save_checkpoint(self, key: str, count: int):
+        """
+        Checkpoints the chain and runner state after the first `count` generators.
+        """
+        name = type(self.motif_generators[count - 1]).__name__
+        if self.proxy.getrawmempool():
+            # unconfirmed transactions would have to survive a node restart, rather skip this checkpoint
+            self.log.info("Not checkpointing after {}, mempool is not empty".format(name))
+            return
+        # the datadir can only be copied consistently while the node is down
+        if self.async_client is not None:
+            self.async_client.disconnect()
+        self.node.stop()
+        if self.tx_table is not None:
+            self.tx_table.flush()
+        self.snapshots.save(key, self.tempdir.name, self._checkpoint_state(self.motif_generators[:count]))
+        self.log.info("Checkpointed after {}".format(name))
+        self._start_node()
+        self._reconnect_rpc()
+
+    def _reconnect_rpc(self):
+        """
+        Replaces the proxy below the tracing (and batching) layer after the node was restarted, its keep-alive
+        connection still points at the stopped process (or the node moved to new ports). The wrappers are kept, so the
+        generators and the chain state use the new connection right away.
+        """
+        tracing = self.proxy.proxy if isinstance(self.proxy, BatchingProxy) else self.proxy
+        tracing.proxy = bitcointx.rpc.Proxy(btc_conf_file=self.conf_file)
+        if self.async_client is not None:
+            self.async_client.port = self.rpc_port
 
     def next_timestamp(self):
-        self.current_time += 600
-        return self.current_time
+        return self.chain_state.advance_time()
 
     def export_address_counts(self):
         self._address_sanity_check()
-        counts = {"p2pkh": 2, "p2wpkh": 0, "p2sh": 0, "p2wsh": 0}  # coinbase addresses
-        for g in self.motif_generators:
-            for addr in g.addresses:
-                counts[addr.type] += 1
+        counts = dict(self.address_ledger.counts)
+        counts["p2pkh"] += 2  # coinbase addresses
         self.kv["p2pkh_address_count"] = counts["p2pkh"]
         self.kv["p2wpkh_address_count"] = counts["p2wpkh"]
         self.kv["p2sh_address_count"] = counts["p2sh"]
         self.kv["p2wsh_address_count"] = counts["p2wsh"]
 
     def _address_sanity_check(self):
-        total_addresses = 0
-        unique_addresses = set()
-        for g in self.motif_generators:
-            key_indizes = [x.key_index for x in g.addresses]
-            unique_addresses |= set(key_indizes)
-            total_addresses += len(key_indizes)
-        if len(unique_addresses) != total_addresses:
+        if self.address_ledger.duplicates:
             self.log.warning("Addresses are not unique.")
 
     def copy_blk_file(self, truncate_file=True):
         """
-        Copies the first blk file from the regtest directory to the output directory
-        :param truncate_file: Whether the final block file should be truncated. Works with BlockSci, but may not work
-        when using other parsers.
+        Copies the blk files (and the rev files, if requested) from the regtest directory to the output directory
+        :param truncate_file: Whether the preallocated space at the end of the files should be left out. Works with
+        BlockSci, but may not work when using other parsers.
         """
         blk_destination = self.output_dir + self.chain + "/regtest/blocks/"
-        self.log.info("Copying blk00000.dat to {}".format(blk_destination))
-        if not os.path.exists(blk_destination):
-            os.makedirs(blk_destination)
-        source = "{}/regtest/blocks/blk00000.dat".format(self.tempdir.name)
-
-        if truncate_file:
-            with open(source, "rb") as f:
-                with open(blk_destination + "blk00000.dat", "wb") as dest:
-                    counter = 0
-                    while True:
-                        bts = f.read(16)
-                        if not bts or counter == 16:
-                            break
-                        if bts == b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00':
-                            counter += 1
-                        else:
-                            counter = 0
-                        dest.write(bts)
-        else:
-            shutil.copy(source, blk_destination)
+        source = "{}/regtest/blocks/".format(self.tempdir.name)
+        copied = extract_block_files(source, blk_destination, DISK_MAGIC[self.chain], truncate=truncate_file,
+                                     include_undo=self.undo_files)
+        self.output_files += ["regtest/blocks/" + name for name in copied]
+        self.log.info("Copied {} to {}".format(", ".join(copied), blk_destination))
+
+    def persist_block_index(self):
+        """
+        Writes the block and transaction index of the copied blk files to blocks.idx
+        """
+        self.log.info("Writing block index to file blocks.idx")
+        dest_dir = self.prepare_output_dir()
+        write_block_index(dest_dir + "blocks.idx", dest_dir + "regtest/blocks/", DISK_MAGIC[self.chain])
+        self.output_files.append("blocks.idx")
 
     def prepare_output_dir(self):
         dest_dir = self.output_dir + self.chain + "/"
-        if not os.path.exists(dest_dir):
-            os.mkdir(dest_dir)
+        os.makedirs(dest_dir, exist_ok=True)
         return dest_dir
 
     def persist_hashes(self):
@@ -158,30 +365,127 @@ class Runner(object):
         # for g in self.motif_generators:
         #     kv = {**kv, **g.stored_hashes}
 
-        self.log.info("Writing hashes to file output.json")
-        self.log.debug(self.kv)
+        self.log.info("Writing {} hashes to file output.json".format(len(self.kv)))
         dest_dir = self.prepare_output_dir()
-        with open(dest_dir + "output.json", "w") as f:
-            json.dump(self.kv, f, indent=4)
+        self.kv.export_json(dest_dir + "output.json")
+        self.kv.close()
+        self.output_files.append("output.json")
+        if self.store_file is not None:
+            self.output_files.append(self.store_file)
 
     def persist_cospends(self):
         self.log.info("Writing cospent addresse to file cospends.txt")
         dest_dir = self.prepare_output_dir()
         with open(dest_dir + "cospends.txt", "w") as f:
-            for s in self.cospends.all():
+            for s in self.cospends.iter_clusters():
                 f.write(",".join(s))
                 f.write("\n")
 
-    def add_generator(self, generator: Type[Generator]):
-        gen = generator(self.proxy, self.chain, self.log, self.kv, (len(self.motif_generators) + 1) * 10000,
-                        self.next_timestamp, self.cospends)
+        self.log.info("Writing cospend index to file cospends.bin")
+        write_cospend_index(dest_dir + "cospends.bin",
+                            ([CBitcoinAddress(a).to_scriptPubKey() for a in s] for s in self.cospends.iter_clusters()))
+        self.output_files += ["cospends.txt", "cospends.bin"]
+
+    def persist_tx_table(self):
+        """
+        Copies the transaction table to the txtable directory, if it was recorded.
+        """
+        if self.tx_table is None:
+            return
+        self.tx_table.close()
+        self.log.info("Writing {} transactions to {}/".format(len(self.tx_table), TX_TABLE_DIR))
+        dest_dir = self.prepare_output_dir() + TX_TABLE_DIR
+        shutil.rmtree(dest_dir, ignore_errors=True)
+        shutil.copytree(self.tx_table.directory, dest_dir)
+        self.output_files += [TX_TABLE_DIR + "/" + name for name in self.tx_table.files()]
+
+    def add_generator(self, generator: Type[Generator], **kwargs):
+        """
+        :param kwargs: passed on to the generator's constructor
+        """
+        gen = generator(self.proxy, self.chain, self.log, self.kv,
+                        (len(self.motif_generators) + 1) * self.address_spacing, self.next_timestamp, self.cospends,
+                        self.chain_state, self.async_client, self.signing_pool, self.scale, self.motif_sizes,
+                        self.address_ledger, self.tx_table, **kwargs)
         self.log.debug("Magic No: {}".format(gen.offset))
         self.motif_generators.append(gen)
 
+    def _setup_address_pool(self):
+        """
+        Memory-maps the precomputed keys of all generators, building the table first if this is the first run with
+        the same generators.
+        """
+        ranges = [(g.offset, ADDRESS_POOL_SIZE) for g in self.motif_generators]
+        path = os.path.join(self.cache_dir, "address-pool-{}.bin".format(cache_key(ranges=ranges)[:16]))
+        if not os.path.exists(path):
+            self.log.info("Precomputing {} keys".format(len(ranges) * ADDRESS_POOL_SIZE))
+            os.makedirs(self.cache_dir, exist_ok=True)
+            build_pool(path, ranges)
+        Address.pool = AddressPool(path)
+
+    def run_generator(self, generator: Generator):
+        """
+        Runs a single generator. Subclasses can override this to instrument the motifs.
+        """
+        self.tracer.motif = type(generator).__name__
+        try:
+            generator.run()
+            # send the queued calls now, so they are attributed to this motif
+            if isinstance(self.proxy, BatchingProxy):
+                self.proxy.flush()
+        finally:
+            self.tracer.motif = RUNNER
+
+    def _restore_output(self, key: str) -> bool:
+        if not self.outputs.has(key):
+            return False
+        # the restored files replace the store that was opened for this run
+        self.kv.close()
+        files = self.outputs.restore(key, self.prepare_output_dir())
+        if files is None:
+            self._setup_store(self.store_kind)
+            return False
+        self.log.info("Restored {} output files from the cache, skipping generation".format(len(files)))
+        if self.async_client is not None:
+            self.async_client.close()
+        if self.signing_pool is not None:
+            self.signing_pool.close()
+        return True
+
     def run(self):
-        for g in self.motif_generators:
-            g.run()
+        output_key = self._output_key() if self.outputs else None
+        if output_key and self._restore_output(output_key):
+            return
+        if self.cache_dir:
+            self._setup_address_pool()
+        keys = self._checkpoint_keys() if self.snapshots else []
+        done = self._restore_checkpoint(keys) if keys else 0
+        self._start_node()
+        if not done:
+            self.chain_state.tip = self.proxy.getbestblockhash()
+
+        for idx in range(done, len(self.motif_generators)):
+            self.run_generator(self.motif_generators[idx])
+            if keys and not self.snapshots.has(keys[idx]):
+                self._save_checkpoint(keys[idx], idx + 1)
+        if isinstance(self.proxy, BatchingProxy):
+            self.proxy.flush()
+        if self.async_client is not None:
+            self.async_client.close()
+        if self.signing_pool is not None:
+            self.signing_pool.close()
+        self.tracer.log_summary(self.log)
+        if self.trace_file is not None:
+            self.log.info("Writing RPC trace to {}".format(self.trace_file))
+            self.tracer.write(self.trace_file)
         self._address_sanity_check()
         self.copy_blk_file()
+        self.persist_block_index()
         self.persist_hashes()
         self.persist_cospends()
+        self.persist_tx_table()
+        if output_key:
+            self.outputs.save(output_key, self.prepare_output_dir(), self.output_files)
+        if Address.pool is not None:
+            Address.pool.close()
+            Address.pool = None
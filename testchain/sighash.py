@@ -0,0 +1,71 @@
+import struct
+
+from bitcointx.core import CTransaction, Hash
+from bitcointx.core.script import CScript, FindAndDelete, OP_CODESEPARATOR, SIGHASH_ALL
+from bitcointx.core.serialize import BytesSerializer, VarIntSerializer
+from bitcointx.wallet import CBitcoinSecret
+
+SIGHASH_FORKID = 0x40
+
+
+class SighashContext(object):
+    """
+    Computes SIGHASH_ALL signature hashes for all inputs of one transaction.
+
+    The parts that are the same for every input are hashed or serialized once: hashPrevouts, hashSequence and
+    hashOutputs for BIP143 (segwit inputs and all Bitcoin Cash inputs), and the inputs without scriptSigs and the
+    outputs for legacy inputs. Signing an n-input transaction therefore hashes each input and output only once for
+    BIP143. The transaction's inputs and outputs must not change while the context is used; scriptSigs and
+    witnesses may.
+    """
+
+    def __init__(self, tx: CTransaction, chain: str):
+        self.tx = tx
+        self.chain = chain
+        self.hash_type = SIGHASH_ALL | SIGHASH_FORKID if chain == "bch" else SIGHASH_ALL
+        self._version = struct.pack("<i", tx.nVersion)
+        self._locktime = struct.pack("<I", tx.nLockTime)
+        self._outpoints = [txin.prevout.serialize() for txin in tx.vin]
+        self._sequences = [struct.pack("<I", txin.nSequence) for txin in tx.vin]
+        self._outputs = b"".join(txout.serialize() for txout in tx.vout)
+        self._hash_prevouts = Hash(b"".join(self._outpoints))
+        self._hash_sequence = Hash(b"".join(self._sequences))
+        self._hash_outputs = Hash(self._outputs)
+        self._legacy_inputs = None
+
+    def _uses_bip143(self, script_type: str) -> bool:
+        return self.chain == "bch" or script_type == "p2wpkh" or script_type == "p2wsh"
+
+    def witness_v0_hash(self, script: CScript, in_idx: int, amount: int) -> bytes:
+        """
+        BIP143 signature hash (also used by Bitcoin Cash with SIGHASH_FORKID)
+        """
+        return Hash(self._version + self._hash_prevouts + self._hash_sequence + self._outpoints[in_idx] +
+                    BytesSerializer.serialize(script) + struct.pack("<q", amount) + self._sequences[in_idx] +
+                    self._hash_outputs + self._locktime + struct.pack("<I", self.hash_type))
+
+    def legacy_hash(self, script: CScript, in_idx: int) -> bytes:
+        """
+        Pre-segwit signature hash: the transaction with all scriptSigs emptied except the signed one.
+        """
+        if self._legacy_inputs is None:
+            empty = BytesSerializer.serialize(b"")
+            self._legacy_inputs = [outpoint + empty + sequence
+                                   for outpoint, sequence in zip(self._outpoints, self._sequences)]
+        script = FindAndDelete(script, CScript([OP_CODESEPARATOR]))
+        inputs = list(self._legacy_inputs)
+        inputs[in_idx] = self._outpoints[in_idx] + BytesSerializer.serialize(script) + self._sequences[in_idx]
+        return Hash(self._version + VarIntSerializer.serialize(len(inputs)) + b"".join(inputs) +
+                    VarIntSerializer.serialize(len(self.tx.vout)) + self._outputs + self._locktime +
+                    struct.pack("<I", self.hash_type))
+
+    def signature_hash(self, script: CScript, in_idx: int, amount: int, script_type: str = "p2pkh") -> bytes:
+        if self._uses_bip143(script_type):
+            return self.witness_v0_hash(script, in_idx, amount)
+        return self.legacy_hash(script, in_idx)
+
+    def sign(self, script: CScript, in_idx: int, amount: int, key: CBitcoinSecret, script_type: str = "p2pkh") -> bytes:
+        """
+        :return: the signature including the hash type byte
+        """
+        return key.sign(self.signature_hash(script, in_idx, amount, script_type)) + bytes([self.hash_type])
@@ -0,0 +1,73 @@
+import multiprocessing
+from typing import List, Optional, Tuple
+
+from bitcointx.core import CMutableTransaction, CTransaction
+from bitcointx.core.script import CScript
+from bitcointx.wallet import CBitcoinSecret
+
+from testchain.sighash import SighashContext
+from testchain.util import spawn_pool
+
+# script, input index, amount in satoshi, key, address type
+SigningJob = Tuple[CScript, int, int, CBitcoinSecret, str]
+
+
+def sign_input(chain: str, script: CScript, tx: CTransaction, in_idx: int, amount: int, key: CBitcoinSecret,
+               script_type: str = "p2pkh") -> bytes:
+    """
+    Signs one input of `tx` with SIGHASH_ALL (and FORKID on Bitcoin Cash).
+    To sign several inputs of the same transaction, use one `SighashContext` instead.
+    :return: the signature including the hash type byte
+    """
+    return SighashContext(tx, chain).sign(script, in_idx, amount, key, script_type)
+
+
+def sign_jobs(context: SighashContext, jobs: List[SigningJob]) -> List[bytes]:
+    return [context.sign(script, in_idx, amount, key, script_type) for script, in_idx, amount, key, script_type in jobs]
+
+
+def _sign_chunk(chain: str, tx_bytes: bytes, jobs: List[Tuple[bytes, int, int, bytes, str]]) -> List[bytes]:
+    # runs in a worker: scripts, transaction and keys are passed as plain bytes
+    context = SighashContext(CMutableTransaction.deserialize(tx_bytes), chain)
+    return sign_jobs(context, [(CScript(script), in_idx, amount, CBitcoinSecret.from_secret_bytes(secret), script_type)
+                               for script, in_idx, amount, secret, script_type in jobs])
+
+
+class SigningPool(object):
+    """
+    Signs the inputs of large transactions in worker processes. Every worker gets a contiguous slice of the inputs and
+    the serialized transaction, computes the signature hashes (sharing one `SighashContext`) and signs them.
+    The signatures are returned in input order and are the same as with serial signing, because the nonces are derived
+    deterministically (RFC 6979).
+    """
+
+    def __init__(self, processes: Optional[int] = None, threshold: int = 16):
+        """
+        :param processes: number of worker processes (default: number of CPUs)
+        :param threshold: transactions with fewer inputs are signed in the calling process
+        """
+        self.processes = processes or multiprocessing.cpu_count()
+        self.threshold = threshold
+        self._pool = None
+
+    def sign(self, chain: str, tx: CTransaction, jobs: List[SigningJob]) -> List[bytes]:
+        """
+        :return: one signature per job, in the order of `jobs`
+        """
+        if len(jobs) < self.threshold or self.processes < 2:
+            return sign_jobs(SighashContext(tx, chain), jobs)
+
+        if self._pool is None:
+            self._pool = spawn_pool(self.processes)
+        tx_bytes = tx.serialize()
+        plain = [(bytes(script), in_idx, amount, bytes(key)[:32], script_type)
+                 for script, in_idx, amount, key, script_type in jobs]
+        size = -(-len(plain) // self.processes)
+        chunks = [(chain, tx_bytes, plain[i:i + size]) for i in range(0, len(plain), size)]
+        return [sig for chunk in self._pool.starmap(_sign_chunk, chunks) for sig in chunk]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
@@ -0,0 +1,220 @@
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+
+def write_json(f, items: Iterable[Tuple[str, Any]]):
+    """
+    Writes key/value pairs as a JSON object, formatted exactly like `json.dump(dict(items), f, indent=4)`, without
+    building the dict.
+    """
+    empty = True
+    for key, value in items:
+        f.write("{\n    " if empty else ",\n    ")
+        empty = False
+        f.write(json.dumps(key))
+        f.write(": ")
+        f.write(json.dumps(value, indent=4).replace("\n", "\n    "))
+    f.write("{}" if empty else "\n}")
+
+
+class GroundTruthStore(object):
+    """
+    Key/value store for the ground truth logged by the generators. Like a dict, keys keep the position at which they
+    were first stored when their value is overwritten. Values must be JSON-serializable.
+    """
+
+    def __setitem__(self, key: str, value):
+        raise NotImplementedError
+
+    def __getitem__(self, key: str):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """
+        :return: all entries in insertion order
+        """
+        raise NotImplementedError
+
+    def prefix(self, prefix: str) -> Iterator[Tuple[str, Any]]:
+        """
+        :return: the entries whose key starts with `prefix` (e.g. "tx-chain-"), in insertion order
+        """
+        return ((k, v) for k, v in self.items() if k.startswith(prefix))
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def update(self, entries: Dict):
+        for k, v in entries.items():
+            self[k] = v
+
+    def export_json(self, path: str):
+        """
+        Writes all entries to `path` in the format of output.json.
+        """
+        with open(path, "w") as f:
+            write_json(f, self.items())
+
+    def close(self):
+        pass
+
+
+class MemoryStore(GroundTruthStore):
+    """
+    Keeps all entries in a dict. Nothing is written before `export_json`.
+    """
+
+    def __init__(self):
+        self.entries = {}
+
+    def __setitem__(self, key: str, value):
+        self.entries[key] = value
+
+    def __getitem__(self, key: str):
+        return self.entries[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return iter(self.entries.items())
+
+
+class SQLiteStore(GroundTruthStore):
+    """
+    Stores the entries in an SQLite database. Keys are indexed, so prefix queries do not scan the whole store.
+    Writes are committed every `commit_interval` entries, so a crashed run loses at most that many entries.
+    """
+
+    def __init__(self, path: str, commit_interval: int = 1000):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS entries (seq INTEGER PRIMARY KEY, key TEXT UNIQUE, value TEXT)")
+        self.db.commit()
+        self._pending = 0
+
+    def __setitem__(self, key: str, value):
+        value = json.dumps(value)
+        if self.db.execute("UPDATE entries SET value = ? WHERE key = ?", (value, key)).rowcount == 0:
+            self.db.execute("INSERT INTO entries (key, value) VALUES (?, ?)", (key, value))
+        self._pending += 1
+        if self._pending >= self.commit_interval:
+            self.db.commit()
+            self._pending = 0
+
+    def __getitem__(self, key: str):
+        row = self.db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return json.loads(row[0])
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        for key, value in self.db.execute("SELECT key, value FROM entries ORDER BY seq"):
+            yield key, json.loads(value)
+
+    def prefix(self, prefix: str) -> Iterator[Tuple[str, Any]]:
+        if not prefix:
+            return self.items()
+        # keys between the prefix and its successor, which the unique index can answer
+        end = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        rows = self.db.execute("SELECT key, value FROM entries WHERE key >= ? AND key < ? ORDER BY seq",
+                               (prefix, end)).fetchall()
+        return ((key, json.loads(value)) for key, value in rows)
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+class JSONLStore(GroundTruthStore):
+    """
+    Appends every entry to a JSON Lines file as `[key, value]` and flushes it right away. Only the offset of the
+    latest line of every key is kept in memory. An existing file is loaded, later lines override earlier ones.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offsets = {}  # type: Dict[str, int]
+        end = 0
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    self.offsets[json.loads(line.decode())[0]] = end
+                    end += len(line)
+        self.file = open(path, "ab")
+        # drop a line that was cut off by a crash
+        self.file.truncate(end)
+        self.file.seek(end)
+
+    def __setitem__(self, key: str, value):
+        offset = self.file.tell()
+        self.file.write(json.dumps([key, value]).encode() + b"\n")
+        self.file.flush()
+        self.offsets[key] = offset
+
+    def _read(self, f, offset: int):
+        f.seek(offset)
+        return json.loads(f.readline().decode())[1]
+
+    def __getitem__(self, key: str):
+        offset = self.offsets[key]
+        with open(self.path, "rb") as f:
+            return self._read(f, offset)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return self._entries(list(self.offsets.items()))
+
+    def prefix(self, prefix: str) -> Iterator[Tuple[str, Any]]:
+        return self._entries([(k, o) for k, o in self.offsets.items() if k.startswith(prefix)])
+
+    def _entries(self, offsets):
+        with open(self.path, "rb") as f:
+            for key, offset in offsets:
+                yield key, self._read(f, offset)
+
+    def close(self):
+        self.file.close()
+
+
+# file names of the stores that are written while the chain is generated
+STORE_FILES = {"sqlite": "ground-truth.sqlite", "jsonl": "ground-truth.jsonl"}
+STORES = ["memory"] + sorted(STORE_FILES)
+
+
+def open_store(kind: str, directory: Optional[str] = None) -> GroundTruthStore:
+    """
+    :param kind: one of STORES
+    :param directory: where the sqlite and jsonl stores write their file, see STORE_FILES
+    """
+    if kind == "memory":
+        return MemoryStore()
+    if kind == "sqlite":
+        return SQLiteStore(os.path.join(directory, STORE_FILES[kind]))
+    if kind == "jsonl":
+        return JSONLStore(os.path.join(directory, STORE_FILES[kind]))
+    raise ValueError("Unknown ground truth store {}, expected one of {}".format(kind, ", ".join(STORES)))
@@ -0,0 +1,145 @@
+import json
+import time
+from collections import Counter
+from logging import Logger
+from typing import Dict, List
+
+# calls made outside of any motif, e.g. while starting the node or checkpointing
+RUNNER = "Runner"
+
+
+class MethodStats(object):
+    """
+    Call count and latency distribution of one RPC method. The histogram has power-of-two buckets in microseconds:
+    bucket k counts the calls that took less than 2^k µs (and at least 2^(k-1) µs).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.timed = 0
+        self.total = 0.0
+        self.min = None  # None until the first timed call
+        self.max = 0.0
+        self.histogram = {}  # type: Dict[int, int]
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.timed += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        bucket = int(seconds * 1e6).bit_length()
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "total_seconds": self.total,
+            "mean_seconds": self.total / self.timed if self.timed else None,
+            "min_seconds": self.min,
+            "max_seconds": self.max,
+            "histogram_us": {"<{}".format(2 ** k): n for k, n in sorted(self.histogram.items())},
+        }
+
+
+class RpcTracer(object):
+    """
+    Collects the RPC calls of a run and attributes them to the motif that is currently running.
+    """
+
+    def __init__(self, keep_events: bool = False):
+        """
+        :param keep_events: also keep every single call, for writing a trace file
+        """
+        self.motif = RUNNER
+        self.started = time.perf_counter()
+        self.stats = {}  # (motif, method) -> MethodStats
+        self.events = [] if keep_events else None
+
+    def _stats(self, method: str) -> MethodStats:
+        key = (self.motif, method)
+        if key not in self.stats:
+            self.stats[key] = MethodStats()
+        return self.stats[key]
+
+    def record(self, method: str, started: float, seconds: float):
+        """
+        Records a call that started at `started` (a `time.perf_counter()` value) and took `seconds`.
+        """
+        self._stats(method).add(seconds)
+        if self.events is not None:
+            self.events.append([self.motif, method, started - self.started, seconds])
+
+    def count(self, method: str):
+        """
+        Counts a call without latency, e.g. one that was sent as part of a batch.
+        """
+        self._stats(method).count += 1
+
+    def calls(self) -> Counter:
+        """
+        :return: method -> number of calls, over all motifs
+        """
+        calls = Counter()
+        for (_, method), stats in self.stats.items():
+            calls[method] += stats.count
+        return calls
+
+    def summary(self) -> Dict[str, Dict[str, Dict]]:
+        """
+        :return: motif -> method -> statistics
+        """
+        summary = {}
+        for (motif, method), stats in self.stats.items():
+            summary.setdefault(motif, {})[method] = stats.to_dict()
+        return summary
+
+    def log_summary(self, log: Logger):
+        for motif, methods in self.summary().items():
+            total = sum(s["total_seconds"] for s in methods.values())
+            calls = ", ".join("{} {}x".format(method, s["count"]) for method, s in sorted(methods.items()))
+            log.info("RPC {}: {:.2f}s in {}".format(motif, total, calls))
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            json.dump({"summary": self.summary(), "events": self.events or []}, f)
+
+
+class TracingProxy(object):
+    """
+    Wraps a proxy (or `OfflineNode`) and records the latency of every call in an `RpcTracer`. For JSON-RPC batches,
+    the round trip is recorded as "batch" and the methods in the batch are counted.
+    """
+
+    def __init__(self, proxy, tracer: RpcTracer):
+        self.proxy = proxy
+        self.tracer = tracer
+
+    def call(self, service_name: str, *args):
+        started = time.perf_counter()
+        try:
+            return self.proxy.call(service_name, *args)
+        finally:
+            self.tracer.record(service_name, started, time.perf_counter() - started)
+
+    def _batch(self, requests: List[Dict]):
+        for r in requests:
+            self.tracer.count(r["method"])
+        started = time.perf_counter()
+        try:
+            return self.proxy._batch(requests)
+        finally:
+            self.tracer.record("batch", started, time.perf_counter() - started)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.proxy, name)
+        if not callable(attr):
+            return attr
+
+        def f(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                self.tracer.record(name, started, time.perf_counter() - started)
+        return f
@@ -0,0 +1,334 @@
+import json
+import os
+import sys
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# directory of the table, below the network directory of the node and in the output directory
+TX_TABLE_DIR = "txtable"
+MANIFEST = "txtable.json"
+
+# numpy dtype -> array typecode, all numbers are written little endian
+TYPECODES = {"<u1": "B", "<u4": "I", "<i4": "i", "<u8": "Q", "<i8": "q"}
+
+# table -> [(column, dtype)]. Rows of `inputs` and `outputs` are in transaction order, chunk k of every table belongs
+# to the transactions in chunk k of `transactions`.
+SCHEMA = {
+    "transactions": [("txid", "|S32"), ("motif", "<u4"), ("height", "<i4"), ("locktime", "<u4"),
+                     ("input_count", "<u4"), ("output_count", "<u4")],
+    "inputs": [("tx", "<u8"), ("prev_txid", "|S32"), ("prev_vout", "<u4"), ("sequence", "<u4")],
+    "outputs": [("tx", "<u8"), ("value", "<i8"), ("type", "<u4"), ("script_end", "<u8"), ("script", "<u1")],
+}
+
+# height of transactions that were not confirmed when they were written
+UNCONFIRMED = -1
+
+
+def script_type(script: bytes) -> str:
+    """
+    :return: the type of an output script: p2pkh, p2sh, p2wpkh, p2wsh, p2pk, multisig, nulldata or nonstandard
+    """
+    n = len(script)
+    if n == 25 and script[:3] == b"\x76\xa9\x14" and script[23:] == b"\x88\xac":
+        return "p2pkh"
+    if n == 23 and script[:2] == b"\xa9\x14" and script[22] == 0x87:
+        return "p2sh"
+    if n == 22 and script[:2] == b"\x00\x14":
+        return "p2wpkh"
+    if n == 34 and script[:2] == b"\x00\x20":
+        return "p2wsh"
+    if (n == 35 and script[0] == 33 or n == 67 and script[0] == 65) and script[-1] == 0xac:
+        return "p2pk"
+    if n > 0 and script[0] == 0x6a:
+        return "nulldata"
+    if n > 0 and script[-1] == 0xae:
+        return "multisig"
+    return "nonstandard"
+
+
+def _new_column(dtype: str):
+    return bytearray() if dtype.startswith("|S") else array(TYPECODES[dtype])
+
+
+def write_npy(path: str, dtype: str, data):
+    """
+    Writes a one-dimensional array in the NumPy .npy format (version 1.0), so it can be read with `numpy.load`.
+    :param dtype: a key of TYPECODES or "|S<n>"
+    :param data: an `array` of the matching typecode, or the concatenated values of a "|S<n>" column
+    """
+    if isinstance(data, array):
+        count = len(data)
+        if sys.byteorder == "big":
+            data = array(data.typecode, data)
+            data.byteswap()
+        data = data.tobytes()
+    else:
+        count = len(data) // int(dtype[2:])
+    header = "{{'descr': '{}', 'fortran_order': False, 'shape': ({},), }}".format(dtype, count)
+    # the header ends with a newline and is padded so the data starts at a multiple of 64 bytes
+    header += " " * (63 - (10 + len(header)) % 64) + "\n"
+    with open(path, "wb") as f:
+        f.write(b"\x93NUMPY\x01\x00" + len(header).to_bytes(2, "little") + header.encode("latin1"))
+        f.write(data)
+
+
+def read_npy(path: str):
+    """
+    Reads a file written by `write_npy`.
+    :return: an `array` for numbers, a list of bytes for "|S<n>" columns
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    header_len = int.from_bytes(data[8:10], "little")
+    header = data[10:10 + header_len].decode("latin1")
+    dtype = header.split("'descr': '")[1].split("'")[0]
+    body = data[10 + header_len:]
+    if dtype.startswith("|S"):
+        size = int(dtype[2:])
+        return [body[i:i + size] for i in range(0, len(body), size)]
+    values = array(TYPECODES[dtype])
+    values.frombytes(body)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class TxTable(object):
+    """
+    Records every transaction created by the generators in columnar form: one row per transaction, input and output,
+    see SCHEMA. Motif names and output types are indices into the string table of the manifest, txids are in
+    internal byte order (as serialized). Output scripts are concatenated per chunk, `script_end` is the end offset of
+    every script in the chunk's `script` column.
+
+    Transactions get their row when the block that confirms them is connected, in the order of the block, so the
+    table does not depend on the order in which the node accepted them. Rows are written in chunks of `chunk_size`
+    transactions as `<table>.<column>.<chunk>.npy`, only the last chunk is smaller. The manifest lists the columns and
+    the row count of every chunk.
+    """
+
+    def __init__(self, directory: str, chunk_size: int = 1 << 16):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.strings = []  # type: List[str]
+        self._string_ids = {}  # type: Dict[str, int]
+        self.chunks = {table: [] for table in SCHEMA}  # type: Dict[str, List[int]]
+        self._columns = {}
+        self._clear()
+        # transactions that are not confirmed yet: txid -> (transaction, motif)
+        self.pending = {}  # type: Dict[bytes, Tuple[object, str]]
+        # number of rows saved by `flush` as the files of the next chunk
+        self.tail = 0
+
+    def _clear(self):
+        self._columns = {table: {name: _new_column(dtype) for name, dtype in columns}
+                         for table, columns in SCHEMA.items()}
+
+    def __len__(self):
+        return self.written + self.buffered + len(self.pending)
+
+    @property
+    def written(self) -> int:
+        return sum(self.chunks["transactions"])
+
+    @property
+    def buffered(self) -> int:
+        return len(self._columns["transactions"]["height"])
+
+    def _string(self, s: str) -> int:
+        if s not in self._string_ids:
+            self._string_ids[s] = len(self.strings)
+            self.strings.append(s)
+        return self._string_ids[s]
+
+    def add(self, tx, motif: str, height: Optional[int] = None):
+        """
+        Records a transaction.
+        :param tx: a `CTransaction`
+        :param motif: name of the generator that created it
+        :param height: height of the block that contains it, None if it was sent to the mempool. The row of a
+                       transaction in the mempool is added by `confirm`.
+        """
+        if height is None:
+            self.pending[tx.GetTxid()] = (tx, motif)
+        else:
+            self._append(tx, motif, height)
+
+    def confirm(self, height: int, txids: Iterable[bytes]):
+        """
+        Adds the rows of the pending transactions that were confirmed by a block.
+        :param txids: the transactions of the block, in block order
+        """
+        for txid in txids:
+            pending = self.pending.pop(txid, None)
+            if pending is not None:
+                self._append(pending[0], pending[1], height)
+
+    def _append(self, tx, motif: str, height: int):
+        row = self.written + self.buffered
+        columns = self._columns["transactions"]
+        columns["txid"] += tx.GetTxid()
+        columns["motif"].append(self._string(motif))
+        columns["height"].append(height)
+        columns["locktime"].append(tx.nLockTime)
+        columns["input_count"].append(len(tx.vin))
+        columns["output_count"].append(len(tx.vout))
+
+        columns = self._columns["inputs"]
+        for txin in tx.vin:
+            columns["tx"].append(row)
+            columns["prev_txid"] += txin.prevout.hash
+            columns["prev_vout"].append(txin.prevout.n)
+            columns["sequence"].append(txin.nSequence)
+
+        columns = self._columns["outputs"]
+        for txout in tx.vout:
+            script = bytes(txout.scriptPubKey)
+            columns["tx"].append(row)
+            columns["value"].append(txout.nValue)
+            columns["type"].append(self._string(script_type(script)))
+            columns["script"].extend(script)
+            columns["script_end"].append(len(columns["script"]))
+
+        if self.buffered == self.chunk_size:
+            self._write_chunk()
+
+    def flush(self):
+        """
+        Saves the buffered rows, so the table can be restored from `to_dict`. They are written as the files of the
+        next chunk, which is written again once it is complete: chunk boundaries only depend on the number of rows.
+        Pending transactions are not saved, the mempool has to be empty.
+        """
+        if self.buffered:
+            self._write_rows(len(self.chunks["transactions"]), self.buffered)
+        self.tail = self.buffered
+        self._write_manifest()
+
+    def close(self):
+        """
+        Writes the remaining rows as the last chunk. Transactions that are still pending are added as UNCONFIRMED, in
+        the order of their txids.
+        """
+        for txid in sorted(self.pending):
+            tx, motif = self.pending[txid]
+            self._append(tx, motif, UNCONFIRMED)
+        self.pending = {}
+        if self.buffered:
+            self._write_chunk()
+        self._write_manifest()
+
+    def _write_rows(self, chunk: int, count: int) -> Dict[str, int]:
+        """
+        Writes the first `count` buffered transactions with their inputs and outputs as the files of `chunk`.
+        :return: the number of rows per table
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        tx_columns = self._columns["transactions"]
+        rows = {"transactions": count,
+                "inputs": sum(tx_columns["input_count"][:count]),
+                "outputs": sum(tx_columns["output_count"][:count])}
+        script_end = self._columns["outputs"]["script_end"]
+        script_bytes = script_end[rows["outputs"] - 1] if rows["outputs"] else 0
+        for table, columns in SCHEMA.items():
+            n = rows[table]
+            for name, dtype in columns:
+                if dtype.startswith("|S"):
+                    n_values = n * int(dtype[2:])
+                elif name == "script":
+                    n_values = script_bytes
+                else:
+                    n_values = n
+                write_npy(self._path(table, name, chunk), dtype, self._columns[table][name][:n_values])
+        return rows
+
+    def _write_chunk(self):
+        """
+        Writes all buffered transactions as the next chunk.
+        """
+        count = self.buffered
+        rows = self._write_rows(len(self.chunks["transactions"]), count)
+        for table in SCHEMA:
+            self.chunks[table].append(rows[table])
+        self._clear()
+        self.tail = 0
+        self._write_manifest()
+
+    def _path(self, table: str, column: str, chunk: int) -> str:
+        return os.path.join(self.directory, "{}.{}.{:05d}.npy".format(table, column, chunk))
+
+    def _write_manifest(self):
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = {
+            "strings": self.strings,
+            "tables": {table: {"columns": dict(columns), "chunks": self.chunks[table]}
+                       for table, columns in SCHEMA.items()},
+        }
+        with open(os.path.join(self.directory, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=4)
+
+    def files(self) -> List[str]:
+        """
+        :return: the names of all files of the table
+        """
+        names = [MANIFEST]
+        for table, columns in SCHEMA.items():
+            for chunk in range(len(self.chunks[table])):
+                names += [os.path.basename(self._path(table, name, chunk)) for name, _ in columns]
+        return names
+
+    def to_dict(self) -> Dict:
+        """
+        State of a flushed table, its rows are in the files.
+        """
+        return {"strings": self.strings, "chunks": self.chunks, "tail": self.tail}
+
+    def load_dict(self, state: Dict):
+        self.strings = list(state["strings"])
+        self._string_ids = {s: i for i, s in enumerate(self.strings)}
+        self.chunks = {table: list(state["chunks"][table]) for table in SCHEMA}
+        self._clear()
+        self.pending = {}
+        self.tail = state["tail"]
+        if self.tail:
+            # the rows saved by `flush` go back into the buffer
+            chunk = len(self.chunks["transactions"])
+            for table, columns in SCHEMA.items():
+                for name, dtype in columns:
+                    values = read_npy(self._path(table, name, chunk))
+                    if dtype.startswith("|S"):
+                        self._columns[table][name] += b"".join(values)
+                    else:
+                        self._columns[table][name].extend(values)
+
+
+def read_column(directory: str, table: str, column: str):
+    """
+    Reads a whole column of a table written by `TxTable`. The chunks of `script` are concatenated, the `script_end`
+    offsets are adjusted accordingly.
+    """
+    with open(os.path.join(directory, MANIFEST)) as f:
+        chunks = json.load(f)["tables"][table]["chunks"]
+    values = None
+    offset = 0
+    for chunk in range(len(chunks)):
+        part = read_npy(os.path.join(directory, "{}.{}.{:05d}.npy".format(table, column, chunk)))
+        if column == "script_end":
+            part = array(part.typecode, [end + offset for end in part])
+            offset = part[-1] if part else offset
+        values = part if values is None else values + part
+    if values is None:
+        dtype = dict(SCHEMA[table])[column]
+        return [] if dtype.startswith("|S") else array(TYPECODES[dtype])
+    return values
+
+
+def read_scripts(directory: str) -> List[bytes]:
+    """
+    :return: the output scripts of all outputs, in order
+    """
+    blob = bytes(read_column(directory, "outputs", "script"))
+    start = 0
+    scripts = []  # type: List[bytes]
+    for end in read_column(directory, "outputs", "script_end"):
+        scripts.append(blob[start:end])
+        start = end
+    return scripts
@@ -1,87 +1,121 @@
+import multiprocessing
+import multiprocessing.pool
+import sys
+from typing import Hashable, Iterator, List, Optional
+
 from bitcointx.core import CBlock, x, COIN, CoreChainParams
 
 
-class Coin(object):
-    COIN = 1e8
+class Amount(object):
+    """
+    Immutable amount of coins, stored as an integer number of satoshi. Arithmetic is exact: amounts can be added and
+    subtracted, multiplied by integers and divided into parts, but never mixed with plain numbers, which would leave
+    it open whether they mean BTC or satoshi.
+    """
+    __slots__ = ("satoshi",)
 
-    def __init__(self, val):
-        self.val = val
+    def __init__(self, satoshi: int):
+        if not isinstance(satoshi, int):
+            raise TypeError("Amounts are integer satoshi, use Amount.from_btc for BTC values")
+        object.__setattr__(self, "satoshi", satoshi)
 
     @classmethod
-    def from_satoshi(cls, value):
-        return cls(value / cls.COIN)
+    def from_btc(cls, value) -> "Amount":
+        return cls(int(round(value * COIN)))
+
+    def btc(self) -> float:
+        return self.satoshi / COIN
+
+    def split(self, n: int) -> List["Amount"]:
+        """
+        Divides the amount into n parts that differ by at most one satoshi and add up to the amount.
+        The first parts get the remainder.
+        """
+        share, remainder = divmod(self.satoshi, n)
+        return [Amount(share + 1) for _ in range(remainder)] + [Amount(share) for _ in range(n - remainder)]
 
-    def satoshi(self):
-        return int(round(self.val * self.COIN, 0))
+    def allocate(self, weights: List[float]) -> List["Amount"]:
+        """
+        Divides the amount proportionally to `weights`, rounding down. The last part gets the remainder, so the parts
+        add up to the amount.
+        """
+        total = sum(weights)
+        parts = [int(self.satoshi * w / total) for w in weights[:-1]]
+        parts.append(self.satoshi - sum(parts))
+        return [Amount(p) for p in parts]
 
-    def bitcoin(self):
-        return round(self.val, 8)
+    def __setattr__(self, key, value):
+        raise AttributeError("Amount is immutable")
 
     def __eq__(self, other):
-        if type(other) == Coin:
-            return self.satoshi() == other.satoshi()
-        else:
-            return self.satoshi() == other
+        if type(other) is not Amount:
+            return NotImplemented
+        return self.satoshi == other.satoshi
 
     def __ne__(self, other):
-        if type(other) == Coin:
-            return self.satoshi() != other.satoshi()
-        else:
-            return self.satoshi() != other
+        if type(other) is not Amount:
+            return NotImplemented
+        return self.satoshi != other.satoshi
+
+    def __lt__(self, other):
+        if type(other) is not Amount:
+            return NotImplemented
+        return self.satoshi < other.satoshi
 
     def __le__(self, other):
-        if type(other) == Coin:
-            return self.satoshi() <= other.satoshi()
-        else:
-            return self.satoshi() <= other
+        if type(other) is not Amount:
+            return NotImplemented
+        return self.satoshi <= other.satoshi
+
+    def __gt__(self, other):
+        if type(other) is not Amount:
+            return NotImplemented
+        return self.satoshi > other.satoshi
 
     def __ge__(self, other):
-        if type(other) == Coin:
-            return self.satoshi() >= other.satoshi()
-        else:
-            return self.satoshi() >= other
+        if type(other) is not Amount:
+            return NotImplemented
+        return self.satoshi >= other.satoshi
 
-    def __lt__(self, other):
-        if type(other) == Coin:
-            return self.satoshi() < other.satoshi()
-        else:
-            return self.satoshi() < other
+    def __hash__(self):
+        return hash(self.satoshi)
 
-    def __gt__(self, other):
-        if type(other) == Coin:
-            return self.satoshi() > other.satoshi()
-        else:
-            return self.satoshi() > other
+    def __bool__(self):
+        return self.satoshi != 0
 
     def __add__(self, other):
-        if type(other) == Coin:
-            return self.satoshi() + other.satoshi()
-        else:
-            return self.satoshi() + other
+        if type(other) is not Amount:
+            return NotImplemented
+        return Amount(self.satoshi + other.satoshi)
 
     def __sub__(self, other):
-        if type(other) == Coin:
-            return self.satoshi() - other.satoshi()
-        else:
-            return self.satoshi() - other
+        if type(other) is not Amount:
+            return NotImplemented
+        return Amount(self.satoshi - other.satoshi)
+
+    def __neg__(self):
+        return Amount(-self.satoshi)
 
     def __mul__(self, other):
-        if type(other) == Coin:
-            return self.satoshi() * other.satoshi()
-        else:
-            return self.satoshi() * other
+        if not isinstance(other, int):
+            return NotImplemented
+        return Amount(self.satoshi * other)
+
+    __rmul__ = __mul__
 
-    def __div__(self, other):
-        if type(other) == Coin:
-            return self.satoshi() / other.satoshi()
-        else:
-            return self.satoshi() / other
+    def __floordiv__(self, other):
+        if not isinstance(other, int):
+            return NotImplemented
+        return Amount(self.satoshi // other)
+
+    def __reduce__(self):
+        return Amount, (self.satoshi,)
 
     def __str__(self):
-        return "Coin[{}]".format(self.satoshi())
+        return "{:.8f}".format(self.btc())
 
     def __repr__(self):
-        return "Coin[{}]".format(self.satoshi())
+        return "Amount({})".format(self.satoshi)
 
 
 class CoreLitecoinParams(CoreChainParams):
@@ -113,50 +147,126 @@ class RegtestLitecoinParams(CoreLitecoinParams):
 
 
 class DisjointSet(object):
+    """
+    Union-find with path compression and union by rank. Items are interned to consecutive integer ids in the order
+    they are first seen. The members of each set form a circular linked list, so a set can be enumerated without
+    scanning all items.
+    """
 
     def __init__(self):
-        self.ds = []
+        self.ids = {}  # item -> id
+        self.items = []  # type: List[Hashable]
+        self.parent = []  # type: List[int]
+        self.rank = []  # type: List[int]
+        self.next = []  # type: List[int]
+        # result of all(), kept for indexing until the sets change
+        self._clusters = None  # type: Optional[List[set]]
+
+    def __len__(self):
+        return len(self.items)
 
     def __getitem__(self, item):
-        return self.ds[item]
+        if self._clusters is None:
+            self._clusters = self.all()
+        return self._clusters[item]
 
     def __iter__(self):
-        return self.ds
+        return self.iter_clusters()
+
+    def _find(self, i: int) -> int:
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def _members(self, i: int) -> List[int]:
+        members = [i]
+        j = self.next[i]
+        while j != i:
+            members.append(j)
+            j = self.next[j]
+        return members
+
+    def iter_clusters(self) -> Iterator[List[Hashable]]:
+        """
+        Yields the sets one at a time, ordered by their first seen item. Items within a set are in the order they were
+        first seen.
+        """
+        seen = set()
+        for i in range(len(self.items)):
+            root = self._find(i)
+            if root not in seen:
+                seen.add(root)
+                yield [self.items[j] for j in sorted(self._members(i))]
 
     def all(self):
-        return self.ds
+        return [set(c) for c in self.iter_clusters()]
 
     def index(self, item):
-        for idx, s in enumerate(self.ds):
-            if item in s:
-                return idx
-        return None
+        i = self.ids.get(item)
+        if i is None:
+            return None
+        return self._find(i)
 
     def get(self, item):
         idx = self.index(item)
         if idx is not None:
-            return self.ds[idx]
+            return {self.items[j] for j in self._members(idx)}
         return None
 
     def __add(self, item):
         """
         Add an item to the disjoint set if it's not already stored in it
         :param item: The item to be stored
-        :return: The index of the set that contains the item
+        :return: The id of the item
         """
-        idx = self.index(item)
-        if idx is None:
-            idx = len(self.ds)
-            self.ds.append({item})
-        return idx
+        i = self.ids.get(item)
+        if i is None:
+            self._clusters = None
+            i = len(self.items)
+            self.ids[item] = i
+            self.items.append(item)
+            self.parent.append(i)
+            self.rank.append(0)
+            self.next.append(i)
+        return i
 
     def union(self, item1, item2):
-        idx1 = self.__add(item1)
-        idx2 = self.__add(item2)
-        if idx1 != idx2:
-            self.ds[idx1] = self.ds[idx1] | self.ds[idx2]
-            del self.ds[idx2]
+        root1 = self._find(self.__add(item1))
+        root2 = self._find(self.__add(item2))
+        if root1 == root2:
+            return
+        self._clusters = None
+        if self.rank[root1] < self.rank[root2]:
+            root1, root2 = root2, root1
+        self.parent[root2] = root1
+        if self.rank[root1] == self.rank[root2]:
+            self.rank[root1] += 1
+        # splice the two member rings
+        self.next[root1], self.next[root2] = self.next[root2], self.next[root1]
 
     def union_all(self, items):
         for idx in range(len(items))[1:]:
             self.union(items[idx - 1], items[idx])
+
+
+def spawn_pool(processes: Optional[int] = None) -> multiprocessing.pool.Pool:
+    """
+    Starts a pool of spawned worker processes, so the workers do not inherit the chain parameters selected in
+    bitcointx. A spawned worker normally imports the script that was run first, which starts the pool again if the
+    script has no `__main__` guard. The script is hidden from the workers while they start, they only run functions
+    of this package.
+    :param processes: number of worker processes (default: number of CPUs)
+    """
+    main = sys.modules["__main__"]
+    main_file = vars(main).pop("__file__", None)
+    main_spec = getattr(main, "__spec__", None)
+    main.__spec__ = None
+    try:
+        return multiprocessing.get_context("spawn").Pool(processes)
+    finally:
+        main.__spec__ = main_spec
+        if main_file is not None:
+            main.__file__ = main_file
@@ -1,12 +1,15 @@
 import pytest
-from testchain.address import Address, UnsupportedAddressTypeError
+from bitcointx.core.script import CScript, OP_CHECKSIG
+
+from testchain.address import Address, AddressLedger, UnsupportedAddressTypeError
+from testchain.util import Amount
 
 
 def test_p2pkh_address(regtest):
     addr = Address.from_key_index(0, address_type="p2pkh")
     assert 0 == addr.key_index
     assert "p2pkh" == addr.type
-    assert 0 == addr.value
+    assert Amount(0) == addr.value
 
     address_regression(addr, regtest)
 
@@ -15,7 +18,7 @@ def test_p2sh_address(regtest):
     addr = Address.from_key_index(1, address_type="p2sh")
     assert 1 == addr.key_index
     assert "p2sh" == addr.type
-    assert 0 == addr.value
+    assert Amount(0) == addr.value
 
     address_regression(addr, regtest)
 
@@ -24,7 +27,7 @@ def test_p2wpkh_address(regtest):
     addr = Address.from_key_index(2, address_type="p2wpkh")
     assert 2 == addr.key_index
     assert "p2wpkh" == addr.type
-    assert 0 == addr.value
+    assert Amount(0) == addr.value
 
     address_regression(addr, regtest)
 
@@ -33,7 +36,7 @@ def test_p2wsh_address(regtest):
     addr = Address.from_key_index(3, address_type="p2wsh")
     assert 3 == addr.key_index
     assert "p2wsh" == addr.type
-    assert 0 == addr.value
+    assert Amount(0) == addr.value
 
     address_regression(addr, regtest)
 
@@ -43,6 +46,46 @@ def test_invalid_address():
         Address.from_key_index(4, address_type="invalid")
 
 
+@pytest.mark.parametrize("address_type", ["p2pkh", "p2sh", "p2wpkh", "p2wsh"])
+def test_lazy_scripts(address_type):
+    addr = Address.from_key_index(5, address_type)
+    assert addr.address.to_scriptPubKey() == addr.script_pubkey
+    assert addr.script_pubkey is addr.script_pubkey
+    if address_type in ("p2pkh", "p2wpkh"):
+        assert addr.address.to_redeemScript() == addr.script_code
+        assert addr.redeem_script is None
+    else:
+        assert CScript([addr.key.pub, OP_CHECKSIG]) == addr.script_code == addr.redeem_script
+    assert (address_type == "p2wsh") == (addr.witness_program is not None)
+
+
+def test_invalid_address_type_on_construction():
+    with pytest.raises(UnsupportedAddressTypeError):
+        Address(Address.compute_key(4), "p2tr")
+
+
+def test_address_ledger():
+    ledger = AddressLedger()
+    for key_index in [10000, 10001, 20000, 3 * AddressLedger.PAGE_SIZE + 5]:
+        ledger.add(key_index, "p2pkh")
+    ledger.add(10002, "p2wsh")
+    assert 0 == ledger.duplicates
+    ledger.add(10001, "p2sh")
+    assert 1 == ledger.duplicates
+    assert {"p2pkh": 4, "p2sh": 1, "p2wpkh": 0, "p2wsh": 1} == ledger.counts
+    assert 6 == len(ledger)
+    assert 3 * AddressLedger.PAGE_SIZE + 5 in ledger
+    assert 10003 not in ledger
+    assert [0, 3] == sorted(ledger.pages)
+
+    restored = AddressLedger()
+    restored.load_dict(ledger.to_dict())
+    assert ledger.counts == restored.counts
+    assert ledger.pages == restored.pages
+    restored.add(20000, "p2pkh")
+    assert 2 == restored.duplicates
+
+
 def address_regression(addr, regtest):
     print(addr.address, file=regtest)
     print(addr.key, file=regtest)
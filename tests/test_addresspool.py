@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+
+from testchain.address import Address
+from testchain.addresspool import CHUNK_SIZE, AddressPool, build_pool
+
+# a script without a __main__ guard, its workers must not run it again
+UNGUARDED = """
+import sys
+from testchain.addresspool import build_pool
+build_pool(sys.argv[1], [(0, int(sys.argv[2]))], processes=2)
+"""
+
+
+def test_pool_matches_derivation(tmpdir):
+    path = str(tmpdir.join("pool.bin"))
+    build_pool(path, [(10000, 3), (0, 4)], processes=1)
+    pool = AddressPool(path)
+    assert 7 == len(pool)
+    assert 3 in pool and 10002 in pool
+    assert 4 not in pool and 10003 not in pool and 9999 not in pool
+    for key_index in [0, 1, 2, 3, 10000, 10002]:
+        record = pool.get(key_index)
+        key = Address.compute_key(key_index)
+        assert bytes(key)[:32] == record.secret
+        assert key.pub == record.pub
+        for address_type in ["p2pkh", "p2sh", "p2wpkh", "p2wsh"]:
+            expected = Address(key, address_type)
+            actual = Address.from_record(record, address_type)
+            assert str(expected.address) == str(actual.address)
+            assert type(expected.address) == type(actual.address)
+            assert expected.key == actual.key
+    pool.close()
+
+
+def test_from_key_index_uses_pool(tmpdir):
+    path = str(tmpdir.join("pool.bin"))
+    build_pool(path, [(20000, 300)], processes=2)
+    Address.pool = AddressPool(path)
+    try:
+        for key_index in [20000, 20255, 20256, 20299, 20300]:
+            addr = Address.from_key_index(key_index, "p2wsh")
+            assert key_index == addr.key_index
+            assert str(Address(Address.compute_key(key_index), "p2wsh").address) == str(addr.address)
+    finally:
+        Address.pool.close()
+        Address.pool = None
+
+
+def test_build_pool_from_unguarded_script(tmpdir):
+    script = tmpdir.join("script.py")
+    script.write(UNGUARDED)
+    path = str(tmpdir.join("pool.bin"))
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([root] + os.environ.get("PYTHONPATH", "").split(os.pathsep)))
+    subprocess.run([sys.executable, str(script), path, str(3 * CHUNK_SIZE)], env=env, timeout=60, check=True)
+    pool = AddressPool(path)
+    assert 3 * CHUNK_SIZE == len(pool)
+    assert bytes(Address.compute_key(3 * CHUNK_SIZE - 1))[:32] == pool.get(3 * CHUNK_SIZE - 1).secret
+    pool.close()
@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import bitcointx.rpc
+import pytest
+
+from testchain.aiorpc import AsyncRPCClient
+
+
+class EchoServer(object):
+    """Answers every request with its params, keeps connections open."""
+
+    def __init__(self):
+        self.connections = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            length = 0
+            while True:
+                header = (await reader.readline()).decode().strip()
+                if not header:
+                    break
+                k, v = header.split(":", 1)
+                if k.lower() == "content-length":
+                    length = int(v)
+            request = json.loads((await reader.readexactly(length)).decode())
+            await asyncio.sleep(0.01)
+            if request["method"] == "fail":
+                response = {"result": None, "error": {"code": -26, "message": "rejected"}, "id": request["id"]}
+            else:
+                response = {"result": request["params"], "error": None, "id": request["id"]}
+            body = json.dumps(response).encode()
+            writer.write("HTTP/1.1 200 OK\r\nContent-Length: {}\r\n\r\n".format(len(body)).encode() + body)
+            await writer.drain()
+        writer.close()
+
+
+@pytest.fixture
+def client():
+    echo = EchoServer()
+    c = AsyncRPCClient("127.0.0.1", 0, "user", "pass", pool_size=4)
+    server = c.run(asyncio.start_server(echo.handle, "127.0.0.1", 0))
+    c.port = server.sockets[0].getsockname()[1]
+    c.echo = echo
+    yield c
+    # let the handlers see the closed connections before the loop goes away
+    c.disconnect()
+    c.run(asyncio.sleep(0.05))
+    server.close()
+    c.run(server.wait_closed())
+    c.close()
+
+
+def test_call(client):
+    assert ["abc", 1] == client.run(client.call("echo", "abc", 1))
+    assert [2] == client.run(client.call("echo", 2))
+    # the connection is reused
+    assert 1 == client.echo.connections
+
+
+def test_concurrent_calls_use_the_pool(client):
+    async def many():
+        return await asyncio.gather(*[client.call("echo", i) for i in range(10)])
+    assert [[i] for i in range(10)] == client.run(many())
+    assert 4 == client.echo.connections
+
+
+def test_error(client):
+    with pytest.raises(bitcointx.rpc.JSONRPCError):
+        client.run(client.call("fail"))
+    assert ["ok"] == client.run(client.call("echo", "ok"))
+
+
+def test_from_conf(tmpdir):
+    conf = tmpdir.join("bitcoin.conf")
+    conf.write("regtest=1\nrpcuser=user # comment\nrpcpassword=pass\nrpcport=18443\n")
+    c = AsyncRPCClient.from_conf(str(conf))
+    assert ("127.0.0.1", 18443) == (c.host, c.port)
+    c.close()
@@ -0,0 +1,53 @@
+import pickle
+
+import pytest
+
+from testchain.util import Amount
+
+
+def test_from_btc():
+    assert Amount(99990000) == Amount.from_btc(1) - Amount.from_btc(0.0001)
+    assert Amount(333330000) == Amount.from_btc(3.3333)
+    assert Amount(211111111) == Amount.from_btc(2.11111111)
+    assert 0.1 == Amount.from_btc(0.1).btc()
+    assert "0.10000000" == str(Amount.from_btc(0.1))
+
+
+def test_arithmetic_is_exact():
+    total = Amount(0)
+    for _ in range(1000):
+        total += Amount.from_btc(0.1)
+    assert Amount.from_btc(100) == total
+    assert Amount(30000) == 3 * Amount(10000) == Amount(10000) * 3
+    assert Amount(1399993333) == Amount(4199980000) // 3
+    assert Amount(-5) == -Amount(5)
+    assert Amount(1000) == max(Amount(0), Amount(1000))
+    assert not Amount(0)
+
+
+def test_no_mixing_with_numbers():
+    with pytest.raises(TypeError):
+        Amount(1) + 1
+    with pytest.raises(TypeError):
+        1 - Amount(1)
+    with pytest.raises(TypeError):
+        Amount(2) * Amount(2)
+    with pytest.raises(TypeError):
+        Amount(0.5)
+    assert Amount(0) != 0
+
+
+def test_immutable():
+    amount = Amount(1)
+    with pytest.raises(AttributeError):
+        amount.satoshi = 2
+    assert {Amount(1): "a"}[Amount(1)] == "a"
+    assert amount == pickle.loads(pickle.dumps(amount))
+
+
+def test_split():
+    assert [Amount(4), Amount(3), Amount(3)] == Amount(10).split(3)
+    assert [Amount(5)] * 2 == Amount(10).split(2)
+    parts = Amount(100000000).allocate([0.2, 1.5, 0.3])
+    assert [Amount(10000000), Amount(75000000), Amount(15000000)] == parts
+    assert Amount(7) == sum(Amount(7).allocate([1, 1, 1]), Amount(0))
@@ -0,0 +1,65 @@
+import pytest
+from bitcointx.core import CMutableTransaction, CMutableTxOut, b2lx
+
+from testchain.batch import BatchCallError, BatchingProxy, TransactionRejectedError
+
+
+class FakeProxy(object):
+    def __init__(self, rejected=None):
+        self.batches = []
+        self.rejected = rejected
+
+    def _batch(self, requests):
+        self.batches.append(requests)
+        responses = []
+        for r in reversed(requests):
+            if r["method"] == "fail" or r["params"] == [self.rejected]:
+                responses.append({"result": None, "error": {"code": -26, "message": "rejected"}, "id": r["id"]})
+            else:
+                responses.append({"result": r["params"], "error": None, "id": r["id"]})
+        return responses
+
+
+def test_calls_are_batched():
+    proxy = FakeProxy()
+    batching = BatchingProxy(proxy)
+    assert batching.call("setmocktime", 1535760600) is None
+    assert [] == proxy.batches
+
+    assert [1, "addr"] == batching.call("generatetoaddress", 1, "addr")
+    assert 1 == len(proxy.batches)
+    assert ["setmocktime", "generatetoaddress"] == [r["method"] for r in proxy.batches[0]]
+
+
+def test_errors_are_mapped_to_calls():
+    batching = BatchingProxy(FakeProxy())
+    ok = batching.queue_call("echo", 1)
+    failed = batching.queue_call("fail", 2)
+    with pytest.raises(BatchCallError) as e:
+        batching.flush()
+    assert "fail" == e.value.method
+    assert [1] == ok.result()
+    with pytest.raises(BatchCallError):
+        failed.result()
+
+
+def test_max_batch_size():
+    proxy = FakeProxy()
+    batching = BatchingProxy(proxy, max_batch_size=2)
+    batching.call("setmocktime", 1)
+    batching.call("setmocktime", 2)
+    batching.call("setmocktime", 3)
+    assert [2] == [len(b) for b in proxy.batches]
+
+
+def test_rejected_transaction_names_txid():
+    bad = CMutableTransaction([], [CMutableTxOut(2, b"\x51")])
+    batching = BatchingProxy(FakeProxy(rejected=bad.serialize().hex()))
+    batching.call("setmocktime", 1)
+    assert bad.GetTxid() == batching.sendrawtransaction(bad)
+    # the rejection surfaces at the next flush, but names the transaction
+    with pytest.raises(TransactionRejectedError) as e:
+        batching.call("generatetoaddress", 1, "addr")
+    assert bad.GetTxid() == e.value.txid
+    assert 1 == e.value.position
+    assert b2lx(bad.GetTxid()) in str(e.value)
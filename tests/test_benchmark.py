@@ -0,0 +1,35 @@
+import struct
+
+from bitcointx.core import CBlock, CMutableTransaction, CMutableTxIn, CMutableTxOut, COutPoint
+from bitcointx.core.script import CScript
+
+from testchain.benchmark import add_block_counts, count_block_contents
+from testchain.blkfile import DISK_MAGIC
+
+
+def make_block(prev, n_inputs):
+    coinbase = CMutableTransaction([CMutableTxIn(COutPoint(), CScript([len(n_inputs)]))], [CMutableTxOut(1, CScript())])
+    vtx = [coinbase] + [CMutableTransaction([CMutableTxIn(COutPoint(b"\x01" * 32, k)) for k in range(n)],
+                                            [CMutableTxOut(1, CScript())]) for n in n_inputs]
+    return CBlock(hashPrevBlock=prev, vtx=vtx)
+
+
+def test_count_block_contents(tmpdir):
+    genesis = make_block(b"\x00" * 32, [])
+    b1 = make_block(genesis.GetHash(), [2, 3])
+    b2 = make_block(b1.GetHash(), [1])
+    magic = DISK_MAGIC["bch"]
+    data = b"".join(magic + struct.pack("<I", len(b.serialize())) + b.serialize() for b in [genesis, b1, b2])
+    tmpdir.join("blk00000.dat").write_binary(data + b"\x00" * 100)
+
+    counts = count_block_contents(str(tmpdir), magic)
+    assert {0: [1, 0], 1: [3, 5], 2: [2, 1]} == counts
+
+    results = [{"first_height": 1, "last_height": 1, "seconds": 2.0},
+               {"first_height": 2, "last_height": 3, "seconds": 0}]
+    add_block_counts(results, counts)
+    assert (1, 3, 5, 1.5) == tuple(results[0][k] for k in ["blocks", "transactions", "signatures",
+                                                            "transactions_per_second"])
+    # heights beyond the copied files count as empty, rates of instant motifs are unknown
+    assert (2, 2, 1, None) == tuple(results[1][k] for k in ["blocks", "transactions", "signatures",
+                                                             "signatures_per_second"])
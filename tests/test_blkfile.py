@@ -0,0 +1,54 @@
+import struct
+
+from testchain.blkfile import DISK_MAGIC, block_files, extract_block_files, iter_records, used_length
+
+MAGIC = bytes.fromhex("fabfb5da")
+
+
+def record(payload, trailer=b""):
+    return MAGIC + struct.pack("<I", len(payload)) + payload + trailer
+
+
+def test_records_with_zero_runs():
+    # a long run of zeros inside a block must not end the walk
+    blocks = [b"\x01" * 10, b"\x00" * 1000, b"\x02" * 5]
+    data = b"".join(record(b) for b in blocks) + b"\x00" * 4096
+    assert [(8, 10), (26, 1000), (1034, 5)] == list(iter_records(data, MAGIC))
+    assert 1039 == used_length(data, MAGIC)
+
+
+def test_truncated_record():
+    data = record(b"\x01" * 10) + MAGIC + struct.pack("<I", 100) + b"\x02" * 10
+    assert 18 == used_length(data, MAGIC)
+
+
+def test_extract(tmpdir):
+    source = tmpdir.mkdir("blocks")
+    blk0 = record(b"\x01" * 10) + record(b"\x00" * 300)
+    rev0 = record(b"\x03" * 4, b"\x04" * 32)
+    blk1 = record(b"\x05" * 7)
+    source.join("blk00000.dat").write_binary(blk0 + b"\x00" * 1024)
+    source.join("rev00000.dat").write_binary(rev0 + b"\x00" * 1024)
+    source.join("blk00001.dat").write_binary(blk1 + b"\x00" * 1024)
+    source.join("blk00002.dat").write_binary(b"")
+    source.join("index").mkdir()
+    assert [0, 1, 2] == block_files(str(source))
+
+    dest = tmpdir.join("out")
+    copied = extract_block_files(str(source), str(dest), MAGIC, include_undo=True)
+    assert ["blk00000.dat", "rev00000.dat", "blk00001.dat", "blk00002.dat"] == copied
+    assert blk0 == dest.join("blk00000.dat").read_binary()
+    assert rev0 == dest.join("rev00000.dat").read_binary()
+    assert blk1 == dest.join("blk00001.dat").read_binary()
+    assert b"" == dest.join("blk00002.dat").read_binary()
+
+
+def test_extract_bch(tmpdir):
+    # Bitcoin ABC frames the records with the disk magic, not with its network magic dab5bffa
+    source = tmpdir.mkdir("blocks")
+    blk0 = record(b"\x01" * 10) + record(b"\x02" * 20)
+    source.join("blk00000.dat").write_binary(blk0 + b"\x00" * 1024)
+    dest = tmpdir.join("out")
+    assert ["blk00000.dat"] == extract_block_files(str(source), str(dest), DISK_MAGIC["bch"])
+    assert blk0 == dest.join("blk00000.dat").read_binary()
+    assert [] == list(iter_records(blk0, bytes.fromhex("dab5bffa")))
@@ -0,0 +1,45 @@
+import struct
+
+from bitcointx.core import CBlock, CMutableTransaction, CMutableTxIn, CMutableTxOut, COutPoint
+from bitcointx.core.script import CScript
+
+from testchain.blockindex import BlockIndex, write_block_index
+
+MAGIC = bytes.fromhex("fabfb5da")
+
+
+def make_block(prev, n_txs, tag):
+    vtx = [CMutableTransaction([CMutableTxIn(COutPoint(), CScript([tag, i]))], [CMutableTxOut(i, CScript())])
+           for i in range(n_txs)]
+    return CBlock(hashPrevBlock=prev, vtx=vtx)
+
+
+def test_block_index(tmpdir):
+    blocks_dir = tmpdir.mkdir("blocks")
+    genesis = make_block(b"\x00" * 32, 1, 0)
+    b1 = make_block(genesis.GetHash(), 3, 1)
+    b2 = make_block(b1.GetHash(), 2, 2)
+    files = [[genesis, b1], [b2]]
+    for file_no, blocks in enumerate(files):
+        data = b"".join(MAGIC + struct.pack("<I", len(b.serialize())) + b.serialize() for b in blocks)
+        blocks_dir.join("blk{:05d}.dat".format(file_no)).write_binary(data + b"\x00" * 100)
+
+    path = str(tmpdir.join("blocks.idx"))
+    write_block_index(path, str(blocks_dir), MAGIC)
+    index = BlockIndex(path)
+    assert 3 == len(index)
+    assert [] == index.blocks_at(3)
+
+    record = index.blocks_at(1)[0]
+    assert (1, b1.GetHash(), 0, 3) == (record.height, record.hash, record.file, record.tx_count)
+    data = blocks_dir.join("blk00000.dat").read_binary()
+    assert b1.serialize() == data[record.offset:record.offset + record.length]
+
+    record = index.blocks_at(2)[0]
+    assert (2, 1, 8) == (record.height, record.file, record.offset)
+
+    height, offset = index.find_tx(b1.vtx[2].GetTxid())
+    assert 1 == height
+    assert b1.vtx[2].serialize() == data[offset:offset + len(b1.vtx[2].serialize())]
+    assert index.find_tx(b"\x00" * 32) is None
+    index.close()
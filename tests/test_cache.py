@@ -0,0 +1,44 @@
+import os
+
+from testchain.cache import OutputCache, SnapshotCache, cache_key
+
+
+def test_cache_key():
+    assert cache_key(chain="btc", blocks=110) == cache_key(blocks=110, chain="btc")
+    assert cache_key(chain="btc", blocks=110) != cache_key(chain="bch", blocks=110)
+
+
+def test_snapshot_roundtrip(tmpdir):
+    datadir = tmpdir.mkdir("node")
+    datadir.join("regtest", "blocks", "blk00000.dat").write_binary(b"\xfa\xbf\xb5\xda", ensure=True)
+    datadir.join("regtest", ".lock").write_binary(b"")
+
+    cache = SnapshotCache(str(tmpdir.join("cache")))
+    assert not cache.has("key")
+    assert cache.restore("key", str(datadir)) is None
+
+    cache.save("key", str(datadir), {"current_time": 1535760600})
+    assert cache.has("key")
+
+    restored = tmpdir.mkdir("restored")
+    assert {"current_time": 1535760600} == cache.restore("key", str(restored))
+    assert b"\xfa\xbf\xb5\xda" == restored.join("regtest", "blocks", "blk00000.dat").read_binary()
+    assert not os.path.exists(str(restored.join("regtest", ".lock")))
+
+
+def test_output_roundtrip(tmpdir):
+    output = tmpdir.mkdir("btc")
+    output.join("regtest", "blocks", "blk00000.dat").write_binary(b"\xfa\xbf\xb5\xda", ensure=True)
+    output.join("output.json").write("{}")
+    output.join("unrelated.txt").write("not an output")
+
+    cache = OutputCache(str(tmpdir.join("cache")))
+    assert cache.restore("key", str(output)) is None
+    cache.save("key", str(output), ["regtest/blocks/blk00000.dat", "output.json"])
+    assert cache.has("key")
+
+    restored = tmpdir.mkdir("restored")
+    assert ["regtest/blocks/blk00000.dat", "output.json"] == cache.restore("key", str(restored))
+    assert b"\xfa\xbf\xb5\xda" == restored.join("regtest", "blocks", "blk00000.dat").read_binary()
+    assert "{}" == restored.join("output.json").read()
+    assert not os.path.exists(str(restored.join("unrelated.txt")))
@@ -0,0 +1,68 @@
+import pytest
+from bitcointx.core import CBlock, CMutableTransaction, CMutableTxIn, CMutableTxOut, COutPoint, b2lx
+from bitcointx.core.script import CScript
+
+from testchain.chainstate import ChainState, NoSpendableOutputError
+
+MINER = CScript(b"\x51")
+OTHER = CScript(b"\x52")
+
+
+class BlockStore(object):
+    def __init__(self):
+        self.blocks = {}
+
+    def add(self, height, value):
+        coinbase = CMutableTransaction([CMutableTxIn(COutPoint(), CScript([height]))], [CMutableTxOut(value, MINER)])
+        block = CBlock(nTime=height, vtx=[coinbase])
+        self.blocks[block.GetHash()] = block
+        return b2lx(block.GetHash()), coinbase.GetTxid()
+
+    def getblock(self, block_hash):
+        return self.blocks[block_hash]
+
+
+def mine(state, store, n, value=50):
+    txids = []
+    for _ in range(n):
+        block_hash, txid = store.add(state.height + 1, value)
+        state.connect_blocks([block_hash], spendable_coinbase=True)
+        txids.append(txid)
+    return txids
+
+
+def test_oldest_spendable():
+    store = BlockStore()
+    state = ChainState(store, 1535760000, MINER)
+    coinbases = mine(state, store, 100, value=10)
+    outpoint, value = state.oldest_spendable(5)
+    assert (coinbases[0], 0, 10) == (outpoint.hash, outpoint.n, value)
+
+    with pytest.raises(NoSpendableOutputError):
+        state.oldest_spendable(11)
+
+    # spending the oldest coinbase and sending change back to the miner
+    spend = CMutableTransaction([CMutableTxIn(outpoint)], [CMutableTxOut(3, OTHER), CMutableTxOut(6, MINER)])
+    state.add_transaction(spend)
+    mine(state, store, 1, value=10)
+    outpoint, _ = state.oldest_spendable(5)
+    assert coinbases[1] == outpoint.hash
+
+    # the change matures 100 blocks after it was confirmed
+    mine(state, store, 99, value=1)
+    outpoint, value = state.oldest_spendable(5)
+    assert coinbases[1] == outpoint.hash
+
+
+def test_state_roundtrip():
+    store = BlockStore()
+    state = ChainState(store, 1535760000, MINER)
+    mine(state, store, 101)
+    state.advance_time()
+
+    restored = ChainState(store, 0, MINER)
+    restored.load_dict(state.to_dict())
+    assert state.height == restored.height
+    assert state.tip == restored.tip
+    assert 1535760600 == restored.mocktime
+    assert state.oldest_spendable(1) == restored.oldest_spendable(1)
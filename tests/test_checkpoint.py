@@ -0,0 +1,89 @@
+import bitcointx.rpc
+
+from testchain.cache import SnapshotCache
+from testchain.generator import Generator
+from testchain.runner import Runner
+
+
+class StubNode(object):
+    """
+    Stands in for the node process of an offline runner, so its checkpoints can be saved.
+    """
+
+    def __init__(self):
+        self.stopped = 0
+
+    def version(self):
+        return "stub"
+
+    def stop(self):
+        self.stopped += 1
+
+
+class Mine(Generator):
+    def run(self):
+        self.next_address("p2wpkh")
+        self.generate_block(3)
+        self.log_value("mined", self.chain_state.height)
+
+
+class MineMore(Generator):
+    def run(self):
+        self.generate_block(2)
+
+
+def make_runner(tmpdir, generators=(Mine, MineMore), **options):
+    runner = Runner(str(tmpdir.join("out")), "btc", None, offline=True, **options)
+    runner.node = StubNode()
+    runner.snapshots = SnapshotCache(str(tmpdir.join("cache")))
+    for generator in generators:
+        runner.add_generator(generator)
+    return runner
+
+
+def test_save_and_restore(tmpdir):
+    runner = make_runner(tmpdir)
+    reconnects = []
+    runner._reconnect_rpc = lambda: reconnects.append(True)
+    keys = runner._checkpoint_keys()
+    runner.run_generator(runner.motif_generators[0])
+    runner._save_checkpoint(keys[0], 1)
+    assert 1 == runner.node.stopped
+    assert [True] == reconnects
+    blocks = tmpdir.join("cache", "snapshots", keys[0], "regtest", "blocks", "blk00000.dat").read_binary()
+
+    restored = make_runner(tmpdir)
+    assert keys == restored._checkpoint_keys()
+    assert 1 == restored._restore_checkpoint(keys)
+    assert 3 == restored.chain_state.height
+    assert runner.chain_state.tip == restored.chain_state.tip
+    assert {"mined": 3} == dict(restored.kv.items())
+    assert 0 == restored.motif_generators[0].address_cursor
+    assert ["p2wpkh"] == [a.type for a in restored.motif_generators[0].addresses.values()]
+    assert 1 == restored.address_ledger.counts["p2wpkh"]
+    assert blocks == open(restored.tempdir.name + "/regtest/blocks/blk00000.dat", "rb").read()
+
+
+def test_key_covers_source_and_params(tmpdir):
+    keys = make_runner(tmpdir)._checkpoint_keys()
+    assert keys == make_runner(tmpdir)._checkpoint_keys()
+    # a different motif changes its key and all later ones, but not the earlier ones
+    changed = make_runner(tmpdir, (Mine, Mine))._checkpoint_keys()
+    assert keys[0] == changed[0] and keys[1] != changed[1]
+    scaled = make_runner(tmpdir, scale=2)._checkpoint_keys()
+    assert keys[0] != scaled[0] and keys[1] != scaled[1]
+    sized = make_runner(tmpdir, motif_sizes={"fan": 5})._checkpoint_keys()
+    assert keys[0] != sized[0]
+
+
+def test_reconnect_replaces_proxy(tmpdir):
+    runner = make_runner(tmpdir)
+    conf = tmpdir.join("bitcoin.conf")
+    conf.write("regtest=1\nrpcuser=user\nrpcpassword=password\nrpcport=18443\n")
+    runner.conf_file = str(conf)
+    offline = runner.proxy.proxy
+    runner._reconnect_rpc()
+    # the tracing wrapper the generators hold is kept, only the connection below it is new
+    assert runner.motif_generators[0].proxy is runner.proxy
+    assert offline is not runner.proxy.proxy
+    assert isinstance(runner.proxy.proxy, bitcointx.rpc.Proxy)
@@ -0,0 +1,25 @@
+from testchain.cospends import CospendIndex, script_hash, write_cospend_index
+
+
+def test_cospend_index(tmpdir):
+    clusters = [[b"\x01", b"\x02", b"\x03"], [b"\x04"], [b"\x05", b"\x06"]]
+    path = str(tmpdir.join("cospends.bin"))
+    write_cospend_index(path, clusters)
+
+    index = CospendIndex(path)
+    assert 3 == len(index)
+    for cluster_id, members in enumerate(clusters):
+        for script in members:
+            assert cluster_id == index.cluster_of(script)
+        assert sorted(script_hash(s) for s in members) == index.members(cluster_id)
+    assert index.cluster_of(b"\x07") is None
+    index.close()
+
+
+def test_empty_index(tmpdir):
+    path = str(tmpdir.join("cospends.bin"))
+    write_cospend_index(path, iter([]))
+    index = CospendIndex(path)
+    assert 0 == len(index)
+    assert index.cluster_of(b"\x01") is None
+    index.close()
@@ -18,3 +18,37 @@ def test_disjoint_set():
     s2 = ds.get(5)
     assert 5 == len(s2)
     assert {5, 6, 7, 8, 9} == s2
+
+
+def test_iter_clusters():
+    ds = DisjointSet()
+    ds.union_all(["c", "d"])
+    ds.union_all(["a", "b"])
+    ds.union_all(["e"])
+    ds.union_all(["b", "d"])
+    ds.union_all(["f", "g"])
+
+    assert [["c", "d", "a", "b"], ["f", "g"]] == list(ds.iter_clusters())
+    assert ds.get("e") is None
+    assert ds.index("a") == ds.index("c")
+    assert 6 == len(ds)
+
+
+def test_large_chain():
+    ds = DisjointSet()
+    for i in range(10000):
+        ds.union_all([i, i + 1])
+    assert 1 == len(ds.all())
+    assert 10001 == len(ds.get(5000))
+
+
+def test_getitem_follows_unions():
+    ds = DisjointSet()
+    ds.union_all([1, 2])
+    ds.union_all([3, 4])
+    assert {3, 4} == ds[1]
+    assert ds[0] is ds[0]
+    ds.union(2, 3)
+    assert {1, 2, 3, 4} == ds[0]
+    ds.union(5, 5)
+    assert {5} == ds[1]
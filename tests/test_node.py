@@ -0,0 +1,101 @@
+import logging
+import socket
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from testchain.node import Node, NodeExitedError, NodeStartupError, free_port
+
+# stub node: listens on the port given as last argument, exits if it cannot bind it like bitcoind does
+LISTEN = "import socket, sys, time; s = socket.socket(); s.bind(('127.0.0.1', int(sys.argv[-1]))); s.listen(); " \
+         "time.sleep(30)"
+IGNORE_TERM = "import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); print('ready', flush=True); " \
+              "time.sleep(30)"
+
+
+class FakeNode(Node):
+    """
+    Answers RPC calls once the stub process accepts connections on its port, `stop` terminates the process.
+    """
+
+    def __init__(self, script, port=None, **kwargs):
+        params = ["-c", script] + ([str(port)] if port is not None else [])
+        super().__init__(sys.executable, "unused.conf", params, logging.getLogger("test"), **kwargs)
+        self.calls = []
+
+    def _rpc(self, method, *args):
+        self.calls.append(method)
+        if method == "stop":
+            self.proc.terminate()
+            return
+        port = int((self.params + self.port_params)[-1])
+        socket.create_connection(("127.0.0.1", port), timeout=1).close()
+
+
+def test_waits_until_ready():
+    node = FakeNode(LISTEN, free_port())
+    node.start()
+    assert node.is_running()
+    assert "getblockchaininfo" == node.calls[-1]
+    node.stop()
+    assert not node.is_running()
+    assert 0 != node.proc.returncode
+
+
+def test_early_exit():
+    node = FakeNode("import sys; sys.exit(3)", free_port())
+    with pytest.raises(NodeStartupError, match="code 3"):
+        node.start()
+
+
+def test_timeout_stops_node():
+    # the process runs, but never answers
+    node = FakeNode("import time; time.sleep(30)", free_port(), startup_timeout=0.3)
+    with pytest.raises(NodeStartupError, match="within 0.3 seconds"):
+        node.start()
+    assert not node.is_running()
+
+
+def test_stop_kills_unresponsive_node():
+    node = FakeNode(IGNORE_TERM, shutdown_timeout=0.3)
+    # started by hand, the stub never listens
+    node.proc = subprocess.Popen([sys.executable, "-c", IGNORE_TERM], stdout=subprocess.PIPE)
+    node.proc.stdout.readline()
+    node.stop()
+    assert not node.is_running()
+    assert -9 == node.proc.returncode
+    node.proc.stdout.close()
+    # stopping a stopped node is a no-op
+    node.stop()
+
+
+def test_retries_with_new_ports():
+    with socket.socket() as taken:
+        # another node binds the port between picking and starting it
+        taken.bind(("127.0.0.1", 0))
+        ports = iter([taken.getsockname()[1], free_port()])
+        node = FakeNode(LISTEN, ports=lambda: [str(next(ports))])
+        node.start()
+    assert node.is_running()
+    node.stop()
+
+
+def test_gives_up_after_start_attempts():
+    with socket.socket() as taken:
+        taken.bind(("127.0.0.1", 0))
+        node = FakeNode(LISTEN, ports=lambda: [str(taken.getsockname()[1])], start_attempts=2)
+        with pytest.raises(NodeExitedError):
+            node.start()
+
+
+def test_parallel_nodes():
+    # like generate_chains.py, every chain starts its own node on ports picked at the same time
+    nodes = [FakeNode(LISTEN, ports=lambda: [str(free_port())]) for _ in range(8)]
+    with ThreadPoolExecutor(len(nodes)) as pool:
+        list(pool.map(lambda n: n.start(), nodes))
+    assert all(n.is_running() for n in nodes)
+    assert len(nodes) == len({n.port_params[0] for n in nodes})
+    for n in nodes:
+        n.stop()
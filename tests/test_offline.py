@@ -0,0 +1,48 @@
+import logging
+import struct
+
+from bitcointx.core import Hash, lx
+
+from testchain.blkfile import DISK_MAGIC
+from testchain.offline import bits_to_target, block_subsidy, compact_size, merkle_root, pow_hash, OfflineNode, \
+    REGTEST_BITS
+
+
+def test_compact_size():
+    assert b"\x01" == compact_size(1)
+    assert b"\xfd\xfd\x00" == compact_size(0xfd)
+    assert b"\xfe\x00\x00\x01\x00" == compact_size(0x10000)
+
+
+def test_merkle_root():
+    a, b, c = b"\x01" * 32, b"\x02" * 32, b"\x03" * 32
+    assert a == merkle_root([a])
+    assert Hash(a + b) == merkle_root([a, b])
+    assert Hash(Hash(a + b) + Hash(c + c)) == merkle_root([a, b, c])
+
+
+def test_block_subsidy():
+    assert 50 * 10 ** 8 == block_subsidy(149)
+    assert 25 * 10 ** 8 == block_subsidy(150)
+    assert 0 == block_subsidy(150 * 64)
+
+
+def test_regtest_target():
+    assert 0x7fffff << (8 * 29) == bits_to_target(REGTEST_BITS)
+
+
+def test_litecoin_pow_hash():
+    # Litecoin mainnet genesis header: its block hash is double SHA-256, only the scrypt hash meets the target
+    root = lx("97ddfbbae6be97fd6cdf3e7ca13232a3afff2353e29badfab7f73011edd4ced9")
+    header = struct.pack("<i", 1) + b"\x00" * 32 + root + struct.pack("<III", 1317972665, 0x1e0ffff0, 2084524493)
+    assert lx("12a765e31ffd4059bada1e25190f6e98c99d9714d334efa41a195a7e7e04bfe2") == pow_hash("btc", header)
+    assert int.from_bytes(pow_hash("ltc", header), "little") <= bits_to_target(0x1e0ffff0)
+    assert int.from_bytes(pow_hash("btc", header), "little") > bits_to_target(0x1e0ffff0)
+
+
+def test_blk_files_use_disk_magic(tmpdir):
+    for chain in ["btc", "bch"]:
+        node = OfflineNode(chain, str(tmpdir.join(chain)), logging.getLogger("test"), 1535760000)
+        node.stop()
+        data = tmpdir.join(chain, "regtest", "blocks", "blk00000.dat").read_binary()
+        assert bytes.fromhex("fabfb5da") == DISK_MAGIC[chain] == data[:4]
@@ -0,0 +1,27 @@
+from testchain.runner import Runner
+from testchain.store import open_store
+
+
+def make_runner(tmpdir):
+    return Runner(str(tmpdir.join("out")), "btc", None, cache_dir=str(tmpdir.join("cache")), offline=True,
+                  store="sqlite")
+
+
+def test_output_cache_with_file_store(tmpdir):
+    runner = make_runner(tmpdir)
+    # a miss leaves the store usable
+    assert not runner._restore_output("missing")
+    runner.kv["tx-chain-0"] = "ab" * 32
+    runner.persist_hashes()
+    assert ["output.json", "ground-truth.sqlite"] == runner.output_files
+    runner.outputs.save("key", runner.prepare_output_dir(), runner.output_files)
+    runner.proxy.stop()
+
+    # a hit replaces the store of the new run with the cached one
+    runner = make_runner(tmpdir)
+    assert 0 == len(runner.kv)
+    assert runner._restore_output("key")
+    runner.proxy.stop()
+    store = open_store("sqlite", runner.prepare_output_dir())
+    assert [("tx-chain-0", "ab" * 32)] == list(store.items())
+    store.close()
@@ -0,0 +1,49 @@
+import logging
+
+import pytest
+
+from testchain.generator import Generator
+from testchain.pipeline import parse_motif_sizes
+from testchain.runner import address_spacing
+from testchain.util import DisjointSet
+
+
+def make_generator(scale=1, motif_sizes=None):
+    return Generator(None, "btc", logging.getLogger("test"), {}, 10000, lambda: 0, DisjointSet(), None,
+                     scale=scale, motif_sizes=motif_sizes)
+
+
+def test_size_scales_and_rounds():
+    assert 10 == make_generator().size("fan", 10)
+    assert 25 == make_generator(2.5).size("fan", 10)
+    assert 4 == make_generator(0.35).size("fan", 10)
+    # never smaller than one
+    assert 1 == make_generator(0.01).size("fan", 10)
+
+
+def test_override_takes_precedence():
+    generator = make_generator(3, {"fan": 1000})
+    assert 1000 == generator.size("fan", 10)
+    assert 30 == generator.size("tx-chain", 10)
+
+
+@pytest.mark.parametrize("value", ["fan", "fan=", "fan=0", "fan=-1", "fan=x", "fan=1.5", "chain=5", "Fan=5",
+                                   "tx-chain=100000", "bch-block=200000"])
+def test_parse_motif_sizes_rejects(value):
+    with pytest.raises(ValueError):
+        parse_motif_sizes([value])
+
+
+def test_parse_motif_sizes():
+    assert {} == parse_motif_sizes([])
+    assert {"fan": 1000, "tx-chain": 5} == parse_motif_sizes(["fan=1000", "tx-chain=5", "fan=1000"])
+    # the last transaction of the chain keeps one fee
+    assert {"bch-block": 99999} == parse_motif_sizes(["bch-block=99999"])
+
+
+def test_address_spacing():
+    # the default fixture depends on this value
+    assert 10000 == address_spacing(1, {})
+    assert 10000 == address_spacing(0.5, {"fan": 10})
+    assert 30000 == address_spacing(2.5, {})
+    assert 1000000 == address_spacing(1, {"fan": 1000})
@@ -0,0 +1,37 @@
+import pytest
+from bitcointx.core import CMutableTransaction, CMutableTxIn, CMutableTxOut, COutPoint, lx
+from bitcointx.core.script import CScript, OP_CHECKSIG, SignatureHash, SIGHASH_ALL, SIGVERSION_WITNESS_V0
+
+from testchain.address import Address
+from testchain.sighash import SighashContext
+
+
+def make_tx(sources):
+    tx_ins = [CMutableTxIn(COutPoint(lx("{:064x}".format(i + 1)), i), nSequence=0xfffffffe - i)
+              for i in range(len(sources))]
+    tx_outs = [CMutableTxOut(10000 * (i + 1), s.address.to_scriptPubKey()) for i, s in enumerate(sources[:3])]
+    return CMutableTransaction(tx_ins, tx_outs, nLockTime=101)
+
+
+def test_legacy_sighash():
+    sources = [Address.from_key_index(i, "p2pkh") for i in range(4)]
+    tx = make_tx(sources)
+    context = SighashContext(tx, "btc")
+    for i, s in enumerate(sources):
+        script = s.address.to_redeemScript()
+        assert SignatureHash(script, tx, i, SIGHASH_ALL) == context.signature_hash(script, i, 5000, "p2pkh")
+    script = CScript([sources[0].pub, OP_CHECKSIG])
+    assert SignatureHash(script, tx, 2, SIGHASH_ALL) == context.signature_hash(script, 2, 5000, "p2sh")
+
+
+@pytest.mark.parametrize("chain,address_type,hash_type", [
+    ("btc", "p2wpkh", SIGHASH_ALL), ("btc", "p2wsh", SIGHASH_ALL), ("bch", "p2pkh", SIGHASH_ALL | 0x40)])
+def test_witness_v0_sighash(chain, address_type, hash_type):
+    sources = [Address.from_key_index(i, address_type) for i in range(4)]
+    tx = make_tx(sources)
+    context = SighashContext(tx, chain)
+    for i, s in enumerate(sources):
+        script = s.witness_program if address_type == "p2wsh" else s.address.to_redeemScript()
+        expected = SignatureHash(script, tx, i, hash_type, amount=7000 + i, sigversion=SIGVERSION_WITNESS_V0)
+        assert expected == context.signature_hash(script, i, 7000 + i, address_type)
+    assert hash_type == context.sign(script, 0, 7000, sources[0].key, address_type)[-1]
@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from bitcointx.core import CMutableTransaction, CMutableTxIn, CMutableTxOut, COutPoint, lx
+
+from testchain.address import Address
+from testchain.signing import SigningPool, sign_input
+
+# a script without a __main__ guard, its workers must not run it again
+UNGUARDED = """
+import bitcointx
+from tests.test_signing import make_transaction
+from testchain.signing import SigningPool
+bitcointx.SelectParams("regtest")
+tx, jobs = make_transaction(16, "p2pkh")
+print(" ".join(sig.hex() for sig in SigningPool(processes=2).sign("btc", tx, jobs)))
+"""
+
+
+def make_transaction(n_inputs, address_type):
+    sources = [Address.from_key_index(i, address_type) for i in range(n_inputs)]
+    tx_ins = [CMutableTxIn(COutPoint(lx("{:064x}".format(i + 1)), i)) for i in range(len(sources))]
+    tx_outs = [CMutableTxOut(100000, sources[0].address.to_scriptPubKey())]
+    tx = CMutableTransaction(tx_ins, tx_outs)
+    jobs = [(s.address.to_redeemScript(), i, 20000 + i, s.key, s.type) for i, s in enumerate(sources)]
+    return tx, jobs
+
+
+@pytest.mark.parametrize("chain,address_type", [("btc", "p2pkh"), ("btc", "p2wpkh"), ("bch", "p2pkh")])
+def test_pool_signs_like_serial(chain, address_type):
+    tx, jobs = make_transaction(6, address_type)
+
+    serial = [sign_input(chain, script, tx, in_idx, amount, key, script_type)
+              for script, in_idx, amount, key, script_type in jobs]
+    pool = SigningPool(processes=2, threshold=2)
+    try:
+        assert serial == pool.sign(chain, tx, jobs)
+    finally:
+        pool.close()
+    # below the threshold, inputs are signed in-process
+    assert serial[:1] == SigningPool(processes=2, threshold=2).sign(chain, tx, jobs[:1])
+
+
+def test_pool_from_unguarded_script(tmpdir):
+    path = tmpdir.join("script.py")
+    path.write(UNGUARDED)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([root] + os.environ.get("PYTHONPATH", "").split(os.pathsep)))
+    result = subprocess.run([sys.executable, str(path)], env=env, timeout=60, check=True, stdout=subprocess.PIPE)
+    tx, jobs = make_transaction(16, "p2pkh")
+    serial = [sign_input("btc", script, tx, in_idx, amount, key, script_type)
+              for script, in_idx, amount, key, script_type in jobs]
+    assert [sig.hex() for sig in serial] == result.stdout.decode().split()
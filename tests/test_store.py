@@ -0,0 +1,70 @@
+import io
+import json
+
+import pytest
+
+from testchain.store import JSONLStore, MemoryStore, SQLiteStore, open_store, write_json
+
+ENTRIES = [("tx-chain-0", "ab" * 32), ("fan-out-count", 10), ("tx-chain-1", {"value": [1, 2], "empty": {}}),
+           ("nested", [[], {"a": None}]), ("tx-chain-0", "cd" * 32)]
+
+
+def _fill(store):
+    for k, v in ENTRIES:
+        store[k] = v
+    return store
+
+
+def _expected():
+    kv = {}
+    for k, v in ENTRIES:
+        kv[k] = v
+    return kv
+
+
+@pytest.mark.parametrize("items", [[], ENTRIES, [("a", []), ("b", {})]])
+def test_write_json_matches_json_dump(items):
+    f = io.StringIO()
+    write_json(f, dict(items).items())
+    assert json.dumps(dict(items), indent=4) == f.getvalue()
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite", "jsonl"])
+def test_store_keeps_insertion_order(tmpdir, kind):
+    store = _fill(open_store(kind, str(tmpdir)))
+    assert list(_expected().items()) == list(store.items())
+    assert len(_expected()) == len(store)
+    assert "cd" * 32 == store["tx-chain-0"]
+    assert "nested" in store and "missing" not in store
+    with pytest.raises(KeyError):
+        store["missing"]
+    assert [("tx-chain-0", "cd" * 32), ("tx-chain-1", {"value": [1, 2], "empty": {}})] == \
+        list(store.prefix("tx-chain-"))
+
+    path = str(tmpdir.join("output.json"))
+    store.export_json(path)
+    store.close()
+    with open(path) as f:
+        assert json.dumps(_expected(), indent=4) == f.read()
+
+
+def test_persistent_stores_reopen(tmpdir):
+    _fill(SQLiteStore(str(tmpdir.join("s.sqlite")))).close()
+    assert list(_expected().items()) == list(SQLiteStore(str(tmpdir.join("s.sqlite"))).items())
+
+    path = str(tmpdir.join("s.jsonl"))
+    _fill(JSONLStore(path)).close()
+    # a line that was cut off by a crash is dropped
+    with open(path, "ab") as f:
+        f.write(b'["partial", ')
+    store = JSONLStore(path)
+    assert list(_expected().items()) == list(store.items())
+    store["partial"] = 1
+    store.close()
+    assert 1 == JSONLStore(path)["partial"]
+
+
+def test_unknown_store():
+    assert isinstance(open_store("memory"), MemoryStore)
+    with pytest.raises(ValueError):
+        open_store("redis")
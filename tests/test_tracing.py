@@ -0,0 +1,73 @@
+import json
+
+from testchain.tracing import RUNNER, RpcTracer, TracingProxy
+
+
+class FakeProxy(object):
+    def call(self, name, *args):
+        return name
+
+    def getblock(self, block_hash):
+        return block_hash
+
+    def _batch(self, requests):
+        return [{"result": None, "error": None, "id": r["id"]} for r in requests]
+
+
+def test_tracing_proxy():
+    tracer = RpcTracer()
+    proxy = TracingProxy(FakeProxy(), tracer)
+    assert "generatetoaddress" == proxy.call("generatetoaddress", 1, "addr")
+    tracer.motif = "Motifs"
+    assert b"hash" == proxy.getblock(b"hash")
+    proxy._batch([{"method": "sendrawtransaction", "id": 0}, {"method": "setmocktime", "id": 1},
+                  {"method": "sendrawtransaction", "id": 2}])
+    assert {"generatetoaddress": 1, "getblock": 1, "batch": 1, "sendrawtransaction": 2, "setmocktime": 1} == \
+        dict(tracer.calls())
+
+    summary = tracer.summary()
+    assert ["generatetoaddress"] == list(summary[RUNNER])
+    assert {"getblock", "batch", "sendrawtransaction", "setmocktime"} == set(summary["Motifs"])
+    # calls sent in a batch are counted, the latency belongs to the batch
+    assert 2 == summary["Motifs"]["sendrawtransaction"]["count"]
+    assert summary["Motifs"]["sendrawtransaction"]["mean_seconds"] is None
+    assert 1 == sum(summary["Motifs"]["batch"]["histogram_us"].values())
+
+
+def test_failed_calls_are_recorded():
+    class FailingProxy(object):
+        def getblockcount(self):
+            raise ConnectionError()
+
+    tracer = RpcTracer()
+    proxy = TracingProxy(FailingProxy(), tracer)
+    try:
+        proxy.getblockcount()
+    except ConnectionError:
+        pass
+    assert 1 == tracer.calls()["getblockcount"]
+
+
+def test_histogram_buckets():
+    tracer = RpcTracer(keep_events=True)
+    tracer.record("getblockcount", tracer.started, 0.0000005)
+    tracer.record("getblockcount", tracer.started, 0.003)
+    tracer.record("getblockcount", tracer.started, 0.0031)
+    stats = tracer.summary()[RUNNER]["getblockcount"]
+    # 3000 µs lies between 2^11 and 2^12
+    assert {"<1": 1, "<4096": 2} == stats["histogram_us"]
+    assert 0.0000005 == stats["min_seconds"]
+    assert 0.0031 == stats["max_seconds"]
+    assert 3 == len(tracer.events)
+
+
+def test_write(tmpdir):
+    tracer = RpcTracer(keep_events=True)
+    tracer.motif = "Change"
+    tracer.record("sendrawtransaction", tracer.started + 1, 0.5)
+    path = str(tmpdir.join("trace.json"))
+    tracer.write(path)
+    with open(path) as f:
+        trace = json.load(f)
+    assert [["Change", "sendrawtransaction", 1, 0.5]] == trace["events"]
+    assert 1 == trace["summary"]["Change"]["sendrawtransaction"]["count"]
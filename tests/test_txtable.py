@@ -0,0 +1,105 @@
+import json
+
+from bitcointx.core import CMutableTransaction, CMutableTxIn, CMutableTxOut, COutPoint
+from bitcointx.core.script import CScript
+
+from testchain.txtable import MANIFEST, UNCONFIRMED, TxTable, read_column, read_npy, read_scripts, script_type, \
+    write_npy
+
+P2PKH = CScript(b"\x76\xa9\x14" + b"\x11" * 20 + b"\x88\xac")
+P2WSH = CScript(b"\x00\x20" + b"\x22" * 32)
+
+
+def make_tx(i, n_in=1, n_out=2):
+    vin = [CMutableTxIn(COutPoint(bytes([i]) * 32, k), nSequence=0xfffffffe) for k in range(n_in)]
+    vout = [CMutableTxOut(1000 * (i + 1) + k, P2PKH if k % 2 == 0 else P2WSH) for k in range(n_out)]
+    return CMutableTransaction(vin, vout, nLockTime=i)
+
+
+def test_npy_roundtrip(tmpdir):
+    from array import array
+    path = str(tmpdir.join("a.npy"))
+    write_npy(path, "<i8", array("q", [-1, 0, 2 ** 40]))
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data.startswith(b"\x93NUMPY\x01\x00")
+    assert 0 == (10 + int.from_bytes(data[8:10], "little")) % 64
+    assert [-1, 0, 2 ** 40] == list(read_npy(path))
+    write_npy(path, "|S2", b"abcd")
+    assert [b"ab", b"cd"] == read_npy(path)
+
+
+def test_script_type():
+    assert "p2pkh" == script_type(bytes(P2PKH))
+    assert "p2wsh" == script_type(bytes(P2WSH))
+    assert "p2sh" == script_type(b"\xa9\x14" + b"\x00" * 20 + b"\x87")
+    assert "nulldata" == script_type(b"\x6a\x01\x00")
+    assert "nonstandard" == script_type(b"")
+
+
+def test_rows_follow_the_blocks(tmpdir):
+    directory = str(tmpdir.join("txtable"))
+    table = TxTable(directory, chunk_size=2)
+    txs = [make_tx(i, n_in=i + 1) for i in range(5)]
+    for tx in txs[:3]:
+        table.add(tx, "Change")
+    # rows are only added once the block is known
+    assert 0 == table.buffered and 3 == len(table)
+    table.confirm(101, [txs[2].GetTxid(), b"\x00" * 32, txs[1].GetTxid()])
+    assert [2] == table.chunks["transactions"]
+    assert [5] == table.chunks["inputs"]
+    table.confirm(102, [txs[0].GetTxid()])
+
+    table.add(txs[3], "Taint", height=103)
+    table.add(txs[4], "Taint")
+    table.close()
+
+    order = [txs[2], txs[1], txs[0], txs[3], txs[4]]
+    assert [2, 2, 1] == table.chunks["transactions"]
+    assert [tx.GetTxid() for tx in order] == read_column(directory, "transactions", "txid")
+    assert [101, 101, 102, 103, UNCONFIRMED] == list(read_column(directory, "transactions", "height"))
+    assert ["Change", "Taint"] == [table.strings[i] for i in sorted(set(read_column(directory, "transactions",
+                                                                                   "motif")))]
+    assert [2, 1, 0, 3, 4] == list(read_column(directory, "transactions", "locktime"))
+    assert [0, 0, 0, 1, 1, 2, 3, 3, 3, 3] == list(read_column(directory, "inputs", "tx"))[:10]
+    assert [0xfffffffe] * 15 == list(read_column(directory, "inputs", "sequence"))
+    assert [tx.vout[k].nValue for tx in order for k in range(2)] == list(read_column(directory, "outputs", "value"))
+    assert [bytes(P2PKH), bytes(P2WSH)] * 5 == read_scripts(directory)
+    assert ["p2pkh", "p2wsh"] * 5 == [table.strings[i] for i in read_column(directory, "outputs", "type")]
+
+
+def test_rows_do_not_depend_on_arrival_or_checkpoints(tmpdir):
+    txs = [make_tx(i, n_in=i % 3 + 1) for i in range(7)]
+    blocks = [[0, 1, 2, 3], [4, 5, 6]]
+
+    def build(name, arrival, checkpoint):
+        directory = str(tmpdir.join(name))
+        table = TxTable(directory, chunk_size=3)
+        for height, block in enumerate(blocks, 101):
+            for i in arrival(block):
+                table.add(txs[i], "Workload")
+            table.confirm(height, [txs[i].GetTxid() for i in block])
+            if checkpoint:
+                table.flush()
+                state = json.loads(json.dumps(table.to_dict()))
+                table = TxTable(directory, chunk_size=3)
+                table.load_dict(state)
+        table.close()
+        return {f.basename: f.read_binary() for f in tmpdir.join(name).listdir()}
+
+    expected = build("a", list, False)
+    assert expected == build("b", reversed, True)
+    assert [3, 3, 1] == json.loads(expected[MANIFEST])["tables"]["transactions"]["chunks"]
+
+
+def test_restore_from_state(tmpdir):
+    directory = str(tmpdir)
+    table = TxTable(directory)
+    table.add(make_tx(0), "Motifs", height=1)
+    table.flush()
+    restored = TxTable(directory)
+    restored.load_dict(table.to_dict())
+    restored.add(make_tx(1), "Heuristics", height=2)
+    restored.close()
+    assert [1, 2] == list(read_column(directory, "transactions", "height"))
+    assert sorted(restored.files()) == sorted(f.basename for f in tmpdir.listdir())
@@ -0,0 +1,40 @@
+import logging
+
+from testchain.motifs.workload import MIN_OUTPUT_SATOSHI, Workload, WorkloadConfig
+from testchain.util import Amount, DisjointSet
+
+
+def make_workload(chain="btc", **config):
+    return Workload(None, chain, logging.getLogger("test"), {}, 10000, lambda: 0, DisjointSet(), None,
+                    config=WorkloadConfig(**config))
+
+
+def test_split_keeps_total():
+    workload = make_workload(seed=1)
+    for total, n in [(100000000, 7), (2 * MIN_OUTPUT_SATOSHI, 2), (12345678, 1)]:
+        values = workload._split(total, n)
+        assert Amount(total) == sum(values, Amount(0))
+        assert n == len(values)
+        assert all(v >= Amount(MIN_OUTPUT_SATOSHI) for v in values)
+
+
+def test_same_seed_same_samples():
+    a = make_workload(seed=7)
+    b = make_workload(seed=7)
+    assert [a._pareto_count(2.5, 50) for _ in range(100)] == [b._pareto_count(2.5, 50) for _ in range(100)]
+    assert str(a._recipient().address) == str(b._recipient().address)
+
+
+def test_addresses_are_not_retained():
+    workload = make_workload(reuse_rate=0)
+    first = workload.next_address()
+    second = workload.next_address("p2sh")
+    assert {} == workload.addresses
+    # the workload's keys are outside the key index space that the ledger checks
+    assert 0 == len(workload.address_ledger)
+    assert second is workload.current_address()
+    assert str(first.address) == str(workload._address(0, "p2pkh").address)
+
+
+def test_no_segwit_on_bch():
+    assert ["p2pkh", "p2sh"] == make_workload("bch").address_types